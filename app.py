@@ -1,46 +1,144 @@
+import json
+import os
+import time
 import streamlit as st
+import streamlit.components.v1 as components
 import pandas as pd
-from datetime import date
+from datetime import date, timedelta
 from streamlit_calendar import calendar  # <--- Componente de calendario
 
-from src.database import DatabaseManager
-from src.repositories import (
-    ClientRepository, PetRepository, AppointmentRepository, 
-    MedicalRecordRepository, BillingRepository, ReviewRepository, UserRepository
-)
-from src.services import ClinicService, AuthService
-from src.seeder import DataSeeder  # <--- Importamos el Seeder
-from src.models import Client, Pet, Appointment, MedicalRecord, Invoice, Review
+from src.app_context import get_app_context
+from src.utils import logger, configure_logging_from_env
+from src.services import LoginThrottled
+from src.rate_limit import forwarded_client
+from src.reports import COLUMN_LABELS
+from src.models import Client, Pet
 
 # --- Configuración de la Página (Debe ser la primera llamada) ---
 st.set_page_config(page_title="VetManager Pro", layout="wide", page_icon="🐾")
 
+# --- Logging ---
+# Escritura en segundo plano (cola) con rotación; idempotente entre reruns.
+configure_logging_from_env()
+
 # --- Inyección de Dependencias (Composition Root) ---
-db = DatabaseManager()
-db.initialize_db()
-
-# Inicialización de Repositorios
-client_repo = ClientRepository(db)
-pet_repo = PetRepository(db)
-appt_repo = AppointmentRepository(db)
-mr_repo = MedicalRecordRepository(db)
-bill_repo = BillingRepository(db)
-review_repo = ReviewRepository(db)
-user_repo = UserRepository(db)
-
-# Inicialización de Servicios
-service = ClinicService(client_repo, pet_repo, appt_repo, mr_repo, bill_repo, review_repo)
-auth_service = AuthService(user_repo)
-
-# --- Carga de Datos Iniciales (Seeding) ---
-# Usamos el Seeder dedicado en lugar del servicio para cumplir SOLID (SRP)
-seeder = DataSeeder(client_repo, pet_repo, appt_repo, mr_repo, bill_repo, review_repo)
-seeder.seed()
-
-# Asegurar admin
-auth_service.create_admin_if_not_exists()
+# El contexto (esquema, repositorios, servicios, seeding y admin) se construye una
+# sola vez por proceso y se comparte entre sesiones; en cada rerun solo se recoge.
+# VETMANAGER_DB permite apuntar la app a otra base de datos (p.ej. las de benchmarks)
+_context_started = time.perf_counter()
+ctx = get_app_context(os.environ.get("VETMANAGER_DB", "veterinaria_final.db"))
+context_rerun_ms = (time.perf_counter() - _context_started) * 1000
+logger.debug(f"Contexto de la app recuperado en {context_rerun_ms:.3f}ms")
+
+service = ctx.service
+auth_service = ctx.auth_service
+
+# Filas por página en los listados (paginación por cursor)
+PAGE_SIZE = 25
+
+def date_columns(df: pd.DataFrame) -> dict:
+    """Las columnas datetime64 se muestran como fecha, sin la hora 00:00:00."""
+    return {name: st.column_config.DateColumn(format="YYYY-MM-DD") for name in df.select_dtypes("datetime").columns}
+
+def paged_table(key: str, fetch_page, empty_message: str = "No hay resultados.", format_frame=None):
+    """Muestra una tabla paginada por cursor: solo se consulta la página visible.
+
+    `fetch_page` es un ClinicService.*_table: la página ya trae el DataFrame listo, con
+    claves internas por columna que aquí se muestran con sus títulos (COLUMN_LABELS).
+    `format_frame` recibe el DataFrame con las claves internas. Guarda en session_state la pila de cursores para poder volver a la página anterior.
+    """
+    cursors = st.session_state.setdefault(f"{key}_cursors", [None])
+    page = fetch_page(limit=PAGE_SIZE, after_key=cursors[-1])
+
+    if len(page.items):
+        df = page.items if format_frame is None else format_frame(page.items)
+        df = df.rename(columns=COLUMN_LABELS)
+        st.dataframe(df, use_container_width=True, column_config=date_columns(df))
+    else:
+        st.info(empty_message if len(cursors) == 1 else "No hay más resultados.")
+
+    col_prev, col_info, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        if len(cursors) > 1 and st.button("◀ Anterior", key=f"{key}_prev"):
+            cursors.pop()
+            st.rerun()
+    with col_info:
+        st.caption(f"Página {len(cursors)}")
+    with col_next:
+        if page.has_more and st.button("Siguiente ▶", key=f"{key}_next"):
+            cursors.append(page.next_key)
+            st.rerun()
+    return page
+
+# Opciones que muestra como máximo un selector con búsqueda
+PICKER_LIMIT = 20
+
+def entity_picker(label: str, key: str, lookup, format_option, limit: int = PICKER_LIMIT):
+    """Selector con búsqueda: solo se consultan (y se envían al navegador) las `limit`
+    primeras coincidencias de lo tecleado, haya los registros que haya.
+
+    Devuelve la entidad elegida o None. Debe ir fuera de los st.form: dentro de un
+    formulario lo tecleado no se aplica hasta enviarlo.
+    """
+    text = st.text_input(f"Buscar {label.lower()}", key=f"{key}_query", placeholder="Escribe para filtrar...")
+    matches = {item.id: item for item in lookup(text, limit)}
+    if not matches:
+        st.caption("Sin coincidencias.")
+        return None
+    selected = st.selectbox(label, list(matches), format_func=lambda item_id: format_option(matches[item_id]),
+                            key=key)
+    return matches.get(selected)
+
+def client_label(client: Client) -> str:
+    return f"{client.name} (ID: {client.id})"
+
+def pet_label(pet: Pet) -> str:
+    return f"{pet.name} ({pet.species}, ID: {pet.id})"
 
 # --- Gestión de Sesión y Login ---
+# El token de sesión viaja en una cookie, nunca en la URL (acabaría en el historial, en
+# los enlaces copiados, en el Referer y en los logs de los proxies), y así sobrevive a
+# recargar la página o abrir otra pestaña. Streamlit no deja responder con Set-Cookie:
+# la escribe un componente HTML (iframe del mismo origen) con SameSite=Strict, y Secure
+# bajo HTTPS. HttpOnly solo puede ponerlo una cabecera del servidor, no JavaScript; el
+# token va firmado y se puede revocar en el servidor. Se lee con st.context.cookies.
+SESSION_COOKIE = "vetmanager_session"
+# La caducidad real la decide el servidor (sesión deslizante); la cookie solo la transporta
+SESSION_COOKIE_MAX_AGE = 30 * 24 * 3600
+
+def write_session_cookie(token):
+    """Guarda la cookie de sesión en el navegador (la borra si `token` es None)."""
+    value, max_age = (token, SESSION_COOKIE_MAX_AGE) if token else ("", 0)
+    cookie = json.dumps(f"{SESSION_COOKIE}={value}; Path=/; Max-Age={max_age}; SameSite=Strict")
+    script = f"""<script>
+        const secure = window.parent.location.protocol === "https:" ? "; Secure" : "";
+        window.parent.document.cookie = {cookie} + secure;
+    </script>"""
+    # st.iframe sustituye a components.html en las versiones recientes de Streamlit
+    embed = getattr(st, "iframe", None) or components.html
+    embed(script, height=1)
+
+def forget_session_cookie(token):
+    """Programa el borrado de la cookie y deja de aceptarla en esta sesión de Streamlit
+    (st.context.cookies conserva el valor con el que se abrió la conexión)."""
+    st.session_state['stale_session_cookie'] = token
+    st.session_state['session_cookie_pending'] = None
+
+def client_address():
+    """IP del navegador, si Streamlit la expone.
+
+    Detrás de N proxies propios (VETMANAGER_TRUST_PROXY=N) se usa la entrada de
+    X-Forwarded-For que añadió el más externo; las anteriores y, sin proxy, la cabecera
+    entera las elige el cliente y no sirven para limitar intentos.
+    """
+    context = getattr(st, "context", None)
+    trusted_hops = os.environ.get("VETMANAGER_TRUST_PROXY", "0")
+    if trusted_hops.isdigit() and int(trusted_hops) > 0:
+        forwarded = (getattr(context, "headers", None) or {}).get("X-Forwarded-For")
+        address = forwarded_client(forwarded, int(trusted_hops))
+        if address:
+            return address
+    return getattr(context, "ip_address", None)
 
 def login_page():
     """Vista de inicio de sesión."""
@@ -55,9 +153,16 @@ def login_page():
             submitted = st.form_submit_button("Entrar", use_container_width=True)
             
             if submitted:
-                user = auth_service.login(username, password)
+                try:
+                    user = auth_service.login(username, password, client_address())
+                except LoginThrottled as e:
+                    st.error(str(e))
+                    return
                 if user:
-                    st.session_state['user'] = user
+                    token = auth_service.create_session(user)
+                    st.session_state['session_token'] = token
+                    st.session_state['session_cookie_pending'] = token
+                    st.session_state['user'] = auth_service.validate_session(token)
                     st.success(f"Bienvenido {user.username}")
                     st.rerun()
                 else:
@@ -65,10 +170,37 @@ def login_page():
 
 def logout():
     """Cierra la sesión del usuario."""
-    if 'user' in st.session_state:
-        del st.session_state['user']
+    token = st.session_state.pop('session_token', None)
+    auth_service.revoke_session(token)
+    forget_session_cookie(token)
+    st.session_state.pop('user', None)
     st.rerun()
 
+def session_cookie():
+    """Token de la cookie de sesión, salvo que ya se haya descartado en esta sesión."""
+    token = st.context.cookies.get(SESSION_COOKIE)
+    # isinstance: fuera de un navegador (AppTest) las cookies de la petición son un mock
+    if not isinstance(token, str) or token == st.session_state.get('stale_session_cookie'):
+        return None
+    return token
+
+def restore_session():
+    """Recupera el usuario a partir del token de sesión (sin bcrypt ni consultas si está en memoria).
+
+    El token sale de session_state o, tras recargar la página, de la cookie de sesión.
+    """
+    token = st.session_state.get('session_token') or session_cookie()
+    user = auth_service.validate_session(token) if token else None
+    if user is None:
+        if token and token == session_cookie():
+            forget_session_cookie(token)  # revocada o caducada: se borra del navegador
+        st.session_state.pop('session_token', None)
+        st.session_state.pop('user', None)
+        return None
+    st.session_state['session_token'] = token
+    st.session_state['user'] = user
+    return user
+
 # --- Aplicación Principal ---
 
 def main_app():
@@ -83,49 +215,117 @@ def main_app():
     
     st.sidebar.divider()
     
+    # Tiempos de arranque (solo administradores)
+    if st.session_state['user'].role == "admin":
+        with st.sidebar.expander("⏱️ Arranque"):
+            timings = pd.Series(ctx.startup_timings, name="ms").round(2)
+            st.caption("Arranque en frío (una vez por proceso)")
+            st.dataframe(timings, use_container_width=True)
+            st.caption(f"Este rerun: {context_rerun_ms:.3f} ms")
+        with st.sidebar.expander("🗃️ Caché"):
+            cache_stats = ctx.cache.stats()
+            st.caption(f"Aciertos: {cache_stats.hits} · Fallos: {cache_stats.misses} "
+                       f"({cache_stats.hit_ratio:.0%})")
+            st.caption(f"Entradas: {cache_stats.entries} · ~{cache_stats.approx_bytes / 1024:.0f} KiB")
+            st.caption(f"Desalojos: {cache_stats.evictions} · Expiradas: {cache_stats.expirations} · "
+                       f"Invalidadas: {cache_stats.invalidations}")
+            by_page = ctx.cache.scope_stats()
+            if by_page:
+                st.dataframe(pd.DataFrame([{"Página": page, "Aciertos": s.hits, "Fallos": s.misses,
+                                            "% aciertos": round(s.hit_ratio * 100, 1)}
+                                           for page, s in by_page.items()]).set_index("Página"),
+                             use_container_width=True)
+        with st.sidebar.expander("🔒 Logins"):
+            throttle = auth_service.login_throttle_stats()
+            st.caption(f"Rechazados por usuario: {throttle['user'].rejected} · "
+                       f"por dirección: {throttle['address'].rejected}")
+            st.caption(f"Claves vigiladas: {throttle['user'].keys + throttle['address'].keys}")
+        if ctx.query_stats is not None:
+            with st.sidebar.expander("🧮 Consultas SQL"):
+                statements = ctx.query_stats.snapshot()
+                st.caption(f"Sentencias distintas: {len(statements)} · Lentas "
+                           f"(≥ {ctx.query_stats.slow_ms:.0f} ms): {ctx.query_stats.slow_queries}")
+                if statements:
+                    df = pd.DataFrame([vars(s) for s in statements])
+                    st.dataframe(df[['statement', 'count', 'rows', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms']],
+                                 use_container_width=True)
+                st.download_button("Descargar JSON", ctx.query_stats.to_json(),
+                                   file_name="query_stats.json", mime="application/json")
+                if st.button("Reiniciar estadísticas"):
+                    ctx.query_stats.reset()
+                    st.rerun()
+    
     # Menú de Navegación
     menu = st.sidebar.radio(
         "Navegación", 
         ["Inicio", "Clientes", "Mascotas", "Calendario & Citas", "Facturación", "Reseñas"]
     )
 
-    if menu == "Inicio":
-        show_home()
-    elif menu == "Clientes":
-        show_clients()
-    elif menu == "Mascotas":
-        show_pets()
-    elif menu == "Calendario & Citas":
-        show_calendar()
-    elif menu == "Facturación":
-        show_billing()
-    elif menu == "Reseñas":
-        show_reviews()
+    # Las lecturas de la caché se atribuyen a la página (ratio de aciertos por página)
+    with ctx.cache.scope(menu):
+        sidebar_search()
+
+        if menu == "Inicio":
+            show_home()
+        elif menu == "Clientes":
+            show_clients()
+        elif menu == "Mascotas":
+            show_pets()
+        elif menu == "Calendario & Citas":
+            show_calendar()
+        elif menu == "Facturación":
+            show_billing()
+        elif menu == "Reseñas":
+            show_reviews()
+
+SEARCH_ICONS = {"client": "👤", "pet": "🐾", "medical_record": "🩺"}
+
+def sidebar_search():
+    """Buscador global (texto completo) en la barra lateral."""
+    st.sidebar.divider()
+    query = st.sidebar.text_input("🔎 Buscar", placeholder="Cliente, mascota, diagnóstico...")
+    if not query:
+        return
+    results = service.search(query, limit=15)
+    if not results:
+        st.sidebar.caption("Sin resultados.")
+    for r in results:
+        st.sidebar.markdown(f"{SEARCH_ICONS[r.kind]} **{r.title}** · {r.detail}")
+        st.sidebar.caption(r.snippet)
 
 def show_home():
     st.title("Bienvenido a VetManager Pro")
     st.markdown("### Sistema de Gestión Veterinaria Integral")
     
-    col1, col2, col3 = st.columns(3)
-    clients = service.list_clients()
-    pets = service.list_pets()
-    appts = service.list_appointments()
+    # Una sola consulta de agregados (COUNT/GROUP BY), sin cargar las tablas
+    stats = service.dashboard_stats()
     
+    col1, col2, col3, col4 = st.columns(4)
     with col1:
-        st.metric("Clientes Registrados", len(clients))
+        st.metric("Clientes Registrados", stats.clients)
     with col2:
-        st.metric("Mascotas Activas", len(pets))
+        st.metric("Mascotas Activas", stats.pets)
     with col3:
-        st.metric("Citas Programadas", len(appts))
+        st.metric("Citas Programadas", stats.appointments)
+    with col4:
+        st.metric("Facturado este mes", f"{stats.revenue_this_month:.2f} €")
+
+    col_status, col_species = st.columns(2)
+    with col_status:
+        if stats.appointments_by_status:
+            st.markdown("##### Citas por estado")
+            st.bar_chart(pd.Series(stats.appointments_by_status, name="Citas"))
+    with col_species:
+        if stats.pets_by_species:
+            st.markdown("##### Mascotas por especie")
+            st.bar_chart(pd.Series(stats.pets_by_species, name="Mascotas"))
 
     st.image("https://images.unsplash.com/photo-1553688738-a278b9f063e0?ixlib=rb-1.2.1&auto=format&fit=crop&w=1350&q=80", caption="Cuidado profesional para tus mascotas")
 
 def show_clients():
     st.header("Gestión de Clientes")
     
-    clients = service.list_clients()
-    client_data = [vars(c) for c in clients] if clients else []
-    client_df = pd.DataFrame(client_data)
+    has_clients = service.has_clients()
     
     col_register, col_actions = st.columns([1, 1])
 
@@ -145,24 +345,20 @@ def show_clients():
                         st.error(f"Error: {e}")
         
         st.subheader("Listado de Clientes")
-        if not clients:
+        if not has_clients:
             st.info("No hay clientes registrados.")
         else:
-            st.dataframe(client_df, use_container_width=True)
+            paged_table("clients_table", service.clients_table)
 
     with col_actions:
         st.subheader("Acciones")
-        if clients:
-            client_options = {c.name: c for c in clients}
-            
+        if has_clients:
             # Eliminar
             st.markdown("##### Eliminar Cliente")
-            client_to_delete_name = st.selectbox("Seleccionar Cliente para eliminar", 
-                                                 list(client_options.keys()), 
-                                                 key="delete_client_select")
-            client_to_delete = client_options[client_to_delete_name]
+            client_to_delete = entity_picker("Cliente para eliminar", "delete_client_select",
+                                             service.lookup_clients, client_label)
 
-            if st.button("🔴 Eliminar Cliente", key="delete_client_btn"):
+            if client_to_delete and st.button("🔴 Eliminar Cliente", key="delete_client_btn"):
                 service.delete_client(client_to_delete.id)
                 st.warning(f"Cliente {client_to_delete.name} eliminado.")
                 st.rerun()
@@ -171,115 +367,115 @@ def show_clients():
 
             # Editar
             st.markdown("##### Editar Cliente")
-            client_to_edit_name = st.selectbox("Seleccionar Cliente para editar", 
-                                               list(client_options.keys()),
-                                               key="edit_client_select")
-            client_to_edit = client_options[client_to_edit_name]
+            client_to_edit = entity_picker("Cliente para editar", "edit_client_select",
+                                           service.lookup_clients, client_label)
             
-            with st.form("edit_client_form"):
-                st.markdown(f"**Editando ID:** {client_to_edit.id}")
-                edit_name = st.text_input("Nombre Completo", value=client_to_edit.name)
-                edit_email = st.text_input("Email", value=client_to_edit.email)
-                edit_phone = st.text_input("Teléfono", value=client_to_edit.phone)
-                
-                edit_submitted = st.form_submit_button("Actualizar Cliente")
-                
-                if edit_submitted:
-                    try:
-                        updated_client = Client(client_to_edit.id, edit_name, edit_email, edit_phone)
-                        service.update_client(updated_client)
-                        st.success(f"Cliente {edit_name} actualizado.")
-                        st.rerun()
-                    except Exception as e:
-                        st.error(f"Error: {e}")
+            if client_to_edit:
+                with st.form("edit_client_form"):
+                    st.markdown(f"**Editando ID:** {client_to_edit.id}")
+                    edit_name = st.text_input("Nombre Completo", value=client_to_edit.name)
+                    edit_email = st.text_input("Email", value=client_to_edit.email)
+                    edit_phone = st.text_input("Teléfono", value=client_to_edit.phone)
+                    
+                    edit_submitted = st.form_submit_button("Actualizar Cliente")
+                    
+                    if edit_submitted:
+                        try:
+                            updated_client = Client(client_to_edit.id, edit_name, edit_email, edit_phone)
+                            service.update_client(updated_client)
+                            st.success(f"Cliente {edit_name} actualizado.")
+                            st.rerun()
+                        except Exception as e:
+                            st.error(f"Error: {e}")
         else:
             st.info("No hay clientes para realizar acciones.")
 
 def show_pets():
     st.header("Gestión de Mascotas")
     
-    clients = service.list_clients()
-    client_options = {c.name: c.id for c in clients}
-    client_id_to_name = {c.id: c.name for c in clients}
-    pets = service.list_pets()
+    has_pets = service.has_pets()
     
     col_register, col_actions = st.columns([1, 1])
     
     with col_register:
         with st.expander("➕ Registrar Nueva Mascota"):
-            if not clients:
+            if not service.has_clients():
                 st.warning("Debes registrar un cliente primero.")
             else:
+                owner = entity_picker("Dueño", "new_pet_owner", service.lookup_clients, client_label)
                 with st.form("new_pet"):
                     name = st.text_input("Nombre Mascota")
                     species = st.selectbox("Especie", ["Perro", "Gato", "Ave", "Roedor", "Otro"])
                     breed = st.text_input("Raza")
                     age = st.number_input("Edad", min_value=0, step=1)
-                    owner_name = st.selectbox("Dueño", list(client_options.keys()))
                     
                     submitted = st.form_submit_button("Guardar Mascota")
                     if submitted:
                         try:
-                            service.add_pet(name, species, breed, age, client_options[owner_name])
+                            if owner is None:
+                                raise ValueError("Selecciona el dueño.")
+                            service.add_pet(name, species, breed, age, owner.id)
                             st.success("Mascota añadida")
                             st.rerun()
                         except Exception as e:
                             st.error(f"Error: {e}")
 
         st.subheader("Historial Médico")
-        if not pets:
+        pet_to_view = None
+        if not has_pets:
             st.info("No hay mascotas registradas.")
         else:
-            pet_history_options = {f"{p.name} (ID: {p.id})": p for p in pets}
-            pet_to_view_key = st.selectbox("Seleccionar Mascota para ver Historial", 
-                                           list(pet_history_options.keys()), 
-                                           key="view_history_select_key")
-            pet_to_view = pet_history_options[pet_to_view_key]
-            
-            history = service.get_medical_history_by_pet(pet_to_view.id)
-            
-            if history:
-                df_history = pd.DataFrame(history, columns=["ID Reg.", "Fecha Cita", "Motivo", "Diagnóstico", "Tratamiento", "Notas"])
-                st.dataframe(df_history, use_container_width=True)
-            else:
-                st.info(f"'{pet_to_view.name}' no tiene historial médico registrado.")
+            pet_to_view = entity_picker("Mascota para ver Historial", "view_history_select_key",
+                                        service.lookup_pets, pet_label)
+            if pet_to_view:
+                timeline = service.get_pet_timeline(pet_to_view.id)
+                
+                if timeline.entries:
+                    col_visits, col_last, col_diag = st.columns(3)
+                    col_visits.metric("Visitas", timeline.summary.visit_count)
+                    col_last.metric("Última visita", str(timeline.summary.last_visit))
+                    col_diag.metric("Último diagnóstico", timeline.summary.last_diagnosis)
+                    df_history = pd.DataFrame(timeline.entries, columns=["ID Reg.", "Fecha Cita", "Motivo", "Diagnóstico", "Tratamiento", "Notas"])
+                    st.dataframe(df_history, use_container_width=True)
+                else:
+                    st.info(f"'{pet_to_view.name}' no tiene historial médico registrado.")
 
     with col_actions:
         st.subheader("Listado y Acciones")
         
-        if pets:
-            pet_data = [vars(p) for p in pets]
-            pet_df = pd.DataFrame(pet_data)
-            pet_df['Dueño'] = pet_df['client_id'].map(client_id_to_name)
-            st.dataframe(pet_df.drop(columns=['client_id']), use_container_width=True)
+        if has_pets:
+            paged_table("pets_table", service.pets_table)
             
             st.divider()
             st.markdown("##### 📝 Añadir Registro Médico")
             
-            all_appts = service.list_appointments()
-            target_pet_id = pet_to_view.id if 'pet_to_view' in locals() else pets[0].id
-            available_appts = [a for a in all_appts if a.pet_id == target_pet_id]
-
-            if available_appts:
-                appt_options = {f"ID {a.id} - {a.date} ({a.reason})": a.id for a in available_appts}
-                with st.form("new_medical_record_form"):
-                    selected_appt_key = st.selectbox("Asociar a Cita", 
-                                                     list(appt_options.keys()), 
-                                                     key="record_appt_select")
-                    appt_id = appt_options[selected_appt_key]
-                    diagnosis = st.text_area("Diagnóstico Principal", height=100)
-                    treatment = st.text_area("Tratamiento / Medicación", height=100)
-                    notes = st.text_area("Notas Adicionales", height=50)
-                    
-                    if st.form_submit_button("Guardar Registro"):
-                        try:
-                            service.add_medical_record(appt_id, diagnosis, treatment, notes)
-                            st.success(f"Registro añadido.")
-                            st.rerun()
-                        except Exception as e:
-                            st.error(f"Error: {e}")
+            if pet_to_view is None:
+                st.info("Selecciona una mascota para ver sus citas.")
             else:
-                st.info(f"No hay citas disponibles para esta mascota.")
+                # Las citas más recientes de la mascota (índice pet_id, date)
+                available_appts = service.list_appointments_page(
+                    limit=50, order_by="-date", filters={"pet_id": pet_to_view.id}).items
+
+                if available_appts:
+                    appt_options = {f"ID {a.id} - {a.date} ({a.reason})": a.id for a in available_appts}
+                    with st.form("new_medical_record_form"):
+                        selected_appt_key = st.selectbox("Asociar a Cita", 
+                                                         list(appt_options.keys()), 
+                                                         key="record_appt_select")
+                        appt_id = appt_options[selected_appt_key]
+                        diagnosis = st.text_area("Diagnóstico Principal", height=100)
+                        treatment = st.text_area("Tratamiento / Medicación", height=100)
+                        notes = st.text_area("Notas Adicionales", height=50)
+                        
+                        if st.form_submit_button("Guardar Registro"):
+                            try:
+                                service.add_medical_record(appt_id, diagnosis, treatment, notes)
+                                st.success(f"Registro añadido.")
+                                st.rerun()
+                            except Exception as e:
+                                st.error(f"Error: {e}")
+                else:
+                    st.info(f"No hay citas disponibles para esta mascota.")
         else:
              st.info("No hay mascotas.")
 
@@ -288,59 +484,60 @@ def show_pets():
 def show_calendar():
     st.header("📅 Calendario de Citas")
     
-    pets = service.list_pets()
-    pet_options = {f"{p.name} ({p.species})": p.id for p in pets}
-    appts = service.list_appointments()
-    
     # --- CALENDARIO VISUAL ---
-    calendar_events = []
-    for a in appts:
-        pet_name = next((p.name for p in pets if p.id == a.pet_id), "Desconocido")
-        # Color coding
-        color = "#28a745" if a.status == "Completada" else "#dc3545" # Verde o Rojo
-        if a.status == "Pendiente": color = "#ffc107" # Amarillo
-
-        calendar_events.append({
-            "title": f"{pet_name} - {a.reason}",
-            "start": str(a.date),
-            "end": str(a.date),
-            "backgroundColor": color,
-            "borderColor": color,
-            "allDay": True
-        })
+    # La navegación entre meses la controlamos aquí para cargar solo el mes visible
+    # (más un margen de precarga), no todo el historial de citas.
+    month = st.session_state.setdefault("calendar_month", date.today().replace(day=1))
+    st.markdown("### Vista Mensual")
+    col_prev, col_today, col_next = st.columns([1, 1, 1])
+    if col_prev.button("◀ Mes anterior", key="cal_prev"):
+        st.session_state["calendar_month"] = (month - timedelta(days=1)).replace(day=1)
+        st.rerun()
+    if col_today.button("Hoy", key="cal_today"):
+        st.session_state["calendar_month"] = date.today().replace(day=1)
+        st.rerun()
+    if col_next.button("Mes siguiente ▶", key="cal_next"):
+        st.session_state["calendar_month"] = (month + timedelta(days=32)).replace(day=1)
+        st.rerun()
+
+    # Una consulta con JOIN sobre el índice de fechas: el nombre de la mascota ya viene resuelto
+    window_start, window_end = service.calendar_window(month)
+    calendar_events = service.calendar_events(window_start, window_end)
 
     calendar_options = {
         "editable": True,
         "headerToolbar": {
-            "left": "today prev,next",
+            "left": "",
             "center": "title",
             "right": "dayGridMonth,timeGridWeek,listWeek",
         },
         "initialView": "dayGridMonth",
+        "initialDate": str(month),
     }
     
-    if calendar_events:
-        st.markdown("### Vista Mensual")
-        calendar(events=calendar_events, options=calendar_options)
-        st.divider()
+    # La key cambia con el mes para que el componente se vuelva a montar en la fecha nueva
+    calendar(events=calendar_events, options=calendar_options, key=f"calendar_{month}")
+    st.divider()
 
     # --- AGENDAR Y LISTAR ---
     col1, col2 = st.columns([1, 2])
     
     with col1:
         st.subheader("Agendar Cita")
-        if not pets:
+        if not service.has_pets():
             st.warning("Registra una mascota primero.")
         else:
+            pet = entity_picker("Mascota", "appt_pet_select", service.lookup_pets, pet_label)
             with st.form("appt_form"):
-                pet_name = st.selectbox("Mascota", list(pet_options.keys()), key="appt_pet_select")
                 date_val = st.date_input("Fecha")
                 reason = st.text_area("Motivo")
                 submit = st.form_submit_button("Agendar")
                 
                 if submit:
                     try:
-                        service.book_appointment(pet_options[pet_name], date_val, reason)
+                        if pet is None:
+                            raise ValueError("Selecciona una mascota.")
+                        service.book_appointment(pet.id, date_val, reason)
                         st.success("Cita agendada")
                         st.rerun()
                     except Exception as e:
@@ -348,45 +545,34 @@ def show_calendar():
 
     with col2:
         st.subheader("Listado de Citas")
-        if appts:
-            data = []
-            for a in appts:
-                p_name = next((p.name for p in pets if p.id == a.pet_id), "Desconocido")
-                data.append({"ID": a.id, "Fecha": a.date, "Mascota": p_name, "Motivo": a.reason, "Estado": a.status})
-            
-            df = pd.DataFrame(data)
-            df['Fecha'] = pd.to_datetime(df['Fecha']).dt.date
-            st.dataframe(df, use_container_width=True)
-            
-            # Eliminar Cita
+        page = paged_table("appts_table", service.appointments_table, "No hay citas programadas")
+        
+        if len(page.items):
+            # Eliminar Cita (de las visibles en la página actual)
             st.markdown("##### Cancelar Cita")
-            appt_id_to_delete = st.selectbox("Seleccionar ID", [a.id for a in appts], key="del_appt")
+            appt_id_to_delete = st.selectbox("Seleccionar ID", page.items["id"].tolist(), key="del_appt")
             if st.button("🔴 Eliminar", key="del_btn"):
                 service.delete_appointment(appt_id_to_delete)
                 st.rerun()
-        else:
-            st.info("No hay citas programadas")
 
 def show_billing():
     st.header("💰 Gestión de Facturación")
     
-    clients = service.list_clients()
-    client_options = {f"{c.name} (ID: {c.id})": c.id for c in clients}
-    client_id_to_name = {c.id: c.name for c in clients}
-    
     col_generate, col_list = st.columns([1, 2])
     
     with col_generate:
         st.subheader("Nueva Factura")
-        if clients:
+        if service.has_clients():
+            client = entity_picker("Cliente", "invoice_client_select", service.lookup_clients, client_label)
             with st.form("new_invoice_form"):
-                client_name_key = st.selectbox("Cliente", list(client_options.keys()), key="invoice_client_select")
                 invoice_date = st.date_input("Fecha", value=date.today())
                 total_amount = st.number_input("Total (€)", min_value=0.01, step=5.00)
                 
                 if st.form_submit_button("Emitir Factura"):
                     try:
-                        service.generate_invoice(client_options[client_name_key], total_amount, invoice_date) 
+                        if client is None:
+                            raise ValueError("Selecciona un cliente.")
+                        service.generate_invoice(client.id, total_amount, invoice_date) 
                         st.success("Factura generada.")
                         st.rerun()
                     except Exception as e:
@@ -396,55 +582,82 @@ def show_billing():
 
     with col_list:
         st.subheader("Historial de Facturas")
-        invoices = service.list_invoices()
-        if invoices:
-            data = [vars(i) for i in invoices]
-            df = pd.DataFrame(data)
-            df['Cliente'] = df['client_id'].map(client_id_to_name)
-            df = df.drop(columns=['client_id']).rename(columns={'total_amount': 'Monto (€)'})
-            st.dataframe(df, use_container_width=True)
+        page = paged_table("invoices_table", service.invoices_table, "No hay facturas.")
+
+        pending = page.items["id"][page.items["status"] == "Pendiente"].tolist() if len(page.items) else []
+        if pending:
+            # Cobrar una factura (de las pendientes en la página actual)
+            st.markdown("##### Registrar Cobro")
+            invoice_id_to_pay = st.selectbox("Factura pendiente", pending, key="pay_invoice")
+            if st.button("✅ Marcar como pagada", key="pay_btn"):
+                service.set_invoice_status(invoice_id_to_pay, "Pagada")
+                st.rerun()
+
+    # Analítica: lee los agregados por periodo y cliente, no recorre las facturas
+    st.divider()
+    st.subheader("Análisis de Ingresos")
+    totals = service.revenue_totals()
+    col_total, col_paid, col_outstanding = st.columns(3)
+    col_total.metric("Facturado", f"{totals.total:.2f} €")
+    col_paid.metric("Cobrado", f"{totals.paid:.2f} €")
+    col_outstanding.metric("Pendiente de cobro", f"{totals.outstanding:.2f} €")
+
+    col_chart, col_top = st.columns([2, 1])
+    with col_chart:
+        grain = st.radio("Agrupar por", ["day", "week", "month"], index=2, horizontal=True, key="revenue_grain",
+                         format_func={"day": "Día", "week": "Semana", "month": "Mes"}.get)
+        periods = service.revenue_by_period(grain)
+        st.bar_chart(pd.DataFrame({"Cobrado": [p.paid for p in periods],
+                                   "Pendiente": [p.outstanding for p in periods]},
+                                  index=[p.period for p in periods]))
+    with col_top:
+        st.markdown("##### Mejores Clientes")
+        top = service.top_clients(10)
+        if top:
+            st.dataframe(pd.DataFrame({"Cliente": [c.client_name or f"#{c.client_id}" for c in top],
+                                       "Facturas": [c.invoice_count for c in top],
+                                       "Total (€)": [c.total for c in top],
+                                       "Pendiente (€)": [c.outstanding for c in top]}),
+                         use_container_width=True, hide_index=True)
         else:
             st.info("No hay facturas.")
 
 def show_reviews():
     st.header("⭐ Reseñas")
     
-    clients = service.list_clients()
-    client_options = {f"{c.name} (ID: {c.id})": c.id for c in clients}
-    
     col_submit, col_list = st.columns([1, 2])
     
     with col_submit:
         st.subheader("Nueva Reseña")
-        if clients:
+        if service.has_clients():
+            client = entity_picker("Cliente", "review_client_select", service.lookup_clients, client_label)
             with st.form("new_review_form"):
-                client_name_key = st.selectbox("Cliente", list(client_options.keys()), key="review_client_select")
                 rating = st.slider("Nota", 1, 5, 5)
                 comment = st.text_area("Comentario")
                 
                 if st.form_submit_button("Enviar"):
-                    service.add_review(client_options[client_name_key], rating, comment) 
-                    st.success("Reseña enviada.")
-                    st.rerun()
+                    if client is None:
+                        st.error("Selecciona un cliente.")
+                    else:
+                        service.add_review(client.id, rating, comment) 
+                        st.success("Reseña enviada.")
+                        st.rerun()
         else:
             st.warning("No hay clientes.")
                         
     with col_list:
         st.subheader("Feedback Recibido")
-        reviews = service.list_reviews()
-        if reviews:
-            client_id_to_name = {c.id: c.name for c in clients}
-            data = [vars(r) for r in reviews]
-            df = pd.DataFrame(data)
-            df['Cliente'] = df['client_id'].map(client_id_to_name)
-            df['Calificación'] = df['rating'].apply(lambda x: "⭐" * x)
-            st.dataframe(df[['Cliente', 'Calificación', 'comment', 'date']], use_container_width=True)
-        else:
-            st.info("No hay reseñas.")
+        def stars(df):
+            return df.assign(rating=df["rating"].map(lambda x: "⭐" * x))
+        paged_table("reviews_table", service.reviews_table, "No hay reseñas.", format_frame=stars)
 
 # --- ENTRY POINT ---
 def main():
-    if 'user' not in st.session_state:
+    user = restore_session()
+    # La cookie se escribe (o se borra) en el primer rerun tras el login o el logout
+    if 'session_cookie_pending' in st.session_state:
+        write_session_cookie(st.session_state.pop('session_cookie_pending'))
+    if user is None:
         login_page()
     else:
         main_app()
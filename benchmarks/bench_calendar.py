@@ -0,0 +1,108 @@
+"""Benchmark de construcción de la página de calendario.
+
+Mide cuánto tarda en prepararse el contenido de `show_calendar()` (eventos del
+calendario + primera página del listado) sin navegador, sobre una base de datos
+sintética.
+
+Uso:
+    python -m benchmarks.bench_calendar                      # 10k mascotas, 100k citas
+    python -m benchmarks.bench_calendar --pets 1000 --appointments 10000 --legacy
+"""
+import argparse
+import json
+import math
+import os
+import statistics
+import tempfile
+import time
+from datetime import date
+from typing import Dict
+
+from src.database import DatabaseManager
+from src.repositories import (
+    ClientRepository, PetRepository, AppointmentRepository,
+    MedicalRecordRepository, BillingRepository, ReviewRepository
+)
+from src.seeder import DataSeeder, SyntheticProfile
+from src.services import ClinicService
+
+
+def build_dataset(db: DatabaseManager, pets: int, appointments: int, seed: int = 42) -> Dict[str, int]:
+    """Clínica sintética de unas `pets` mascotas y `appointments` citas con seeder.generate.
+
+    Los tamaños son aproximados (el generador sortea mascotas por cliente y citas por
+    mascota); devuelve las filas creadas por tabla.
+    """
+    profile = SyntheticProfile()
+    # El generador saca int(X) citas con X exponencial de media m: E[int(X)] = 1 / (e^(1/m) - 1)
+    profile.appointments_per_pet_mean = 1 / math.log1p(pets / max(1, appointments))
+    seeder = DataSeeder(ClientRepository(db), PetRepository(db), AppointmentRepository(db),
+                        MedicalRecordRepository(db), BillingRepository(db), ReviewRepository(db))
+    clients = max(1, round(pets / profile.pets_per_client()))
+    return seeder.generate(clients, seed=seed, profile=profile)
+
+
+def build_page(service: ClinicService):
+    """Preparación de datos de show_calendar() (versión actual: solo el mes visible)."""
+    events = service.calendar_events(*service.calendar_window(date.today()))
+    page = service.appointments_table(limit=25)  # la misma tabla que paged_table en show_calendar()
+    return events, page
+
+
+def build_page_full_history(service: ClinicService):
+    """Como build_page, pero enviando al calendario todas las citas del historial."""
+    events = service.calendar_events()
+    page = service.appointments_table(limit=25)
+    return events, page
+
+
+def build_page_legacy(service: ClinicService):
+    """Preparación de datos de show_calendar() antes del JOIN: O(mascotas × citas)."""
+    pets = service.list_pets()
+    appts = service.list_appointments()
+    events = []
+    for a in appts:
+        pet_name = next((p.name for p in pets if p.id == a.pet_id), "Desconocido")
+        events.append({"title": f"{pet_name} - {a.reason}", "start": str(a.date)})
+    return events
+
+
+def timed(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples), min(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pets", type=int, default=10_000)
+    parser.add_argument("--appointments", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--legacy", action="store_true",
+                        help="Mide también la versión anterior (cuadrática: usar con tamaños pequeños)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, "bench.db"), profile="fast-bulk-load")
+        db.initialize_db()
+        counts = build_dataset(db, args.pets, args.appointments)
+        service = ClinicService(ClientRepository(db), PetRepository(db), AppointmentRepository(db),
+                                MedicalRecordRepository(db), BillingRepository(db), ReviewRepository(db))
+
+        print(f"Dataset: {counts['pets']} mascotas, {counts['appointments']} citas")
+        for label, fn in [("ventana", build_page), ("historial", build_page_full_history)]:
+            median, best = timed(lambda: fn(service), args.repeat)
+            payload = len(json.dumps(fn(service)[0]))
+            print(f"show_calendar ({label:9}): mediana {median:9.1f} ms | mejor {best:9.1f} ms | "
+                  f"payload {payload / 1024:9.1f} KiB")
+        if args.legacy:
+            median, best = timed(lambda: build_page_legacy(service), 1)
+            print(f"show_calendar (legacy   ): mediana {median:9.1f} ms | mejor {best:9.1f} ms")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
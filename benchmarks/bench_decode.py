@@ -0,0 +1,53 @@
+"""Benchmark de decodificación de filas: coste por fila de convertir resultados a modelos.
+
+Decodifica N filas de facturas tal como las devuelve SQLite de tres formas:
+  - strptime + dataclass (la conversión anterior),
+  - BillingRepository._from_row (date.fromisoformat + dataclass),
+  - BillingRepository._tuple_from_row (proyección en namedtuple).
+
+Uso:
+    python -m benchmarks.bench_decode               # 100k filas
+    python -m benchmarks.bench_decode --rows 500000
+"""
+import argparse
+import time
+from datetime import date, datetime, timedelta
+
+from src.models import Invoice
+from src.repositories import BillingRepository
+
+
+def make_rows(n: int):
+    start = date(2020, 1, 1)
+    return [(i, i % 1000 + 1, str(start + timedelta(days=i % 1500)), 10.0 + i % 90, "Pagada") for i in range(n)]
+
+
+def decode_strptime(row: tuple) -> Invoice:
+    return Invoice(row[0], row[1], datetime.strptime(row[2], '%Y-%m-%d').date(), row[3], row[4])
+
+
+def run(label: str, decode, rows, baseline: float = None) -> float:
+    t0 = time.perf_counter()
+    list(map(decode, rows))
+    elapsed = time.perf_counter() - t0
+    speedup = f" | x{baseline / elapsed:5.1f}" if baseline else ""
+    print(f"{label:26}: {elapsed:8.3f} s | {elapsed / len(rows) * 1e6:6.2f} µs/fila{speedup}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    assert [decode_strptime(r) for r in rows[:1000]] == [BillingRepository._from_row(r) for r in rows[:1000]]
+
+    print(f"Decodificando {args.rows} facturas")
+    baseline = run("strptime + dataclass", decode_strptime, rows)
+    run("fromisoformat + dataclass", BillingRepository._from_row, rows, baseline)
+    run("namedtuple", BillingRepository._tuple_from_row, rows, baseline)
+
+
+if __name__ == "__main__":
+    main()
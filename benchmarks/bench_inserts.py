@@ -0,0 +1,71 @@
+"""Benchmark de inserciones: filas por segundo fila a fila vs. en bloque.
+
+Inserta citas en una base de datos temporal de tres formas:
+  - create() por fila (una transacción y un commit por fila, como antes),
+  - create() por fila dentro de un UnitOfWork (un único commit),
+  - create_many() (executemany en un único commit).
+
+Uso:
+    python -m benchmarks.bench_inserts                       # 100k filas, perfil balanced
+    python -m benchmarks.bench_inserts --rows 10000 --profile durable
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+from src.database import DatabaseManager, UnitOfWork, PRAGMA_PROFILES, DEFAULT_PROFILE
+from src.repositories import AppointmentRepository
+from src.models import Appointment
+
+
+def make_rows(n: int):
+    start = date(2020, 1, 1)
+    return [Appointment(None, i % 1000 + 1, start + timedelta(days=i % 1500), "Revisión", "Pendiente")
+            for i in range(n)]
+
+
+def insert_one_by_one(repo: AppointmentRepository, rows):
+    for appt in rows:
+        repo.create(appt)
+
+
+def insert_in_unit_of_work(repo: AppointmentRepository, rows):
+    with UnitOfWork(repo.db):
+        for appt in rows:
+            repo.create(appt)
+
+
+def insert_bulk(repo: AppointmentRepository, rows):
+    repo.create_many(rows)
+
+
+def run(label: str, fn, rows: int, profile: str):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, "bench.db"), profile=profile)
+        db.initialize_db()
+        repo = AppointmentRepository(db)
+        data = make_rows(rows)
+        t0 = time.perf_counter()
+        fn(repo, data)
+        elapsed = time.perf_counter() - t0
+        assert data[-1].id - data[0].id == rows - 1
+        db.close()
+    print(f"{label:22}: {elapsed:8.2f} s | {rows / elapsed:12,.0f} filas/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--profile", choices=list(PRAGMA_PROFILES), default=DEFAULT_PROFILE)
+    args = parser.parse_args()
+
+    print(f"Insertando {args.rows} citas (perfil {args.profile})")
+    run("create() por fila", insert_one_by_one, args.rows, args.profile)
+    run("create() + UnitOfWork", insert_in_unit_of_work, args.rows, args.profile)
+    run("create_many()", insert_bulk, args.rows, args.profile)
+
+
+if __name__ == "__main__":
+    main()
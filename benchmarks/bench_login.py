@@ -0,0 +1,78 @@
+"""Benchmark de login concurrente: latencia de AuthService.login() bajo carga.
+
+Simula el pico de las 8 de la mañana: varios hilos (sesiones) inician sesión a la
+vez y se mide la latencia de cada login. Se repite con distintos tamaños del pool
+de hashing para ver cómo el límite de concurrencia reparte la espera.
+
+Uso:
+    python -m benchmarks.bench_login                          # 32 sesiones x 4 logins, coste 12
+    python -m benchmarks.bench_login --sessions 64 --rounds 10 --workers 1 2 4 8
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from src.database import DatabaseManager
+from src.repositories import UserRepository
+from src.services import AuthService, DEFAULT_BCRYPT_ROUNDS
+
+
+def percentile(ordered, q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def run(workers: int, sessions: int, logins: int, rounds: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, "bench.db"), pool_size=8)
+        db.initialize_db()
+        auth = AuthService(UserRepository(db), rounds=rounds, max_workers=workers)
+        for i in range(sessions):
+            auth.register_user(f"vet{i}", "turno-de-mañana")
+
+        latencies = []
+        lock = threading.Lock()
+        start = threading.Barrier(sessions)
+
+        def session(i: int):
+            start.wait()
+            for _ in range(logins):
+                t0 = time.perf_counter()
+                assert auth.login(f"vet{i}", "turno-de-mañana") is not None
+                elapsed = (time.perf_counter() - t0) * 1000
+                with lock:
+                    latencies.append(elapsed)
+
+        t0 = time.perf_counter()
+        threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - t0
+        auth.close()
+        db.close()
+
+    ordered = sorted(latencies)
+    print(f"workers={workers:<3}: p50 {percentile(ordered, 0.50):8.1f} ms | p95 {percentile(ordered, 0.95):8.1f} ms | "
+          f"p99 {percentile(ordered, 0.99):8.1f} ms | media {statistics.mean(ordered):8.1f} ms | "
+          f"{len(ordered) / wall:6.1f} logins/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=32)
+    parser.add_argument("--logins", type=int, default=4, help="logins por sesión")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_BCRYPT_ROUNDS)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 4])
+    args = parser.parse_args()
+
+    print(f"{args.sessions} sesiones x {args.logins} logins concurrentes (coste bcrypt {args.rounds})")
+    for workers in args.workers:
+        run(workers, args.sessions, args.logins, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+"""Suite de benchmarks: repositorios, servicios y páginas de app.py.
+
+Genera (o reutiliza) clínicas sintéticas de varios tamaños y mide:
+  - repositories: cada consulta de lectura de los repositorios (las sondas de
+    src.query_plan.PROBES, así que toda consulta nueva entra sola en la suite),
+  - services: cada método público de ClinicService (sin caché: mide el trabajo real),
+  - pages: un rerun de cada página de app.py, ejecutada sin navegador con AppTest
+    de Streamlit (tal como la ve un usuario: con la caché del contexto caliente).
+
+Los resultados se guardan en JSON y se pueden comparar con una línea base: la
+ejecución termina con código 1 si algún caso empeora más que el umbral.
+
+Uso:
+    python -m benchmarks.suite                                  # tamaños 1k y 10k
+    python -m benchmarks.suite --sizes 1k,100k --save baseline.json
+    python -m benchmarks.suite --baseline baseline.json --threshold 0.25
+"""
+import argparse
+import inspect
+import itertools
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, asdict
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.database import DatabaseManager
+from src.models import Client, Pet, Appointment
+from src.query_plan import PROBES, build_repositories
+from src.repositories import (
+    ClientRepository, PetRepository, AppointmentRepository,
+    MedicalRecordRepository, BillingRepository, ReviewRepository, UserRepository
+)
+from src.seeder import DataSeeder, SyntheticProfile
+from src.services import ClinicService
+
+# Filas aproximadas (todas las tablas) de cada tamaño de clínica
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+DEFAULT_SIZES = "1k,10k"
+GROUPS = ("repositories", "services", "pages")
+# Fecha de referencia fija: los datos generados no cambian de un día a otro
+REFERENCE_DAY = date(2025, 6, 1)
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".data")
+
+PAGES = ["Inicio", "Clientes", "Mascotas", "Calendario & Citas", "Facturación", "Reseñas"]
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+@dataclass
+class CaseResult:
+    median_ms: float
+    p95_ms: float
+    min_ms: float
+    runs: int
+
+
+@dataclass
+class Regression:
+    name: str
+    baseline_ms: float
+    current_ms: float
+
+    @property
+    def ratio(self) -> float:
+        return self.current_ms / self.baseline_ms if self.baseline_ms else float("inf")
+
+
+# --- Casos de ClinicService ---
+# Cada caso es (preparación, llamada). La preparación no se cronometra y devuelve el
+# argumento de la llamada; `n` es un contador para no repetir datos entre ejecuciones.
+_no_setup = lambda service, n: None
+_window = ClinicService.calendar_window(REFERENCE_DAY)
+
+SERVICE_CASES: Dict[str, Tuple[Callable[[ClinicService, int], Any], Callable[[ClinicService, Any, int], Any]]] = {
+    "dashboard_stats": (_no_setup, lambda s, _, n: s.dashboard_stats(max_age=0)),
+    # Clientes
+    "add_client": (_no_setup, lambda s, _, n: s.add_client(f"Bench {n}", "bench@email.com", "600123456")),
+    "list_clients": (_no_setup, lambda s, _, n: s.list_clients()),
+    "get_client_by_id": (_no_setup, lambda s, _, n: s.get_client_by_id(1)),
+    "list_clients_page": (_no_setup, lambda s, _, n: s.list_clients_page(25)),
+    "has_clients": (_no_setup, lambda s, _, n: s.has_clients()),
+    "lookup_clients": (_no_setup, lambda s, _, n: s.lookup_clients("gar")),
+    "client_names": (_no_setup, lambda s, _, n: s.client_names(range(1, 26))),
+    "update_client": (_no_setup, lambda s, _, n: s.update_client(Client(1, f"Cliente {n}", "c@email.com", "600123456"))),
+    "delete_client": (lambda s, n: s.add_client(f"Borrar {n}", "b@email.com", "600123456").id,
+                      lambda s, client_id, n: s.delete_client(client_id)),
+    # Mascotas
+    "add_pet": (_no_setup, lambda s, _, n: s.add_pet(f"Bench {n}", "Perro", "Mestizo", 3, 1)),
+    "list_pets": (_no_setup, lambda s, _, n: s.list_pets()),
+    "list_pets_page": (_no_setup, lambda s, _, n: s.list_pets_page(25)),
+    "has_pets": (_no_setup, lambda s, _, n: s.has_pets()),
+    "lookup_pets": (_no_setup, lambda s, _, n: s.lookup_pets("lu")),
+    "list_pets_by_client": (_no_setup, lambda s, _, n: s.list_pets_by_client(1)),
+    "get_pet_by_id": (_no_setup, lambda s, _, n: s.get_pet_by_id(1)),
+    "update_pet": (_no_setup, lambda s, _, n: s.update_pet(Pet(1, "Luna", "Perro", "Mestizo", n % 15, 1))),
+    "delete_pet": (lambda s, n: s.add_pet(f"Borrar {n}", "Gato", "Persa", 1, 1).id,
+                   lambda s, pet_id, n: s.delete_pet(pet_id)),
+    # Citas y calendario
+    "book_appointment": (_no_setup, lambda s, _, n: s.book_appointment(1, REFERENCE_DAY, "Revisión")),
+    "update_appointment": (_no_setup, lambda s, _, n: s.update_appointment(
+        Appointment(1, 1, REFERENCE_DAY, f"Revisión {n}", "Pendiente"))),
+    "get_appointment_by_id": (_no_setup, lambda s, _, n: s.get_appointment_by_id(1)),
+    "list_appointments": (_no_setup, lambda s, _, n: s.list_appointments()),
+    "list_appointments_page": (_no_setup, lambda s, _, n: s.list_appointments_page(25)),
+    "list_appointments_with_details": (_no_setup, lambda s, _, n: s.list_appointments_with_details()),
+    "list_appointment_details_page": (_no_setup, lambda s, _, n: s.list_appointment_details_page(25)),
+    "list_appointments_between": (_no_setup, lambda s, _, n: s.list_appointments_between(*_window)),
+    "calendar_window": (_no_setup, lambda s, _, n: s.calendar_window(REFERENCE_DAY)),
+    "calendar_events": (_no_setup, lambda s, _, n: s.calendar_events(*_window)),
+    "delete_appointment": (lambda s, n: s.book_appointment(1, REFERENCE_DAY, "Borrar").id,
+                           lambda s, appt_id, n: s.delete_appointment(appt_id)),
+    # Historial, facturación y reseñas
+    "add_medical_record": (_no_setup, lambda s, _, n: s.add_medical_record(1, "Sano", "Ninguno")),
+    "complete_appointment": (lambda s, n: s.book_appointment(1, REFERENCE_DAY, "Cerrar").id,
+                             lambda s, appt_id, n: s.complete_appointment(appt_id, "Sano", "Ninguno", amount=30.0)),
+    "get_medical_history_by_pet": (_no_setup, lambda s, _, n: s.get_medical_history_by_pet(1)),
+    "get_pet_timeline": (_no_setup, lambda s, _, n: s.get_pet_timeline(1)),
+    "pet_summaries": (_no_setup, lambda s, _, n: s.pet_summaries(range(1, 26))),
+    "generate_invoice": (_no_setup, lambda s, _, n: s.generate_invoice(1, 30.0, REFERENCE_DAY)),
+    "list_invoices": (_no_setup, lambda s, _, n: s.list_invoices()),
+    "list_invoices_page": (_no_setup, lambda s, _, n: s.list_invoices_page(25)),
+    "set_invoice_status": (_no_setup, lambda s, _, n: s.set_invoice_status(1, ("Pendiente", "Pagada")[n % 2])),
+    "add_review": (_no_setup, lambda s, _, n: s.add_review(1, 5, "Bien")),
+    "list_reviews": (_no_setup, lambda s, _, n: s.list_reviews()),
+    "list_reviews_page": (_no_setup, lambda s, _, n: s.list_reviews_page(25)),
+    # Búsqueda de texto completo
+    "search": (_no_setup, lambda s, _, n: s.search("luna")),
+    # Tablas de la interfaz (DataFrames)
+    "clients_table": (_no_setup, lambda s, _, n: s.clients_table(25)),
+    "pets_table": (_no_setup, lambda s, _, n: s.pets_table(25)),
+    "appointments_table": (_no_setup, lambda s, _, n: s.appointments_table(25)),
+    "invoices_table": (_no_setup, lambda s, _, n: s.invoices_table(25)),
+    "reviews_table": (_no_setup, lambda s, _, n: s.reviews_table(25)),
+    # Analítica de facturación
+    "revenue_by_period": (_no_setup, lambda s, _, n: s.revenue_by_period("day", end=REFERENCE_DAY)),
+    "revenue_totals": (_no_setup, lambda s, _, n: s.revenue_totals()),
+    "top_clients": (_no_setup, lambda s, _, n: s.top_clients(10)),
+    "client_revenue": (_no_setup, lambda s, _, n: s.client_revenue(1)),
+}
+
+
+def uncovered_service_methods() -> List[str]:
+    """Métodos públicos de ClinicService que aún no tienen caso en SERVICE_CASES."""
+    public = [name for name, _ in inspect.getmembers(ClinicService, callable) if not name.startswith("_")]
+    return sorted(set(public) - set(SERVICE_CASES))
+
+
+# --- Medición ---
+def measure(fn: Callable[[int], Any], setup: Optional[Callable[[int], Any]] = None,
+            min_runs: int = 3, max_runs: int = 50, max_seconds: float = 1.0) -> CaseResult:
+    """Ejecuta `fn` hasta `max_runs` veces o `max_seconds` (al menos `min_runs`)."""
+    samples: List[float] = []
+    counter = itertools.count()
+    deadline = time.perf_counter() + max_seconds
+    while len(samples) < max_runs and (len(samples) < min_runs or time.perf_counter() < deadline):
+        n = next(counter)
+        arg = setup(n) if setup else None
+        t0 = time.perf_counter()
+        fn(arg, n) if setup else fn(n)
+        samples.append((time.perf_counter() - t0) * 1000)
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return CaseResult(round(statistics.median(samples), 4), round(p95, 4), round(ordered[0], 4), len(samples))
+
+
+# --- Datos ---
+def dataset(size: str, data_dir: str = DATA_DIR, seed: int = 42) -> str:
+    """Ruta de la clínica sintética de `size`; se genera solo la primera vez."""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"clinic_{size}_seed{seed}_{REFERENCE_DAY}.db")
+    if os.path.exists(path):
+        return path
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    db = DatabaseManager(tmp_path, profile="fast-bulk-load")
+    db.initialize_db()
+    seeder = DataSeeder(ClientRepository(db), PetRepository(db), AppointmentRepository(db),
+                        MedicalRecordRepository(db), BillingRepository(db), ReviewRepository(db),
+                        UserRepository(db))
+    clients = max(1, round(SIZES[size] / SyntheticProfile().rows_per_client()))
+    seeder.generate(clients, seed=seed, today=REFERENCE_DAY)
+    db.close()
+    os.replace(tmp_path, path)
+    return path
+
+
+def _working_copy(path: str, tmp_dir: str, name: str) -> str:
+    """Copia desechable: los casos de escritura no alteran el dataset guardado."""
+    copy_path = os.path.join(tmp_dir, name)
+    shutil.copyfile(path, copy_path)
+    return copy_path
+
+
+# --- Grupos ---
+def bench_repositories(db_path: str, **opts) -> Dict[str, CaseResult]:
+    db = DatabaseManager(db_path)
+    repos = build_repositories(db)
+    results = {label: measure(lambda n, probe=probe: probe(repos), **opts) for label, probe in PROBES}
+    db.close()
+    return results
+
+
+def bench_services(db_path: str, **opts) -> Dict[str, CaseResult]:
+    db = DatabaseManager(db_path)
+    service = ClinicService(ClientRepository(db), PetRepository(db), AppointmentRepository(db),
+                            MedicalRecordRepository(db), BillingRepository(db), ReviewRepository(db),
+                            build_repositories(db)["stats"])
+    results = {}
+    for name, (setup, call) in SERVICE_CASES.items():
+        if setup is _no_setup:
+            results[name] = measure(lambda n, call=call: call(service, None, n), **opts)
+        else:
+            results[name] = measure(lambda arg, n, call=call: call(service, arg, n),
+                                    setup=lambda n, setup=setup: setup(service, n), **opts)
+    db.close()
+    return results
+
+
+def bench_pages(db_path: str, **opts) -> Dict[str, CaseResult]:
+    """Cada página de app.py ejecutada con AppTest (sin navegador), ya con sesión iniciada."""
+    from streamlit import logger as streamlit_logger
+    from streamlit.testing.v1 import AppTest
+
+    previous_db = os.environ.get("VETMANAGER_DB")
+    os.environ["VETMANAGER_DB"] = db_path
+    try:
+        at = AppTest.from_file(APP_PATH, default_timeout=600).run()
+        # Avisos de deprecación de Streamlit en cada rerun: ruido en la salida de la suite
+        streamlit_logger.set_log_level("error")
+        at.text_input[0].input("admin")
+        at.text_input[1].input("admin123")
+        at.button[0].click().run()
+        if at.exception:
+            raise RuntimeError(f"No se pudo iniciar sesión en app.py: {at.exception}")
+
+        results = {}
+        for page in PAGES:
+            at.sidebar.radio[0].set_value(page).run()  # primera visita (calienta la caché)
+            if at.exception:
+                raise RuntimeError(f"La página {page} falló: {at.exception}")
+            results[page] = measure(lambda n: at.run(), **opts)
+        return results
+    finally:
+        if previous_db is None:
+            os.environ.pop("VETMANAGER_DB", None)
+        else:
+            os.environ["VETMANAGER_DB"] = previous_db
+
+
+BENCHES = {"repositories": bench_repositories, "services": bench_services, "pages": bench_pages}
+
+
+def run_suite(sizes: List[str], groups: List[str], data_dir: str = DATA_DIR, seed: int = 42,
+              progress: Callable[[str], None] = lambda msg: None, **opts) -> Dict[str, CaseResult]:
+    """Devuelve {"<tamaño>/<grupo>/<caso>": resultado}."""
+    results: Dict[str, CaseResult] = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in sizes:
+            progress(f"Dataset {size}...")
+            path = dataset(size, data_dir, seed)
+            for group in groups:
+                progress(f"  {size}/{group}")
+                work = _working_copy(path, tmp_dir, f"{size}_{group}.db")
+                for case, result in BENCHES[group](work, **opts).items():
+                    results[f"{size}/{group}/{case}"] = result
+    return results
+
+
+# --- Línea base ---
+def save_results(path: str, results: Dict[str, CaseResult], meta: Dict[str, Any]):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": {name: asdict(r) for name, r in results.items()}},
+                  f, indent=2, ensure_ascii=False)
+
+
+def load_results(path: str) -> Dict[str, CaseResult]:
+    with open(path, encoding="utf-8") as f:
+        return {name: CaseResult(**r) for name, r in json.load(f)["results"].items()}
+
+
+def compare(results: Dict[str, CaseResult], baseline: Dict[str, CaseResult],
+            threshold: float = 0.2, noise_floor_ms: float = 0.5) -> List[Regression]:
+    """Casos cuya mediana supera la de la línea base en más de `threshold` (0.2 = +20 %).
+
+    Las diferencias absolutas por debajo de `noise_floor_ms` se ignoran: en consultas de
+    microsegundos el ruido del sistema supera con facilidad el 20 %.
+    """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if (current.median_ms > base.median_ms * (1 + threshold)
+                and current.median_ms - base.median_ms > noise_floor_ms):
+            regressions.append(Regression(name, base.median_ms, current.median_ms))
+    return sorted(regressions, key=lambda r: r.ratio, reverse=True)
+
+
+def _meta(args) -> Dict[str, Any]:
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "sizes": args.sizes.split(","),
+        "seed": args.seed,
+        "reference_day": str(REFERENCE_DAY),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"Tamaños separados por comas ({', '.join(SIZES)})")
+    parser.add_argument("--groups", default=",".join(GROUPS), help="Grupos separados por comas")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Dónde se guardan los datasets generados")
+    parser.add_argument("--max-seconds", type=float, default=1.0, help="Tiempo máximo por caso")
+    parser.add_argument("--save", help="Guardar los resultados en este JSON")
+    parser.add_argument("--baseline", help="JSON de una ejecución anterior con el que comparar")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Empeoramiento tolerado (0.2 = +20 %%)")
+    parser.add_argument("--noise-floor-ms", type=float, default=0.5, help="Diferencia mínima que cuenta como regresión")
+    args = parser.parse_args(argv)
+
+    sizes, groups = args.sizes.split(","), args.groups.split(",")
+    unknown = [s for s in sizes if s not in SIZES] + [g for g in groups if g not in GROUPS]
+    if unknown:
+        parser.error(f"Tamaño o grupo desconocido: {', '.join(unknown)}")
+    missing = uncovered_service_methods()
+    if missing:
+        print(f"Aviso: métodos de ClinicService sin benchmark: {', '.join(missing)}")
+
+    results = run_suite(sizes, groups, args.data_dir, args.seed, progress=print, max_seconds=args.max_seconds)
+
+    width = max(len(name) for name in results)
+    print(f"\n{'caso':{width}}  {'mediana':>10}  {'p95':>10}  {'ejec.':>5}")
+    for name, r in results.items():
+        print(f"{name:{width}}  {r.median_ms:8.3f}ms  {r.p95_ms:8.3f}ms  {r.runs:5d}")
+
+    if args.save:
+        save_results(args.save, results, _meta(args))
+        print(f"\nResultados guardados en {args.save}")
+
+    if args.baseline:
+        regressions = compare(results, load_results(args.baseline), args.threshold, args.noise_floor_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regresión(es) por encima del {args.threshold:.0%}:")
+            for r in regressions:
+                print(f"  {r.name}: {r.baseline_ms:.3f}ms -> {r.current_ms:.3f}ms (x{r.ratio:.2f})")
+            return 1
+        print(f"\nSin regresiones respecto a {args.baseline} (umbral {args.threshold:.0%}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
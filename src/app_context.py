@@ -0,0 +1,135 @@
+import atexit
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+from src.database import DatabaseManager
+from src.repositories import (
+    ClientRepository, PetRepository, AppointmentRepository,
+    MedicalRecordRepository, BillingRepository, ReviewRepository, UserRepository,
+    StatsRepository
+)
+from src.services import ClinicService, AuthService, DEFAULT_BCRYPT_ROUNDS, DEFAULT_HASH_WORKERS
+from src.cache import EntityCache
+from src.query_stats import QueryStats
+from src.seeder import DataSeeder
+from src.utils import logger
+
+@dataclass
+class AppContext:
+    """Composition root: todo lo que la app necesita, construido una vez por proceso."""
+    db: DatabaseManager
+    client_repo: ClientRepository
+    pet_repo: PetRepository
+    appt_repo: AppointmentRepository
+    mr_repo: MedicalRecordRepository
+    bill_repo: BillingRepository
+    review_repo: ReviewRepository
+    user_repo: UserRepository
+    stats_repo: StatsRepository
+    service: ClinicService
+    auth_service: AuthService
+    cache: EntityCache
+    # Milisegundos de cada fase del arranque en frío
+    startup_timings: Dict[str, float] = field(default_factory=dict)
+    # Estadísticas por sentencia SQL (solo si la instrumentación está activada)
+    query_stats: Optional[QueryStats] = None
+
+    def close(self):
+        """Detiene el pool de hashing y cierra las conexiones."""
+        self.auth_service.close()
+        self.db.close()
+
+
+def query_stats_from_env() -> Optional[QueryStats]:
+    """Instrumentación de consultas según el entorno (apagada por defecto).
+
+    VETMANAGER_QUERY_STATS=1 la activa; VETMANAGER_SLOW_QUERY_MS fija el umbral del log
+    de consultas lentas (100 ms por defecto).
+    """
+    if os.environ.get("VETMANAGER_QUERY_STATS", "").lower() not in ("1", "true", "yes"):
+        return None
+    return QueryStats(slow_ms=float(os.environ.get("VETMANAGER_SLOW_QUERY_MS", "100")))
+
+
+def build_app_context(db_name: str = "veterinaria_final.db", seed: bool = True, **db_options) -> AppContext:
+    """Construye el contexto desde cero: esquema, repositorios, servicios, seeding y admin."""
+    db_options.setdefault("query_stats", query_stats_from_env())
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+
+    def lap(phase: str, since: float) -> float:
+        now = time.perf_counter()
+        timings[phase] = (now - since) * 1000
+        return now
+
+    t = started
+    db = DatabaseManager(db_name, **db_options)
+    db.initialize_db()
+    t = lap("schema", t)
+
+    # Inicialización de Repositorios y Servicios
+    client_repo = ClientRepository(db)
+    pet_repo = PetRepository(db)
+    appt_repo = AppointmentRepository(db)
+    mr_repo = MedicalRecordRepository(db)
+    bill_repo = BillingRepository(db)
+    review_repo = ReviewRepository(db)
+    user_repo = UserRepository(db)
+    stats_repo = StatsRepository(db)
+    cache = EntityCache(version_source=stats_repo.data_versions)
+    service = ClinicService(client_repo, pet_repo, appt_repo, mr_repo, bill_repo, review_repo, stats_repo, cache)
+    auth_service = AuthService(user_repo, rounds=int(os.environ.get("VETMANAGER_BCRYPT_ROUNDS", DEFAULT_BCRYPT_ROUNDS)),
+                               max_workers=int(os.environ.get("VETMANAGER_HASH_WORKERS", DEFAULT_HASH_WORKERS)))
+    t = lap("wiring", t)
+
+    # --- Carga de Datos Iniciales (Seeding) ---
+    # Usamos el Seeder dedicado en lugar del servicio para cumplir SOLID (SRP)
+    if seed:
+        DataSeeder(client_repo, pet_repo, appt_repo, mr_repo, bill_repo, review_repo).seed()
+    t = lap("seed", t)
+
+    # Asegurar admin
+    auth_service.create_admin_if_not_exists()
+    auth_service.purge_expired_sessions()
+    lap("admin", t)
+    timings["total"] = (time.perf_counter() - started) * 1000
+
+    breakdown = ", ".join(f"{phase}={ms:.1f}ms" for phase, ms in timings.items())
+    logger.info(f"Arranque en frío del contexto de la app: {breakdown}")
+
+    return AppContext(db, client_repo, pet_repo, appt_repo, mr_repo, bill_repo, review_repo,
+                      user_repo, stats_repo, service, auth_service, cache, timings, db.query_stats)
+
+
+_contexts: Dict[str, AppContext] = {}
+_contexts_lock = threading.Lock()
+
+
+def get_app_context(db_name: str = "veterinaria_final.db", **options) -> AppContext:
+    """Devuelve el contexto compartido del proceso, construyéndolo solo la primera vez.
+
+    Streamlit vuelve a ejecutar app.py en cada interacción, pero los módulos de `src`
+    no se reimportan: el contexto sobrevive a los reruns y se comparte entre sesiones.
+    """
+    ctx = _contexts.get(db_name)
+    if ctx is not None:
+        return ctx
+    with _contexts_lock:
+        # Otro hilo (otra sesión) pudo construirlo mientras esperábamos el lock
+        if db_name not in _contexts:
+            _contexts[db_name] = build_app_context(db_name, **options)
+        return _contexts[db_name]
+
+
+def close_app_contexts():
+    """Cierra los contextos compartidos del proceso (se registra con atexit)."""
+    with _contexts_lock:
+        contexts = list(_contexts.values())
+        _contexts.clear()
+    for ctx in contexts:
+        ctx.close()
+
+
+atexit.register(close_app_contexts)
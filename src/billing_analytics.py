@@ -0,0 +1,175 @@
+"""Analítica de facturación sobre los agregados que mantienen los triggers (migración 9).
+
+Ingresos por día, semana y mes, por cliente, cobrado frente a pendiente y mejores
+clientes. Ninguna consulta agrupa las facturas: un rango de N periodos lee las filas
+agregadas de esos N periodos (una por estado), haya las facturas que haya.
+
+Reconstrucción de los agregados (tras cargar facturas con los triggers desactivados,
+o para comprobar que no se han desviado):
+    python -m src.billing_analytics ruta/a/la.db           # recalcula
+    python -m src.billing_analytics ruta/a/la.db --check   # solo compara
+"""
+import sys
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+from src.database import DatabaseManager, UnitOfWork
+from src.migrations import REVENUE_BACKFILL, REVENUE_PERIODS
+from src.models import ClientRevenue, RevenuePeriod
+
+PAID_STATUS = "Pagada"
+INVOICE_STATUSES = ("Pendiente", PAID_STATUS)
+GRAINS = tuple(REVENUE_PERIODS)
+# Periodos que muestra cada granularidad si no se indica el rango, y máximo por consulta
+DEFAULT_PERIODS = {"day": 30, "week": 12, "month": 12}
+MAX_PERIODS = 1000
+
+
+def period_key(grain: str, day: date) -> str:
+    """Clave del periodo que contiene `day`, igual que la calculan los triggers."""
+    if grain == "day":
+        return day.isoformat()
+    if grain == "week":
+        return (day - timedelta(days=day.weekday())).isoformat()
+    if grain == "month":
+        return day.strftime("%Y-%m")
+    raise ValueError(f"Granularidad desconocida: '{grain}'. Usa una de {', '.join(GRAINS)}.")
+
+
+def period_keys(grain: str, start: date, end: date) -> List[str]:
+    """Claves de todos los periodos entre `start` y `end` (ambos incluidos), en orden."""
+    keys = []
+    if grain == "month":
+        year, month = start.year, start.month
+        while (year, month) <= (end.year, end.month):
+            keys.append(f"{year:04d}-{month:02d}")
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return keys
+    step = timedelta(days=7 if grain == "week" else 1)
+    current = date.fromisoformat(period_key(grain, start))
+    while current <= end:
+        keys.append(current.isoformat())
+        current += step
+    return keys
+
+
+def periods_back(grain: str, end: date, count: int) -> date:
+    """Fecha de inicio para que el rango hasta `end` abarque `count` periodos."""
+    if grain == "month":
+        months = end.year * 12 + end.month - 1 - (count - 1)
+        return date(months // 12, months % 12 + 1, 1)
+    step = 7 if grain == "week" else 1
+    return date.fromisoformat(period_key(grain, end)) - timedelta(days=step * (count - 1))
+
+
+def _amounts(count: int, total_cents: int, paid_cents: int) -> Dict[str, float]:
+    return {"invoice_count": count, "total": total_cents / 100, "paid": paid_cents / 100,
+            "outstanding": (total_cents - paid_cents) / 100}
+
+
+class BillingAnalyticsRepository:
+    """Lecturas de revenue_by_period / revenue_by_client (las escribe solo el trigger de
+    invoices, así que cualquier alta, cambio de estado o borrado ya está incluido)."""
+
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+
+    def revenue_by_period(self, grain: str, first_period: str, last_period: str) -> List[RevenuePeriod]:
+        """Periodos con facturas entre `first_period` y `last_period` (claves incluidas)."""
+        if grain not in REVENUE_PERIODS:
+            raise ValueError(f"Granularidad desconocida: '{grain}'. Usa una de {', '.join(GRAINS)}.")
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT period, SUM(invoice_count), SUM(total_cents),
+                       SUM(CASE WHEN status = ? THEN total_cents ELSE 0 END)
+                FROM revenue_by_period
+                WHERE grain = ? AND period BETWEEN ? AND ?
+                GROUP BY period ORDER BY period
+            """, (PAID_STATUS, grain, first_period, last_period))
+            return [RevenuePeriod(row[0], **_amounts(*row[1:])) for row in cursor.fetchall()]
+
+    def totals(self) -> RevenuePeriod:
+        """Total histórico, a partir de los agregados mensuales (una fila por mes y estado)."""
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT COALESCE(SUM(invoice_count), 0), COALESCE(SUM(total_cents), 0),
+                       COALESCE(SUM(CASE WHEN status = ? THEN total_cents ELSE 0 END), 0)
+                FROM revenue_by_period WHERE grain = 'month'
+            """, (PAID_STATUS,))
+            return RevenuePeriod("total", **_amounts(*cursor.fetchone()))
+
+    _CLIENT_SELECT = """
+        SELECT r.client_id, c.name, SUM(r.invoice_count), SUM(r.total_cents),
+               SUM(CASE WHEN r.status = ? THEN r.total_cents ELSE 0 END)
+        FROM revenue_by_client r LEFT JOIN clients c ON c.id = r.client_id
+    """
+
+    def top_clients(self, limit: int = 10) -> List[ClientRevenue]:
+        """Clientes con más facturado. Recorre una fila por cliente y estado, no las facturas."""
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self._CLIENT_SELECT + " GROUP BY r.client_id ORDER BY SUM(r.total_cents) DESC LIMIT ?",
+                           (PAID_STATUS, limit))
+            return [ClientRevenue(row[0], row[1], **_amounts(*row[2:])) for row in cursor.fetchall()]
+
+    def client_revenue(self, client_id: int) -> Optional[ClientRevenue]:
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self._CLIENT_SELECT + " WHERE r.client_id = ? GROUP BY r.client_id",
+                           (PAID_STATUS, client_id))
+            row = cursor.fetchone()
+            return ClientRevenue(row[0], row[1], **_amounts(*row[2:])) if row else None
+
+    def _snapshot(self, conn) -> tuple:
+        return (conn.execute("SELECT * FROM revenue_by_period ORDER BY grain, period, status").fetchall(),
+                conn.execute("SELECT * FROM revenue_by_client ORDER BY client_id, status").fetchall())
+
+    def rebuild(self) -> int:
+        """Recalcula los agregados desde las facturas (en una transacción). Devuelve las filas."""
+        with UnitOfWork(self.db) as uow:
+            for statement in REVENUE_BACKFILL:
+                uow.conn.execute(statement)
+            # Los agregados cuentan como datos de facturas: la caché de lecturas debe releerlos
+            uow.conn.execute("UPDATE data_versions SET version = version + 1 WHERE table_name = 'invoices'")
+            return sum(len(rows) for rows in self._snapshot(uow.conn))
+
+    def is_consistent(self) -> bool:
+        """True si los agregados coinciden con recalcularlos (no deja nada modificado)."""
+        with self.db.connection() as conn:
+            current = self._snapshot(conn)
+            # Se recalcula dentro de un savepoint y se deshace: vale también dentro de otra transacción
+            conn.execute("SAVEPOINT revenue_check")
+            try:
+                for statement in REVENUE_BACKFILL:
+                    conn.execute(statement)
+                return self._snapshot(conn) == current
+            finally:
+                conn.execute("ROLLBACK TO revenue_check")
+                conn.execute("RELEASE revenue_check")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0].startswith("-"):
+        print(__doc__)
+        return 2
+    db = DatabaseManager(argv[0])
+    db.initialize_db()  # aplica la migración 9 si la BD es anterior
+    analytics = BillingAnalyticsRepository(db)
+    try:
+        if "--check" in argv[1:]:
+            ok = analytics.is_consistent()
+            print("Agregados de facturación al día." if ok else "Los agregados NO coinciden con las facturas.")
+            return 0 if ok else 1
+        started = time.perf_counter()
+        rows = analytics.rebuild()
+        print(f"Agregados de facturación reconstruidos: {rows} filas en {time.perf_counter() - started:.2f} s")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
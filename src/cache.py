@@ -0,0 +1,245 @@
+import copy
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, fields, is_dataclass
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, Optional, Set, Tuple
+import pandas as pd
+
+# Una dependencia es el nombre de una tabla ("pets") para consultas sobre la tabla,
+# o (tabla, id) para una entidad concreta.
+Dependency = Hashable
+
+# Ámbito (p.ej. la página de la app) al que se atribuyen las lecturas del hilo actual
+_current_scope: ContextVar[Optional[str]] = ContextVar("cache_scope", default=None)
+
+
+@dataclass
+class CacheStats:
+    """Métricas acumuladas de la caché."""
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    invalidations: int
+    entries: int
+    approx_bytes: int
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+@dataclass
+class ScopeStats:
+    """Aciertos y fallos de la caché dentro de un ámbito (ver EntityCache.scope)."""
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+@dataclass
+class _Entry:
+    value: Any
+    deps: Tuple[Dependency, ...]
+    expires_at: float
+    size: int
+    stamp: Tuple[int, ...] = ()  # versiones de datos de la BD al cargarla (ver EntityCache)
+
+
+def _approx_size(value: Any) -> int:
+    """Estimación barata del tamaño en memoria (muestrea las listas largas)."""
+    if isinstance(value, (list, tuple)):
+        if not value:
+            return sys.getsizeof(value)
+        sample = value[:16]
+        per_item = sum(_approx_size(item) for item in sample) / len(sample)
+        return sys.getsizeof(value) + int(per_item * len(value))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    size = sys.getsizeof(value)  # un DataFrame ya cuenta aquí su contenido
+    if hasattr(value, "__dict__"):
+        size += sum(_approx_size(v) for v in vars(value).values())
+    elif hasattr(value, "__slots__"):
+        size += sum(sys.getsizeof(getattr(value, name, None)) for name in value.__slots__)
+    return size
+
+
+def _copy_value(value: Any) -> Any:
+    """Copia superficial para que quien lee no pueda modificar lo que está en caché.
+
+    Las listas y los contenedores dataclass (Page, PetTimeline) se copian un nivel más.
+    Los DataFrame se copian sin duplicar sus datos: con copy-on-write (pandas >= 3) la
+    copia comparte los arrays y solo los duplica si quien lee la modifica.
+    """
+    if isinstance(value, pd.DataFrame):
+        return value.copy(deep=False)
+    if isinstance(value, list):
+        return [copy.copy(item) for item in value]
+    copied = copy.copy(value)
+    if is_dataclass(value) and not isinstance(value, type):
+        for f in fields(value):
+            object.__setattr__(copied, f.name, _copy_value(getattr(value, f.name)))
+    return copied
+
+
+class EntityCache:
+    """Caché en proceso LRU + TTL con límite de memoria e invalidación por dependencias.
+
+    Cada entrada declara de qué depende; `invalidate()` borra las entradas afectadas.
+    Para que una lectura lenta no pueda guardar datos viejos después de una escritura,
+    cada dependencia tiene un contador de generación (su versión de datos, ver
+    `versions()`): la carga anota las generaciones antes de consultar la BD y solo
+    guarda el resultado si nadie las cambió mientras tanto.
+
+    Esas generaciones solo ven las escrituras de este proceso. Con `version_source`
+    (p.ej. StatsRepository.data_versions: tabla -> versión, mantenida por triggers)
+    cada lectura compara además las versiones de la BD de las tablas de sus dependencias
+    con las que había al cargar la entrada; si otro proceso escribió, es un fallo.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = 300.0, max_bytes: int = 64 * 1024 * 1024,
+                 version_source: Optional[Callable[[], Dict[str, int]]] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.version_source = version_source
+
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._by_dep: Dict[Dependency, Set[Hashable]] = {}
+        self._generations: Dict[Dependency, int] = {}
+        self._bytes = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+        self._scopes: Dict[str, ScopeStats] = {}
+
+    def get_or_load(self, key: Hashable, deps: Iterable[Dependency], loader: Callable[[], Any]) -> Any:
+        """Devuelve el valor en caché o lo carga con `loader` (fuera del lock)."""
+        deps = tuple(deps)
+        stamp = self._stamp(deps)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.stamp != stamp:
+                    # Otra conexión (u otro proceso) escribió en sus tablas
+                    self._remove(key)
+                    self._invalidations += 1
+                elif entry.expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    self._count_in_scope(hit=True)
+                    return _copy_value(entry.value)
+                else:
+                    self._remove(key)
+                    self._expirations += 1
+            self._misses += 1
+            self._count_in_scope(hit=False)
+            generations = [self._generations.get(dep, 0) for dep in deps]
+
+        value = loader()
+
+        with self._lock:
+            # Si hubo una escritura durante la carga, el valor puede ser viejo: no se guarda
+            # (las versiones de la BD se leyeron antes de cargar: si cambian durante la carga,
+            # la siguiente lectura ya no coincide y vuelve a cargar)
+            if generations == [self._generations.get(dep, 0) for dep in deps]:
+                self._store(key, deps, value, stamp)
+        return _copy_value(value)
+
+    def invalidate(self, *deps: Dependency):
+        """Descarta todo lo que dependa de `deps`. Llamar DESPUÉS de confirmar la escritura."""
+        with self._lock:
+            for dep in deps:
+                self._generations[dep] = self._generations.get(dep, 0) + 1
+                for key in list(self._by_dep.get(dep, ())):
+                    self._remove(key)
+                    self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+            # Subir todas las generaciones invalida también las cargas en curso
+            for dep in self._generations:
+                self._generations[dep] += 1
+
+    def versions(self, deps: Iterable[Dependency]) -> Tuple[int, ...]:
+        """Versión de datos de cada dependencia: sube con cada invalidate() que la incluye."""
+        with self._lock:
+            return tuple(self._generations.get(dep, 0) for dep in deps)
+
+    @contextmanager
+    def scope(self, name: str) -> Iterator[None]:
+        """Atribuye a `name` los aciertos y fallos de las lecturas hechas dentro del bloque
+        (en este hilo), p.ej. una página de la app. Ver `scope_stats()`."""
+        token = _current_scope.set(name)
+        try:
+            yield
+        finally:
+            _current_scope.reset(token)
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(self._hits, self._misses, self._evictions, self._expirations,
+                              self._invalidations, len(self._entries), self._bytes)
+
+    def scope_stats(self) -> Dict[str, ScopeStats]:
+        with self._lock:
+            return {name: ScopeStats(s.hits, s.misses) for name, s in self._scopes.items()}
+
+    def _stamp(self, deps: Tuple[Dependency, ...]) -> Tuple[int, ...]:
+        """Versiones en la BD de las tablas de `deps` (sin `version_source`, vacío)."""
+        if self.version_source is None:
+            return ()
+        versions = self.version_source()
+        return tuple(versions.get(dep if isinstance(dep, str) else dep[0], 0) for dep in deps)
+
+    # --- Internos (llamar con el lock tomado) ---
+    def _count_in_scope(self, hit: bool):
+        name = _current_scope.get()
+        if name is None:
+            return
+        stats = self._scopes.setdefault(name, ScopeStats())
+        if hit:
+            stats.hits += 1
+        else:
+            stats.misses += 1
+
+    def _store(self, key: Hashable, deps: Tuple[Dependency, ...], value: Any, stamp: Tuple[int, ...] = ()):
+        if key in self._entries:
+            self._remove(key)
+        size = _approx_size(value)
+        if size > self.max_bytes:
+            return  # No cabe: mejor no cachearlo que vaciar la caché entera
+        self._entries[key] = _Entry(value, deps, time.monotonic() + self.ttl, size, stamp)
+        self._bytes += size
+        for dep in deps:
+            self._by_dep.setdefault(dep, set()).add(key)
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._evictions += 1
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        for dep in entry.deps:
+            keys = self._by_dep.get(dep)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_dep[dep]
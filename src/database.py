@@ -1,45 +1,429 @@
 import sqlite3
 import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, Optional
 from src.utils import logger
+from src.migrations import apply_migrations
+from src.query_stats import QueryStats, InstrumentedConnection
+
+
+# --- Perfiles de rendimiento (PRAGMAs aplicados a cada conexión del pool) ---
+# WAL permite lectores concurrentes mientras alguien escribe (evita "database is locked").
+# cache_size negativo = KiB; mmap_size en bytes; busy_timeout en milisegundos.
+PRAGMA_PROFILES: Dict[str, Dict[str, Any]] = {
+    # Máxima seguridad ante cortes de luz: fsync en cada commit.
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -16000,
+        "mmap_size": 0,
+        "temp_store": "MEMORY",
+        "busy_timeout": 10000,
+    },
+    # Uso normal de la clínica: en WAL, NORMAL solo arriesga la última transacción ante un corte.
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -32000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    # Cargas masivas (seeding, importaciones, benchmarks): sin fsync, caché grande.
+    "fast-bulk-load": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -131072,
+        "mmap_size": 1073741824,
+        "temp_store": "MEMORY",
+        "busy_timeout": 30000,
+    },
+}
+
+DEFAULT_PROFILE = "balanced"
+
+# PRAGMAs que SQLite devuelve como enteros al consultarlos
+_PRAGMA_ENUMS = {
+    "synchronous": {"OFF": 0, "NORMAL": 1, "FULL": 2, "EXTRA": 3},
+    "temp_store": {"DEFAULT": 0, "FILE": 1, "MEMORY": 2},
+}
+# PRAGMAs que no tienen efecto en una base de datos en memoria
+_FILE_ONLY_PRAGMAS = {"journal_mode", "mmap_size"}
+
+
+def _normalize_pragma(name: str, value: Any) -> Any:
+    """Lleva un valor de PRAGMA a la forma en que SQLite lo reporta."""
+    if name in _PRAGMA_ENUMS and isinstance(value, str):
+        return _PRAGMA_ENUMS[name].get(value.upper(), value)
+    if isinstance(value, str):
+        return value.lower()
+    return value
+
+
+@dataclass
+class PoolStats:
+    """Fotografía de los contadores del pool de conexiones."""
+    max_size: int
+    created: int
+    closed: int
+    in_use: int
+    idle: int
+    peak_in_use: int
+    checkouts: int
+    waits: int
+    timeouts: int
+
+
+class ConnectionPool:
+    """Pool acotado de conexiones SQLite con semántica checkout/return.
+
+    - Nunca hay más de `max_size` conexiones abiertas a la vez.
+    - Si no hay conexiones libres, `acquire` espera hasta `timeout` segundos.
+    - Las conexiones inactivas más de `idle_timeout` segundos se cierran al reutilizarlas.
+    - Es consciente del hilo: si un hilo ya tiene una conexión prestada,
+      `connection()` le devuelve la misma (reentrante), de modo que las llamadas
+      anidadas comparten transacción y no agotan el pool.
+    """
+
+    def __init__(self, factory: Callable[[], sqlite3.Connection], max_size: int = 5,
+                 timeout: float = 10.0, idle_timeout: Optional[float] = 300.0,
+                 on_discard: Optional[Callable[[sqlite3.Connection], None]] = None):
+        if max_size < 1:
+            raise ValueError("El tamaño del pool debe ser al menos 1.")
+        self._factory = factory
+        self._on_discard = on_discard  # se llama con cada conexión que el pool cierra
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # (conexión, instante en que se devolvió)
+        self._local = threading.local()
+        self._closed_pool = False
+
+        self._open = 0
+        self._in_use = 0
+        self._created = 0
+        self._closed = 0
+        self._peak_in_use = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+
+    # --- Checkout / Return ---
+    def acquire(self) -> sqlite3.Connection:
+        """Toma una conexión del pool (o crea una nueva si queda hueco)."""
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            waited = False
+            while True:
+                if self._closed_pool:
+                    raise RuntimeError("El pool de conexiones está cerrado.")
+
+                while self._idle:
+                    conn, returned_at = self._idle.pop()
+                    if self.idle_timeout is not None and time.monotonic() - returned_at > self.idle_timeout:
+                        self._discard(conn)
+                        continue
+                    return self._checkout(conn)
+
+                if self._open < self.max_size:
+                    # Reservamos el hueco antes de abrir fuera del lock
+                    self._open += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise TimeoutError(
+                        f"No hay conexiones libres tras {self.timeout}s (pool de {self.max_size})."
+                    )
+                if not waited:
+                    self._waits += 1
+                    waited = True
+                self._cond.wait(remaining)
+
+        try:
+            conn = self._factory()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._created += 1
+            return self._checkout(conn)
+
+    def release(self, conn: sqlite3.Connection):
+        """Devuelve una conexión al pool. Si quedó en una transacción abierta, se deshace."""
+        if conn.in_transaction:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                with self._cond:
+                    self._in_use -= 1
+                    self._discard(conn)
+                    self._cond.notify()
+                return
+
+        with self._cond:
+            self._in_use -= 1
+            if self._closed_pool:
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Presta una conexión durante el bloque `with`.
+
+        Al salir del bloque más externo hace commit (o rollback si hubo excepción)
+        y la devuelve al pool. Los bloques anidados del mismo hilo reutilizan la conexión.
+        """
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            self._local.depth += 1
+            try:
+                yield held
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn = self.acquire()
+        self._local.conn = conn
+        self._local.depth = 1
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            self.release(conn)
+
+    # --- Mantenimiento ---
+    def close(self):
+        """Cierra las conexiones libres; las prestadas se cierran al devolverse."""
+        with self._cond:
+            self._closed_pool = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._discard(conn)
+            self._cond.notify_all()
+
+    def stats(self) -> PoolStats:
+        with self._cond:
+            return PoolStats(
+                max_size=self.max_size,
+                created=self._created,
+                closed=self._closed,
+                in_use=self._in_use,
+                idle=len(self._idle),
+                peak_in_use=self._peak_in_use,
+                checkouts=self._checkouts,
+                waits=self._waits,
+                timeouts=self._timeouts,
+            )
+
+    # --- Internos (llamar con el lock tomado) ---
+    def _checkout(self, conn: sqlite3.Connection) -> sqlite3.Connection:
+        self._in_use += 1
+        self._checkouts += 1
+        self._peak_in_use = max(self._peak_in_use, self._in_use)
+        return conn
+
+    def _discard(self, conn: sqlite3.Connection):
+        self._open -= 1
+        self._closed += 1
+        try:
+            conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Error cerrando conexión del pool: {e}")
+        if self._on_discard is not None:
+            self._on_discard(conn)
+
+
+class UnitOfWork:
+    """Transacción que abarca varios repositorios.
+
+    Uso: `with UnitOfWork(db): appt_repo.create(...); mr_repo.create(...)`.
+    Los repositorios llamados dentro del bloque reutilizan la conexión del hilo
+    (el pool es reentrante), así que todo se confirma con un único commit al salir
+    o se deshace entero si hay una excepción. Se abre con BEGIN IMMEDIATE para
+    tomar el bloqueo de escritura al principio y no a mitad de la transacción.
+    Si ya hay un bloque `connection()` abierto en el hilo, se une a su transacción
+    dentro de un SAVEPOINT: una excepción deshace lo escrito en la unidad aunque el
+    código de fuera la capture, y lo demás se confirma con la transacción exterior.
+    """
+
+    def __init__(self, db: "DatabaseManager"):
+        self.db = db
+        self.conn: Optional[sqlite3.Connection] = None
+        self._ctx = None
+        self._savepoint: Optional[str] = None
+        self._began = False
+
+    def __enter__(self) -> "UnitOfWork":
+        self._ctx = self.db.connection()
+        self.conn = self._ctx.__enter__()
+        try:
+            if self.conn.in_transaction:
+                self._savepoint = f"uow_{id(self):x}"
+                self.conn.execute(f"SAVEPOINT {self._savepoint}")
+            else:
+                self.conn.execute("BEGIN IMMEDIATE")
+                self._began = True
+        except BaseException:
+            self._ctx.__exit__(*sys.exc_info())
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        ctx, conn, savepoint, began = self._ctx, self.conn, self._savepoint, self._began
+        self._ctx, self.conn, self._savepoint, self._began = None, None, None, False
+        try:
+            if savepoint is not None:
+                if exc_type is not None:
+                    conn.execute(f"ROLLBACK TO {savepoint}")
+                conn.execute(f"RELEASE {savepoint}")
+            elif began and exc_type is not None and conn.in_transaction:
+                # Dentro de otro bloque connection() el rollback no lo haría nadie más
+                # si el código de fuera captura la excepción
+                conn.rollback()
+        except BaseException:
+            ctx.__exit__(*sys.exc_info())
+            raise
+        return bool(ctx.__exit__(exc_type, exc, tb))
+
 
 class DatabaseManager:
     """Manejo de conexión a SQLite."""
-    
-    def __init__(self, db_name="veterinaria_final.db"):
+
+    def __init__(self, db_name="veterinaria_final.db", pool_size: int = 5,
+                 pool_timeout: float = 10.0, idle_timeout: Optional[float] = 300.0,
+                 profile: str = DEFAULT_PROFILE, pragma_overrides: Optional[Dict[str, Any]] = None,
+                 query_stats: Optional[QueryStats] = None):
         self._conn_cache = None # Variable para guardar la conexión en memoria
-        
+        # Con query_stats, el pool reparte conexiones instrumentadas que miden cada sentencia.
+        # Sin él se usan conexiones sqlite3 normales: la instrumentación apagada no cuesta nada.
+        self.query_stats = query_stats
+
+        if profile not in PRAGMA_PROFILES:
+            raise ValueError(f"Perfil de base de datos desconocido: {profile}. "
+                             f"Opciones: {', '.join(PRAGMA_PROFILES)}")
+        self.profile = profile
+        self.pragmas = {**PRAGMA_PROFILES[profile], **(pragma_overrides or {})}
+        self.applied_pragmas: Dict[str, Any] = {}
+
         # Detectar si es una base de datos en memoria (para tests)
         if db_name == ":memory:":
             self.db_name = ":memory:"
             self.is_memory = True
+            # Una única conexión compartida: el pool solo serializa su uso entre hilos
+            pool_size, idle_timeout = 1, None
         else:
             # Construimos la ruta absoluta para bases de datos en archivo
             base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
             self.db_name = os.path.join(base_dir, db_name)
             self.is_memory = False
 
-    def get_connection(self):
-        # check_same_thread=False es necesario para Streamlit y tests
-        
-        # LÓGICA ESPECIAL PARA MEMORIA (TESTS)
+        self.pool = ConnectionPool(self._connect, max_size=pool_size,
+                                   timeout=pool_timeout, idle_timeout=idle_timeout,
+                                   on_discard=self._forget_connection)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Fábrica de conexiones del pool."""
+        # check_same_thread=False es necesario para Streamlit y tests:
+        # una conexión puede devolverse al pool desde un hilo y reutilizarse en otro.
         if self.is_memory:
             # Si ya tenemos una conexión abierta, la reutilizamos (Singleton)
             # Esto evita que la base de datos se borre entre initialize_db y el test
             if self._conn_cache is None:
-                self._conn_cache = sqlite3.connect(self.db_name, check_same_thread=False)
+                self._conn_cache = self._open()
+                self._apply_pragmas(self._conn_cache)
             return self._conn_cache
-            
-        # LÓGICA NORMAL (ARCHIVO)
-        # Siempre devolvemos una conexión nueva
-        return sqlite3.connect(self.db_name, check_same_thread=False)
+        conn = self._open()
+        self._apply_pragmas(conn)
+        return conn
+
+    def _forget_connection(self, conn: sqlite3.Connection):
+        """El pool cerró `conn`: si era la de memoria, la próxima se abre de nuevo."""
+        if conn is self._conn_cache:
+            self._conn_cache = None
+
+    def _open(self) -> sqlite3.Connection:
+        if self.query_stats is None:
+            return sqlite3.connect(self.db_name, check_same_thread=False)
+        conn = sqlite3.connect(self.db_name, check_same_thread=False, factory=InstrumentedConnection)
+        conn.query_stats = self.query_stats
+        return conn
+
+    def _apply_pragmas(self, conn: sqlite3.Connection):
+        """Aplica los PRAGMAs del perfil y guarda lo que SQLite realmente dejó activo."""
+        applied = {}
+        for name, value in self.pragmas.items():
+            if self.is_memory and name in _FILE_ONLY_PRAGMAS:
+                continue
+            conn.execute(f"PRAGMA {name}={value}")
+            row = conn.execute(f"PRAGMA {name}").fetchone()
+            applied[name] = row[0] if row else None
+        self.applied_pragmas = applied
+
+    def pragma_report(self) -> Dict[str, Dict[str, Any]]:
+        """Compara lo pedido por el perfil con lo que SQLite aplicó en la última conexión abierta."""
+        report = {}
+        for name, requested in self.pragmas.items():
+            applied = self.applied_pragmas.get(name)
+            report[name] = {
+                "requested": requested,
+                "applied": applied,
+                "ok": name in self.applied_pragmas and applied == _normalize_pragma(name, requested),
+            }
+        return report
+
+    def connection(self):
+        """Context manager que presta una conexión del pool.
+
+        Uso: `with db.connection() as conn: ...`. Hace commit/rollback al salir
+        y devuelve la conexión al pool en lugar de dejarla abierta.
+        """
+        return self.pool.connection()
+
+    def pool_stats(self) -> PoolStats:
+        return self.pool.stats()
+
+    def close(self):
+        """Cierra todas las conexiones del pool (y la de memoria, si existe)."""
+        self.pool.close()
+        if self._conn_cache is not None:
+            self._conn_cache.close()
+            self._conn_cache = None
+
+    def _log_pragma_report(self):
+        report = self.pragma_report()
+        summary = ", ".join(f"{name}={info['applied']}" for name, info in report.items()
+                            if name in self.applied_pragmas)
+        logger.info(f"Perfil de rendimiento '{self.profile}' aplicado: {summary}")
+        for name, info in report.items():
+            if name in self.applied_pragmas and not info["ok"]:
+                logger.warning(f"PRAGMA {name}: se pidió {info['requested']} pero SQLite aplicó {info['applied']}")
 
     def initialize_db(self):
-        """Crea las tablas si no existen."""
+        """Crea las tablas si no existen y aplica las migraciones pendientes."""
         try:
-            # Usamos get_connection. Si es memoria, usará la cacheada.
-            # Nota: El 'with' en sqlite3 hace commit/rollback, pero NO cierra la conexión automáticamente,
-            # lo cual es perfecto para nuestro caso de memoria.
-            with self.get_connection() as conn:
+            # El context manager del pool hace commit al salir y devuelve la conexión.
+            with self.connection() as conn:
                 cursor = conn.cursor()
                 
                 # --- Tabla Clientes ---
@@ -123,8 +507,13 @@ class DatabaseManager:
                     )
                 """)
 
+                # Índices y cambios de esquema posteriores (versionados en schema_version)
+                apply_migrations(conn)
+
                 logger.info(f"Base de datos inicializada en: {self.db_name}")
+
+            self._log_pragma_report()
                 
         except Exception as e:
             logger.error(f"Error inicializando DB: {e}")
-            raise
\ No newline at end of file
+            raise
\ No newline at end of file
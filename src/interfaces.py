@@ -1,14 +1,46 @@
 from abc import ABC, abstractmethod
-from typing import List, Any
+from dataclasses import dataclass
+from typing import List, Any, Dict, Iterable, Optional, Sequence, Tuple
+
+@dataclass
+class Columns:
+    """Resultado en columnas: una secuencia de valores por campo, sin un objeto por fila.
+
+    pd.DataFrame(columns.as_dict()) construye la tabla directamente.
+    """
+    names: List[str]
+    values: List[Sequence[Any]]
+
+    def __len__(self) -> int:
+        return len(self.values[0]) if self.values else 0
+
+    def as_dict(self) -> Dict[str, Sequence[Any]]:
+        return dict(zip(self.names, self.values))
+
+@dataclass
+class Page:
+    """Una página de resultados de un listado por cursor (keyset)."""
+    items: Any # Lista de modelos, Columns si se pidió columnar=True o DataFrame (ReportRepository)
+    next_key: Optional[Tuple[Any, ...]] = None # Pasar como after_key para pedir la siguiente
+
+    @property
+    def has_more(self) -> bool:
+        return self.next_key is not None
 
 class IRepository(ABC):
     @abstractmethod
     def create(self, item: Any) -> Any: pass
     @abstractmethod
+    def create_many(self, items: Iterable[Any]) -> List[Any]: pass
+    @abstractmethod
     def get_all(self) -> List[Any]: pass
     @abstractmethod
     def update(self, item: Any) -> bool: pass
     @abstractmethod
     def delete(self, item_id: int) -> bool: pass
     @abstractmethod
-    def get_by_id(self, item_id: int) -> Any: pass
\ No newline at end of file
+    def get_by_id(self, item_id: int) -> Any: pass
+    @abstractmethod
+    def list_page(self, limit: int = 50, after_key: Optional[Tuple[Any, ...]] = None,
+                  order_by: Optional[str] = None, filters: Optional[Dict[str, Any]] = None,
+                  columnar: bool = False) -> Page: pass
\ No newline at end of file
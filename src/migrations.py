@@ -0,0 +1,318 @@
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Sequence, Tuple
+from src.utils import logger
+
+@dataclass(frozen=True)
+class Migration:
+    """Cambio de esquema numerado. Se aplica una sola vez y en orden."""
+    version: int
+    description: str
+    statements: Tuple[str, ...]
+
+
+def _fts_statements(table: str, columns: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Índice FTS5 de contenido externo sobre `table`, sus triggers de sincronización y
+    la reconstrucción inicial con las filas que ya existan."""
+    fts = f"{table}_fts"
+    cols = ", ".join(columns)
+    new = ", ".join(f"new.{c}" for c in columns)
+    old = ", ".join(f"old.{c}" for c in columns)
+    delete = f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old});"
+    insert = f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new});"
+    return (
+        # remove_diacritics: "garcia" encuentra "García"; prefix: índices para "gar*"
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {delete} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN {delete} {insert} END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    )
+
+
+# Clave de periodo de los agregados de facturación a partir de una fecha 'YYYY-MM-DD'.
+# La semana se identifica por su lunes (semanas ISO, de lunes a domingo).
+REVENUE_PERIODS = {
+    "day": "date({d})",
+    "week": "date({d}, 'weekday 0', '-6 days')",
+    "month": "strftime('%Y-%m', {d})",
+}
+# Los importes se acumulan en céntimos enteros: sumar y restar REAL acumularía error
+_CENTS = "CAST(round({amount} * 100) AS INTEGER)"
+
+
+def _revenue_delta(row: str, sign: int) -> str:
+    """Sentencias de trigger que suman (sign=1) o restan (sign=-1) la factura `row`
+    ("new" u "old") de los agregados por periodo y por cliente."""
+    cents = _CENTS.format(amount=f"{row}.total_amount")
+    keys = [("revenue_by_period", f"grain = '{grain}' AND period = {expr.format(d=f'{row}.date')}",
+             f"'{grain}', {expr.format(d=f'{row}.date')}", "grain, period")
+            for grain, expr in REVENUE_PERIODS.items()]
+    keys.append(("revenue_by_client", f"client_id = {row}.client_id", f"{row}.client_id", "client_id"))
+    statements = []
+    for table, where, values, columns in keys:
+        if sign > 0:
+            # INSERT ... SELECT ... WHERE: las facturas sin cliente no cuentan por cliente
+            statements.append(
+                f"INSERT INTO {table} ({columns}, status, invoice_count, total_cents) "
+                f"SELECT {values}, {row}.status, 1, {cents} WHERE {row}.date IS NOT NULL"
+                f"{f' AND {row}.client_id IS NOT NULL' if table == 'revenue_by_client' else ''} "
+                f"ON CONFLICT({columns}, status) DO UPDATE SET invoice_count = invoice_count + 1, "
+                f"total_cents = total_cents + excluded.total_cents;")
+        else:
+            statements.append(
+                f"UPDATE {table} SET invoice_count = invoice_count - 1, total_cents = total_cents - {cents} "
+                f"WHERE {where} AND status = {row}.status;")
+            statements.append(f"DELETE FROM {table} WHERE {where} AND status = {row}.status AND invoice_count <= 0;")
+    return " ".join(statements)
+
+
+def _revenue_backfill() -> Tuple[str, ...]:
+    """Recalcula los agregados de facturación desde cero con las facturas existentes."""
+    cents = _CENTS.format(amount="total_amount")
+    return (
+        "DELETE FROM revenue_by_period",
+        "DELETE FROM revenue_by_client",
+        *(f"""INSERT INTO revenue_by_period (grain, period, status, invoice_count, total_cents)
+              SELECT '{grain}', {expr.format(d='date')}, status, COUNT(*), SUM({cents})
+              FROM invoices WHERE date IS NOT NULL GROUP BY 2, 3"""
+          for grain, expr in REVENUE_PERIODS.items()),
+        f"""INSERT INTO revenue_by_client (client_id, status, invoice_count, total_cents)
+            SELECT client_id, status, COUNT(*), SUM({cents})
+            FROM invoices WHERE client_id IS NOT NULL GROUP BY client_id, status""",
+    )
+
+
+# Sentencias del rellenado; también las usa el comando de reconstrucción (src.billing_analytics)
+REVENUE_BACKFILL = _revenue_backfill()
+
+
+# Tablas cuya versión de datos mantiene la BD (migración 10). La caché de lecturas
+# (src.cache) compara estas versiones para enterarse también de las escrituras de otros
+# procesos. Los agregados derivados (historial, facturación) cuentan como su tabla de origen.
+VERSIONED_TABLES = ("clients", "pets", "appointments", "medical_records", "invoices", "reviews")
+
+
+def _data_version_statements(table: str) -> Tuple[str, ...]:
+    """Triggers que suben la versión de `table` en data_versions con cada fila escrita."""
+    bump = f"UPDATE data_versions SET version = version + 1 WHERE table_name = '{table}';"
+    return tuple(f"CREATE TRIGGER IF NOT EXISTS {table}_version_a{op[0].lower()} AFTER {op} ON {table} BEGIN {bump} END"
+                 for op in ("INSERT", "UPDATE", "DELETE"))
+
+
+# Registro de migraciones. NUNCA editar una ya publicada: añadir una nueva al final.
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Índices de claves foráneas", (
+        "CREATE INDEX IF NOT EXISTS idx_pets_client_id ON pets(client_id)",
+        # (pet_id, date) sirve para filtrar por mascota y devolver ya ordenado por fecha
+        "CREATE INDEX IF NOT EXISTS idx_appointments_pet_id_date ON appointments(pet_id, date)",
+        "CREATE INDEX IF NOT EXISTS idx_medical_records_appointment_id ON medical_records(appointment_id)",
+        "CREATE INDEX IF NOT EXISTS idx_invoices_client_id ON invoices(client_id)",
+    )),
+    Migration(2, "Índices de fechas para listados ordenados", (
+        "CREATE INDEX IF NOT EXISTS idx_appointments_date ON appointments(date)",
+        "CREATE INDEX IF NOT EXISTS idx_invoices_date ON invoices(date)",
+        "CREATE INDEX IF NOT EXISTS idx_reviews_review_date ON reviews(review_date)",
+    )),
+    Migration(3, "Índices de nombre para listados paginados", (
+        "CREATE INDEX IF NOT EXISTS idx_clients_name ON clients(name)",
+        "CREATE INDEX IF NOT EXISTS idx_pets_name ON pets(name)",
+    )),
+    Migration(4, "Índices para los agregados del panel de inicio", (
+        # GROUP BY sobre un índice: se recorre el índice (más pequeño) y no la tabla
+        "CREATE INDEX IF NOT EXISTS idx_appointments_status ON appointments(status)",
+        "CREATE INDEX IF NOT EXISTS idx_pets_species ON pets(species)",
+    )),
+    Migration(5, "Tabla de sesiones", (
+        """CREATE TABLE IF NOT EXISTS sessions (
+            token_id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id)",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions(expires_at)",
+    )),
+    Migration(6, "Búsqueda de texto completo (FTS5) en clientes, mascotas e historial", (
+        *_fts_statements("clients", ("name", "email", "phone")),
+        *_fts_statements("pets", ("name", "breed")),
+        *_fts_statements("medical_records", ("diagnosis", "treatment", "notes")),
+    )),
+    Migration(7, "Índices sin distinción de mayúsculas para los selectores", (
+        # LIKE 'texto%' (que no distingue mayúsculas) solo usa índices NOCASE
+        "CREATE INDEX IF NOT EXISTS idx_clients_name_nocase ON clients(name COLLATE NOCASE)",
+        "CREATE INDEX IF NOT EXISTS idx_pets_name_nocase ON pets(name COLLATE NOCASE)",
+    )),
+    Migration(8, "Historial médico materializado por mascota", (
+        # Una fila por registro médico con los datos de su cita. La clave (pet_id, date,
+        # record_id) agrupa el historial de cada mascota ya ordenado: abrirlo es un único
+        # recorrido de rango, sin JOIN ni ORDER BY.
+        """CREATE TABLE IF NOT EXISTS pet_medical_history (
+            pet_id INTEGER NOT NULL,
+            date DATE,
+            record_id INTEGER NOT NULL,
+            appointment_id INTEGER NOT NULL,
+            reason TEXT,
+            diagnosis TEXT NOT NULL,
+            treatment TEXT NOT NULL,
+            notes TEXT,
+            PRIMARY KEY (pet_id, date, record_id)
+        ) WITHOUT ROWID""",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_pet_medical_history_record_id ON pet_medical_history(record_id)",
+        "CREATE INDEX IF NOT EXISTS idx_pet_medical_history_appointment_id ON pet_medical_history(appointment_id)",
+        # Resumen por mascota: nº de visitas y la última (fecha y diagnóstico)
+        """CREATE TABLE IF NOT EXISTS pet_medical_summary (
+            pet_id INTEGER PRIMARY KEY,
+            visit_count INTEGER NOT NULL,
+            last_visit DATE,
+            last_diagnosis TEXT,
+            last_record_id INTEGER
+        )""",
+        # Carga inicial con los datos que ya existan
+        """INSERT INTO pet_medical_history (pet_id, date, record_id, appointment_id, reason, diagnosis, treatment, notes)
+           SELECT a.pet_id, a.date, mr.id, a.id, a.reason, mr.diagnosis, mr.treatment, mr.notes
+           FROM medical_records mr JOIN appointments a ON a.id = mr.appointment_id
+           WHERE a.pet_id IS NOT NULL""",
+        """INSERT INTO pet_medical_summary (pet_id, visit_count, last_visit, last_diagnosis, last_record_id)
+           SELECT pet_id, n, date, diagnosis, record_id FROM (
+               SELECT pet_id, date, diagnosis, record_id, COUNT(*) OVER (PARTITION BY pet_id) AS n,
+                      ROW_NUMBER() OVER (PARTITION BY pet_id ORDER BY date DESC, record_id DESC) AS rn
+               FROM pet_medical_history)
+           WHERE rn = 1""",
+        # El resumen sigue al historial...
+        """CREATE TRIGGER IF NOT EXISTS pet_medical_history_ai AFTER INSERT ON pet_medical_history BEGIN
+            INSERT INTO pet_medical_summary (pet_id, visit_count) VALUES (new.pet_id, 1)
+                ON CONFLICT(pet_id) DO UPDATE SET visit_count = visit_count + 1;
+            UPDATE pet_medical_summary SET (last_visit, last_diagnosis, last_record_id) =
+                (SELECT date, diagnosis, record_id FROM pet_medical_history WHERE pet_id = new.pet_id
+                 ORDER BY date DESC, record_id DESC LIMIT 1)
+            WHERE pet_id = new.pet_id;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS pet_medical_history_ad AFTER DELETE ON pet_medical_history BEGIN
+            UPDATE pet_medical_summary SET visit_count = visit_count - 1 WHERE pet_id = old.pet_id;
+            DELETE FROM pet_medical_summary WHERE pet_id = old.pet_id AND visit_count <= 0;
+            UPDATE pet_medical_summary SET (last_visit, last_diagnosis, last_record_id) =
+                (SELECT date, diagnosis, record_id FROM pet_medical_history WHERE pet_id = old.pet_id
+                 ORDER BY date DESC, record_id DESC LIMIT 1)
+            WHERE pet_id = old.pet_id;
+        END""",
+        # ...y el historial a los registros médicos y a sus citas
+        """CREATE TRIGGER IF NOT EXISTS medical_records_history_ai AFTER INSERT ON medical_records BEGIN
+            INSERT INTO pet_medical_history (pet_id, date, record_id, appointment_id, reason, diagnosis, treatment, notes)
+            SELECT a.pet_id, a.date, new.id, a.id, a.reason, new.diagnosis, new.treatment, new.notes
+            FROM appointments a WHERE a.id = new.appointment_id AND a.pet_id IS NOT NULL;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS medical_records_history_ad AFTER DELETE ON medical_records BEGIN
+            DELETE FROM pet_medical_history WHERE record_id = old.id;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS medical_records_history_au AFTER UPDATE ON medical_records BEGIN
+            DELETE FROM pet_medical_history WHERE record_id = old.id;
+            INSERT INTO pet_medical_history (pet_id, date, record_id, appointment_id, reason, diagnosis, treatment, notes)
+            SELECT a.pet_id, a.date, new.id, a.id, a.reason, new.diagnosis, new.treatment, new.notes
+            FROM appointments a WHERE a.id = new.appointment_id AND a.pet_id IS NOT NULL;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS appointments_history_au AFTER UPDATE OF pet_id, date, reason ON appointments
+            WHEN old.pet_id IS NOT new.pet_id OR old.date IS NOT new.date OR old.reason IS NOT new.reason BEGIN
+            DELETE FROM pet_medical_history WHERE appointment_id = old.id;
+            INSERT INTO pet_medical_history (pet_id, date, record_id, appointment_id, reason, diagnosis, treatment, notes)
+            SELECT new.pet_id, new.date, mr.id, new.id, new.reason, mr.diagnosis, mr.treatment, mr.notes
+            FROM medical_records mr WHERE mr.appointment_id = new.id AND new.pet_id IS NOT NULL;
+        END""",
+        # Sin claves foráneas activas el borrado de la cita no llega a medical_records
+        """CREATE TRIGGER IF NOT EXISTS appointments_history_ad AFTER DELETE ON appointments BEGIN
+            DELETE FROM pet_medical_history WHERE appointment_id = old.id;
+        END""",
+    )),
+    Migration(9, "Agregados de facturación por periodo y por cliente", (
+        # Una fila por (día|semana|mes, periodo, estado): un rango de N periodos se lee
+        # con un recorrido de la clave primaria, sin agrupar las facturas
+        """CREATE TABLE IF NOT EXISTS revenue_by_period (
+            grain TEXT NOT NULL,
+            period TEXT NOT NULL,
+            status TEXT NOT NULL,
+            invoice_count INTEGER NOT NULL,
+            total_cents INTEGER NOT NULL,
+            PRIMARY KEY (grain, period, status)
+        ) WITHOUT ROWID""",
+        """CREATE TABLE IF NOT EXISTS revenue_by_client (
+            client_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            invoice_count INTEGER NOT NULL,
+            total_cents INTEGER NOT NULL,
+            PRIMARY KEY (client_id, status)
+        ) WITHOUT ROWID""",
+        *REVENUE_BACKFILL,
+        f"CREATE TRIGGER IF NOT EXISTS invoices_revenue_ai AFTER INSERT ON invoices BEGIN {_revenue_delta('new', 1)} END",
+        f"CREATE TRIGGER IF NOT EXISTS invoices_revenue_ad AFTER DELETE ON invoices BEGIN {_revenue_delta('old', -1)} END",
+        f"""CREATE TRIGGER IF NOT EXISTS invoices_revenue_au AFTER UPDATE OF client_id, date, total_amount, status ON invoices
+            WHEN old.client_id IS NOT new.client_id OR old.date IS NOT new.date
+              OR old.total_amount IS NOT new.total_amount OR old.status IS NOT new.status
+            BEGIN {_revenue_delta('old', -1)} {_revenue_delta('new', 1)} END""",
+    )),
+    Migration(10, "Versiones de datos por tabla", (
+        """CREATE TABLE IF NOT EXISTS data_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        ) WITHOUT ROWID""",
+        *(f"INSERT OR IGNORE INTO data_versions (table_name, version) VALUES ('{t}', 0)" for t in VERSIONED_TABLES),
+        *(s for t in VERSIONED_TABLES for s in _data_version_statements(t)),
+    )),
+]
+
+
+def _ensure_version_table(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+    """)
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    """Última versión de esquema aplicada (0 si nunca se migró)."""
+    _ensure_version_table(conn)
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def apply_migrations(conn: sqlite3.Connection, migrations: Sequence[Migration] = MIGRATIONS) -> List[int]:
+    """Aplica las migraciones pendientes. Idempotente: devuelve las versiones aplicadas ahora.
+
+    Cada migración corre en su propia transacción (BEGIN IMMEDIATE), así que si dos
+    procesos arrancan a la vez solo uno la aplica y el otro la encuentra ya registrada.
+    """
+    versions = [m.version for m in migrations]
+    if versions != sorted(set(versions)):
+        raise ValueError("Las migraciones deben tener versiones únicas y en orden creciente.")
+
+    if conn.in_transaction:
+        conn.commit()
+    _ensure_version_table(conn)
+
+    applied = []
+    for migration in migrations:
+        if migration.version <= current_version(conn):
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Otro proceso pudo aplicarla mientras esperábamos el lock
+            if migration.version <= current_version(conn):
+                conn.rollback()
+                continue
+            for statement in migration.statements:
+                conn.execute(statement)
+            conn.execute("INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                         (migration.version, migration.description, datetime.now().isoformat(timespec="seconds")))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error aplicando migración {migration.version} ({migration.description}): {e}")
+            raise
+        logger.info(f"Migración {migration.version} aplicada: {migration.description}")
+        applied.append(migration.version)
+    return applied
@@ -1,15 +1,19 @@
 from dataclasses import dataclass, field
-from typing import Optional
+from typing import Dict, List, Optional
 import datetime # Importar el módulo completo para evitar el error de recursión
 
-@dataclass
+# Las entidades que se listan por miles usan slots=True: sin __dict__ por instancia
+# (menos memoria y acceso a atributos más rápido). Para pasarlas a dict usar
+# dataclasses.asdict(), no vars().
+
+@dataclass(slots=True)
 class Client:
     id: Optional[int]
     name: str
     email: str
     phone: str
 
-@dataclass
+@dataclass(slots=True)
 class Pet:
     id: Optional[int]
     name: str
@@ -18,7 +22,7 @@ class Pet:
     age: int
     client_id: int
 
-@dataclass
+@dataclass(slots=True)
 class Appointment:
     id: Optional[int]
     pet_id: int
@@ -26,7 +30,29 @@ class Appointment:
     reason: str
     status: str = "Pendiente"
 
+@dataclass(slots=True)
+class AppointmentDetail:
+    """Cita con los datos de la mascota y el dueño ya resueltos (solo lectura)."""
+    id: int
+    pet_id: int
+    date: datetime.date
+    reason: str
+    status: str
+    pet_name: Optional[str]
+    species: Optional[str]
+    owner_name: Optional[str]
+
 @dataclass
+class DashboardStats:
+    """Cifras agregadas de la pantalla de inicio."""
+    clients: int
+    pets: int
+    appointments: int
+    appointments_by_status: Dict[str, int] = field(default_factory=dict)
+    pets_by_species: Dict[str, int] = field(default_factory=dict)
+    revenue_this_month: float = 0.0
+
+@dataclass(slots=True)
 class MedicalRecord:
     id: Optional[int]
     appointment_id: int
@@ -35,6 +61,21 @@ class MedicalRecord:
     notes: Optional[str] = None
 
 @dataclass
+class PetMedicalSummary:
+    """Resumen del historial de una mascota."""
+    pet_id: int
+    visit_count: int = 0
+    last_visit: Optional[str] = None
+    last_diagnosis: Optional[str] = None
+
+@dataclass
+class PetTimeline:
+    """Historial médico de una mascota (más reciente primero) y su resumen."""
+    summary: PetMedicalSummary
+    # (id registro, fecha cita, motivo, diagnóstico, tratamiento, notas)
+    entries: List[tuple] = field(default_factory=list)
+
+@dataclass(slots=True)
 class Invoice:
     id: Optional[int]
     client_id: int
@@ -43,6 +84,25 @@ class Invoice:
     status: str = "Pendiente"
 
 @dataclass
+class RevenuePeriod:
+    """Facturación de un periodo ('YYYY-MM-DD' día o lunes de la semana, 'YYYY-MM' mes)."""
+    period: str
+    invoice_count: int = 0
+    total: float = 0.0
+    paid: float = 0.0
+    outstanding: float = 0.0
+
+@dataclass
+class ClientRevenue:
+    """Facturación acumulada de un cliente."""
+    client_id: int
+    client_name: Optional[str]
+    invoice_count: int = 0
+    total: float = 0.0
+    paid: float = 0.0
+    outstanding: float = 0.0
+
+@dataclass(slots=True)
 class Review:
     id: Optional[int]
     client_id: int
@@ -59,4 +119,22 @@ class User:
     id: Optional[int]
     username: str
     password_hash: str
-    role: str = "admin"
\ No newline at end of file
+    role: str = "admin"
+
+@dataclass
+class Session:
+    """Sesión iniciada: el token que ve el navegador es `token_id` firmado."""
+    token_id: str
+    user_id: int
+    created_at: float  # epoch (segundos)
+    expires_at: float
+
+@dataclass
+class SearchResult:
+    """Resultado de la búsqueda de texto completo."""
+    kind: str  # "client", "pet" o "medical_record"
+    id: int
+    title: str
+    detail: str
+    snippet: str  # fragmento con los términos encontrados entre [ ]
+    score: float  # bm25: cuanto menor, más relevante
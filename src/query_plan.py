@@ -0,0 +1,222 @@
+"""Verificador de planes de consulta.
+
+Ejecuta las consultas de lectura de cada repositorio sobre una base de datos,
+captura el SQL real que lanzan y le pasa `EXPLAIN QUERY PLAN`. Falla si alguna
+consulta recorre una tabla completa (salvo los recorridos declarados en
+ALLOWED_FULL_SCANS) o si algún método público de lectura no tiene sonda en PROBES.
+
+Uso:
+    python -m src.query_plan               # esquema recién creado en memoria
+    python -m src.query_plan ruta/a/la.db  # base de datos existente
+"""
+import inspect
+import re
+import sys
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+from src.database import DatabaseManager
+from src.repositories import (
+    ClientRepository, PetRepository, AppointmentRepository,
+    MedicalRecordRepository, BillingRepository, ReviewRepository, UserRepository,
+    StatsRepository, SessionRepository, SearchRepository
+)
+from src.reports import ReportRepository
+from src.billing_analytics import BillingAnalyticsRepository
+
+# Cualquier "SCAN t" (o "SCAN TABLE t" en SQLite < 3.36) recorre la tabla entera, también
+# con "USING [COVERING] INDEX": el índice solo da el orden, no acota las filas.
+# Excepciones: la fila constante de un SELECT sin FROM y las tablas FTS5 consultadas con
+# MATCH (el idxStr de FTS5 lleva una "M" por cada restricción MATCH).
+_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(?!CONSTANT ROW)(\w+)\b(?! VIRTUAL TABLE INDEX \d+:\S*M)")
+
+# Consultas que por definición recorren la tabla entera
+ALLOWED_FULL_SCANS = {
+    "ClientRepository.get_all",
+    "PetRepository.get_all",
+    "AppointmentRepository.get_all",
+    "AppointmentRepository.get_all_with_details",
+    "BillingRepository.get_all",
+    "BillingRepository.get_all_rows",
+    "ReviewRepository.get_all",
+    "ReviewRepository.get_all_rows",
+    # LIMIT 1: se detienen en la primera fila del índice
+    "ClientRepository.has_any",
+    "PetRepository.has_any",
+    # COUNT(*) de clientes, mascotas y citas (el servicio lo cachea)
+    "StatsRepository.dashboard_stats",
+    # Una fila por tabla versionada (migración 10)
+    "StatsRepository.data_versions",
+    # Ordena por total todo el agregado revenue_by_client (una fila por cliente y estado)
+    "BillingAnalyticsRepository.top_clients",
+}
+
+
+def build_repositories(db: DatabaseManager) -> Dict[str, object]:
+    """Los repositorios que usan las sondas (también los reutiliza benchmarks.suite)."""
+    return {
+        "clients": ClientRepository(db),
+        "pets": PetRepository(db),
+        "appointments": AppointmentRepository(db),
+        "medical_records": MedicalRecordRepository(db),
+        "invoices": BillingRepository(db),
+        "reviews": ReviewRepository(db),
+        "users": UserRepository(db),
+        "stats": StatsRepository(db),
+        "sessions": SessionRepository(db),
+        "search": SearchRepository(db),
+        "reports": ReportRepository(db),
+        "analytics": BillingAnalyticsRepository(db),
+    }
+
+
+# Métodos públicos de los repositorios que no son lecturas (o que ya cubren otras sondas)
+UNPROBED_METHODS = {
+    "create", "create_many", "update", "delete", "delete_all", "delete_by_user", "delete_expired",
+    "touch", "set_status",
+    "ReportRepository.page",                          # lo usan todos los ReportRepository.*_page
+    "BillingAnalyticsRepository.rebuild",             # mantenimiento: recalcula los agregados
+    "BillingAnalyticsRepository.is_consistent",
+}
+
+# Una entrada por cada consulta de lectura de los repositorios: (etiqueta, llamada).
+# Una misma lectura puede tener varias sondas: "Clase.método[variante]".
+PROBES: List[Tuple[str, Callable[[Dict[str, object]], object]]] = [
+    ("ClientRepository.get_all", lambda r: r["clients"].get_all()),
+    ("ClientRepository.has_any", lambda r: r["clients"].has_any()),
+    ("ClientRepository.get_by_id", lambda r: r["clients"].get_by_id(1)),
+    ("ClientRepository.lookup", lambda r: r["clients"].lookup("gar")),
+    ("ClientRepository.get_names", lambda r: r["clients"].get_names([1, 2, 3])),
+    ("PetRepository.get_all", lambda r: r["pets"].get_all()),
+    ("PetRepository.get_by_client", lambda r: r["pets"].get_by_client(1)),
+    ("PetRepository.get_by_id", lambda r: r["pets"].get_by_id(1)),
+    ("PetRepository.has_any", lambda r: r["pets"].has_any()),
+    ("PetRepository.lookup", lambda r: r["pets"].lookup("lu")),
+    ("AppointmentRepository.get_all", lambda r: r["appointments"].get_all()),
+    ("AppointmentRepository.get_by_id", lambda r: r["appointments"].get_by_id(1)),
+    ("MedicalRecordRepository.get_medical_history_by_pet", lambda r: r["medical_records"].get_medical_history_by_pet(1)),
+    ("MedicalRecordRepository.get_summaries", lambda r: r["medical_records"].get_summaries([1, 2, 3])),
+    ("MedicalRecordRepository.get_all", lambda r: r["medical_records"].get_all()),
+    ("MedicalRecordRepository.get_by_id", lambda r: r["medical_records"].get_by_id(1)),
+    ("BillingRepository.get_all", lambda r: r["invoices"].get_all()),
+    ("BillingRepository.get_all_rows", lambda r: r["invoices"].get_all_rows()),
+    ("BillingRepository.get_by_id", lambda r: r["invoices"].get_by_id(1)),
+    ("ReviewRepository.get_all", lambda r: r["reviews"].get_all()),
+    ("ReviewRepository.get_all_rows", lambda r: r["reviews"].get_all_rows()),
+    ("ReviewRepository.get_by_id", lambda r: r["reviews"].get_by_id(1)),
+    ("UserRepository.get_all", lambda r: r["users"].get_all()),
+    ("UserRepository.get_by_id", lambda r: r["users"].get_by_id(1)),
+    ("UserRepository.get_by_username", lambda r: r["users"].get_by_username("admin")),
+    ("SessionRepository.get_with_user", lambda r: r["sessions"].get_with_user("token")),
+    ("SearchRepository.search", lambda r: r["search"].search('"luna"*')),
+    ("StatsRepository.dashboard_stats", lambda r: r["stats"].dashboard_stats("2025-01-01", "2025-02-01")),
+    ("StatsRepository.data_versions", lambda r: r["stats"].data_versions()),
+    # Listados paginados: primera página y página siguiente (con cursor)
+    ("ClientRepository.list_page", lambda r: r["clients"].list_page(10, after_key=(1,))),
+    ("ClientRepository.list_page[name]", lambda r: r["clients"].list_page(10, ("Ana", 1), order_by="name")),
+    ("PetRepository.list_page[name]", lambda r: r["pets"].list_page(10, ("Luna", 1), order_by="name")),
+    ("PetRepository.list_page[client_id]", lambda r: r["pets"].list_page(10, filters={"client_id": 1})),
+    ("AppointmentRepository.list_page", lambda r: r["appointments"].list_page(10, ("2025-01-01", 1))),
+    ("AppointmentRepository.list_page[pet_id]",
+     lambda r: r["appointments"].list_page(10, ("2025-01-01", 1), filters={"pet_id": 1})),
+    ("AppointmentRepository.get_all_with_details", lambda r: r["appointments"].get_all_with_details()),
+    ("AppointmentRepository.get_in_range",
+     lambda r: r["appointments"].get_in_range("2025-01-01", "2025-02-01", status="Pendiente")),
+    ("AppointmentRepository.list_details_page",
+     lambda r: r["appointments"].list_details_page(10, ("2025-01-01", 1))),
+    ("MedicalRecordRepository.list_page", lambda r: r["medical_records"].list_page(10, after_key=(1,))),
+    ("BillingRepository.list_page", lambda r: r["invoices"].list_page(10, ("2025-01-01", 1))),
+    ("ReviewRepository.list_page", lambda r: r["reviews"].list_page(10, ("2025-01-01", 1))),
+    ("UserRepository.list_page", lambda r: r["users"].list_page(10, after_key=(1,))),
+    # Tablas de la interfaz (una consulta con JOIN por página)
+    ("ReportRepository.clients_page[name]", lambda r: r["reports"].clients_page(10, ("Ana", 1), order_by="name")),
+    ("ReportRepository.pets_page", lambda r: r["reports"].pets_page(10, (1,))),
+    ("ReportRepository.pets_page[client_id]", lambda r: r["reports"].pets_page(10, filters={"client_id": 1})),
+    ("ReportRepository.appointments_page", lambda r: r["reports"].appointments_page(10, ("2025-01-01", 1))),
+    ("ReportRepository.invoices_page", lambda r: r["reports"].invoices_page(10, ("2025-01-01", 1))),
+    ("ReportRepository.reviews_page", lambda r: r["reports"].reviews_page(10, ("2025-01-01", 1))),
+    # Analítica de facturación (agregados de la migración 9)
+    ("BillingAnalyticsRepository.revenue_by_period", lambda r: r["analytics"].revenue_by_period("day", "2025-01-01", "2025-01-31")),
+    ("BillingAnalyticsRepository.totals", lambda r: r["analytics"].totals()),
+    ("BillingAnalyticsRepository.top_clients", lambda r: r["analytics"].top_clients(10)),
+    ("BillingAnalyticsRepository.client_revenue", lambda r: r["analytics"].client_revenue(1)),
+]
+
+
+def unprobed_repository_methods() -> List[str]:
+    """Métodos públicos de lectura de los repositorios que aún no tienen sonda en PROBES."""
+    probed = {label.split("[")[0] for label, _ in PROBES}
+    missing = []
+    for repo in build_repositories(DatabaseManager(":memory:")).values():
+        cls = type(repo).__name__
+        for name, _ in inspect.getmembers(type(repo), callable):
+            label = f"{cls}.{name}"
+            if not name.startswith("_") and label not in probed and not {name, label} & UNPROBED_METHODS:
+                missing.append(label)
+    return sorted(missing)
+
+
+@dataclass
+class PlanResult:
+    label: str
+    sql: str
+    plan: List[str]
+    full_scans: List[str]
+
+    @property
+    def ok(self) -> bool:
+        return not self.full_scans or self.label in ALLOWED_FULL_SCANS
+
+
+def check_query_plans(db: DatabaseManager) -> List[PlanResult]:
+    """Ejecuta cada sonda y devuelve el plan de todas las SELECT que lanzó."""
+    repos = build_repositories(db)
+    results = []
+    # Todas las llamadas del hilo reutilizan esta conexión (el pool es reentrante),
+    # así que el trace callback ve exactamente el SQL de cada repositorio.
+    with db.connection() as conn:
+        for label, probe in PROBES:
+            captured: List[str] = []
+            conn.set_trace_callback(captured.append)
+            try:
+                probe(repos)
+            finally:
+                conn.set_trace_callback(None)
+
+            for sql in captured:
+                if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+                    continue
+                plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+                scans = [m.group(1) for m in (_FULL_SCAN.match(step) for step in plan) if m]
+                results.append(PlanResult(label, " ".join(sql.split()), plan, scans))
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    db = DatabaseManager(argv[0] if argv else ":memory:")
+    db.initialize_db()
+
+    unprobed = unprobed_repository_methods()
+    for label in unprobed:
+        print(f"[FAIL] {label}: sin sonda en PROBES")
+    failures = len(unprobed)
+    for result in check_query_plans(db):
+        status = "OK  " if result.ok else "FAIL"
+        if result.full_scans and result.ok:
+            status = "SCAN"  # recorrido completo permitido
+        print(f"[{status}] {result.label}")
+        for step in result.plan:
+            print(f"         {step}")
+        if not result.ok:
+            failures += 1
+    db.close()
+
+    if failures:
+        print(f"\n{failures} consulta(s) sin sonda o que recorren tablas completas.")
+        return 1
+    print("\nTodas las consultas usan índices.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
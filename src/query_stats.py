@@ -0,0 +1,249 @@
+import json
+import random
+import re
+import sys
+import threading
+import time
+import sqlite3
+from dataclasses import dataclass, asdict
+from functools import lru_cache
+from typing import Any, Dict, List
+from src.utils import logger
+
+slow_query_logger = logger.getChild("slow_queries")
+
+# Muestras de duración que se guardan por sentencia para calcular percentiles
+RESERVOIR_SIZE = 2048
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql: str) -> str:
+    """Texto canónico de una sentencia: sin saltos de línea ni literales (cambiados por ?)."""
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def redact_params(params: Any) -> str:
+    """Forma de los parámetros sin sus valores, p.ej. "(int, str)", para el log de lentas."""
+    if not params:
+        return "()"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in params.items()) + "}"
+    return "(" + ", ".join(type(v).__name__ for v in params) + ")"
+
+
+def _caller() -> str:
+    """Método del repositorio que lanzó la consulta (o el primer código fuera de la BD)."""
+    frame = sys._getframe(2)
+    fallback = None
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module == "src.repositories":
+            owner = frame.f_locals.get("self")
+            if owner is not None:
+                return f"{type(owner).__name__}.{frame.f_code.co_name}"
+        elif fallback is None and module != "src.query_stats":
+            fallback = f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return fallback or "?"
+
+
+@dataclass
+class StatementStats:
+    """Estadísticas agregadas de una sentencia normalizada."""
+    statement: str
+    callers: Dict[str, int]
+    count: int
+    rows: int
+    total_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
+
+
+class _Aggregate:
+    __slots__ = ("callers", "count", "rows", "total", "max", "samples")
+
+    def __init__(self):
+        self.callers: Dict[str, int] = {}
+        self.count = 0
+        self.rows = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples: List[float] = []
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class QueryStats:
+    """Registro de todas las sentencias SQL que ejecutan las conexiones instrumentadas.
+
+    Agrega por sentencia normalizada (recuento, filas, p50/p95/p99/máx) y envía al log
+    de consultas lentas las que superan `slow_ms`, con los parámetros ocultos. Los
+    percentiles salen de una muestra aleatoria de hasta RESERVOIR_SIZE duraciones por
+    sentencia, así que la memoria no crece con el número de ejecuciones.
+    """
+
+    def __init__(self, slow_ms: float = 100.0):
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _Aggregate] = {}
+        self._rng = random.Random()
+        self.slow_queries = 0
+
+    def record(self, sql: str, params: Any, duration_ms: float, rows: int, caller: str):
+        statement = normalize_sql(sql)
+        with self._lock:
+            agg = self._stats.get(statement)
+            if agg is None:
+                agg = self._stats[statement] = _Aggregate()
+            agg.count += 1
+            agg.rows += rows
+            agg.total += duration_ms
+            agg.max = max(agg.max, duration_ms)
+            agg.callers[caller] = agg.callers.get(caller, 0) + 1
+            if len(agg.samples) < RESERVOIR_SIZE:
+                agg.samples.append(duration_ms)
+            else:
+                slot = self._rng.randrange(agg.count)
+                if slot < RESERVOIR_SIZE:
+                    agg.samples[slot] = duration_ms
+            slow = duration_ms >= self.slow_ms
+            if slow:
+                self.slow_queries += 1
+        if slow:
+            slow_query_logger.warning(f"Consulta lenta ({duration_ms:.1f} ms, {rows} filas) en {caller}: "
+                                      f"{statement} params={redact_params(params)}")
+
+    def snapshot(self) -> List[StatementStats]:
+        """Estadísticas por sentencia, de mayor a menor tiempo total."""
+        with self._lock:
+            items = [(statement, agg, sorted(agg.samples), dict(agg.callers)) for statement, agg in self._stats.items()]
+        result = [
+            StatementStats(statement, callers, agg.count, agg.rows, round(agg.total, 3),
+                           round(_percentile(ordered, 0.50), 3), round(_percentile(ordered, 0.95), 3),
+                           round(_percentile(ordered, 0.99), 3), round(agg.max, 3))
+            for statement, agg, ordered, callers in items
+        ]
+        return sorted(result, key=lambda s: s.total_ms, reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.slow_queries = 0
+
+    def to_json(self) -> str:
+        return json.dumps({"slow_ms": self.slow_ms, "slow_queries": self.slow_queries,
+                           "statements": [asdict(s) for s in self.snapshot()]},
+                          indent=2, ensure_ascii=False)
+
+    def dump(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_json())
+
+
+# --- Conexiones instrumentadas ---
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor que mide cada sentencia, incluido el tiempo de leer sus filas.
+
+    Una SELECT se da por terminada al agotar sus filas, al lanzar otra sentencia con
+    el mismo cursor o al cerrarlo/liberarlo; las demás sentencias, al volver de execute.
+    """
+
+    _pending = None  # [sql, params, ms acumulados, filas, llamador]
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        caller = _caller()
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self._pending = [sql, parameters, elapsed, 0, caller]
+            if self.description is None:  # no devuelve filas: INSERT/UPDATE/DELETE/PRAGMA...
+                self._pending[3] = max(self.rowcount, 0)
+                self._finish()
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        caller = _caller()
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self._pending = [sql, (), elapsed, max(self.rowcount, 0), caller]
+            self._finish()
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._consumed(started, 0 if row is None else 1, exhausted=row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._consumed(started, len(rows), exhausted=not rows)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._consumed(started, len(rows), exhausted=True)
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._consumed(started, 0, exhausted=True)
+            raise
+        self._consumed(started, 1, exhausted=False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+    def _consumed(self, started: float, rows: int, exhausted: bool):
+        pending = self._pending
+        if pending is None:
+            return
+        pending[2] += (time.perf_counter() - started) * 1000
+        pending[3] += rows
+        if exhausted:
+            self._finish()
+
+    def _finish(self):
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            self.connection.query_stats.record(*pending)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Conexión cuyos cursores (incluidos los de execute()) registran en `query_stats`."""
+
+    query_stats: QueryStats
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Hashable, Optional, Tuple
+
+
+@dataclass
+class LimiterStats:
+    """Métricas acumuladas del limitador."""
+    rejected: int
+    evictions: int
+    keys: int
+
+
+class SlidingWindowLimiter:
+    """Limita los intentos por clave a `max_attempts` en los últimos `window_seconds`.
+
+    Cada clave guarda las marcas de tiempo de sus intentos en un deque acotado a
+    `max_attempts`: cada marca entra y sale una sola vez, así que comprobar y registrar
+    es O(1) amortizado. Las claves se guardan en orden LRU y, pasadas `max_keys`, se
+    desaloja la menos reciente, de modo que la memoria no crece con el número de
+    usuarios o direcciones distintos.
+    """
+
+    def __init__(self, max_attempts: int = 5, window_seconds: float = 300.0, max_keys: int = 10_000,
+                 clock: Callable[[], float] = time.monotonic):
+        if max_attempts < 1:
+            raise ValueError("max_attempts debe ser al menos 1.")
+        self.max_attempts = max_attempts
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._attempts: "OrderedDict[Hashable, Deque[float]]" = OrderedDict()
+        self._rejected = 0
+        self._evictions = 0
+
+    def _prune(self, key: Hashable, now: float) -> Deque[float]:
+        attempts = self._attempts.get(key)
+        if attempts is None:
+            return deque()
+        while attempts and attempts[0] <= now - self.window_seconds:
+            attempts.popleft()
+        if not attempts:
+            del self._attempts[key]
+        return attempts
+
+    def check(self, key: Hashable) -> float:
+        """0 si la clave puede intentarlo; si no, segundos hasta que pueda (y cuenta el rechazo)."""
+        with self._lock:
+            now = self._clock()
+            attempts = self._prune(key, now)
+            if len(attempts) < self.max_attempts:
+                return 0.0
+            self._rejected += 1
+            return attempts[0] + self.window_seconds - now
+
+    def hit(self, key: Hashable):
+        """Registra un intento (p.ej. un login fallido) de la clave."""
+        with self._lock:
+            self._record(key, self._clock())
+
+    def check_and_hit(self, key: Hashable) -> Tuple[float, Optional[float]]:
+        """check() y hit() en un solo paso: si la clave puede intentarlo, el intento queda
+        registrado antes de devolver. Con check() y hit() por separado, N peticiones
+        concurrentes pasan todas el check() antes de que llegue ningún hit().
+
+        Devuelve (espera, intento): (0, marca del intento registrado, para `release()`)
+        o (segundos hasta que pueda, None) si se rechaza.
+        """
+        with self._lock:
+            now = self._clock()
+            attempts = self._prune(key, now)
+            if len(attempts) >= self.max_attempts:
+                self._rejected += 1
+                return attempts[0] + self.window_seconds - now, None
+            self._record(key, now)
+            return 0.0, now
+
+    def release(self, key: Hashable, attempt: float):
+        """Devuelve el intento `attempt` que registró check_and_hit() (p.ej. el de un login
+        que resultó correcto). Los intentos de otras peticiones concurrentes siguen contando."""
+        with self._lock:
+            attempts = self._attempts.get(key)
+            if attempts and attempt in attempts:
+                attempts.remove(attempt)
+                if not attempts:
+                    del self._attempts[key]
+
+    def _record(self, key: Hashable, now: float):
+        attempts = self._prune(key, now)
+        if key not in self._attempts:
+            attempts = self._attempts[key] = deque(maxlen=self.max_attempts)
+        attempts.append(now)
+        self._attempts.move_to_end(key)
+        while len(self._attempts) > self.max_keys:
+            self._attempts.popitem(last=False)
+            self._evictions += 1
+
+    def reset(self, key: Hashable):
+        """Olvida los intentos de la clave (p.ej. tras un login correcto)."""
+        with self._lock:
+            self._attempts.pop(key, None)
+
+    def stats(self) -> LimiterStats:
+        with self._lock:
+            return LimiterStats(self._rejected, self._evictions, len(self._attempts))
+
+
+def forwarded_client(forwarded_for: Optional[str], trusted_hops: int) -> Optional[str]:
+    """Dirección del cliente según X-Forwarded-For detrás de `trusted_hops` proxies propios.
+
+    Cada proxy añade al final la dirección de la que recibió la petición, así que solo las
+    `trusted_hops` últimas entradas son fiables; las anteriores las pone el cliente y
+    rotarlas daría intentos ilimitados. None si la cabecera tiene menos entradas de las
+    esperadas (la petición no pasó por los proxies).
+    """
+    entries = [entry.strip() for entry in (forwarded_for or "").split(",") if entry.strip()]
+    if trusted_hops < 1 or len(entries) < trusted_hops:
+        return None
+    return entries[-trusted_hops]
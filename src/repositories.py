@@ -1,10 +1,211 @@
-from typing import List, Optional, Any
-from src.interfaces import IRepository
+from collections import namedtuple
+from dataclasses import fields
+from typing import List, Optional, Any, Callable, Dict, Iterable, Sequence, Tuple
+from src.interfaces import IRepository, Page, Columns
 from src.models import Client, Pet, Appointment, MedicalRecord, Invoice, Review # <--- Importar Review
+from src.models import AppointmentDetail, DashboardStats, SearchResult, PetMedicalSummary
+import json
+import re
 from src.database import DatabaseManager
 from src.utils import logger
-from datetime import date, datetime # <--- Importar datetime para conversión
-from src.models import User # Añadir User a los imports
+from datetime import date
+from src.models import User, Session # Añadir User a los imports
+
+MAX_PAGE_SIZE = 500
+# Máximo de opciones que devuelve una búsqueda para los selectores
+MAX_LOOKUP_SIZE = 100
+
+# --- Decodificación de filas ---
+def _to_date(value: Any) -> Optional[date]:
+    """Fecha guardada por SQLite ('YYYY-MM-DD') a date.
+
+    date.fromisoformat está en C y es ~10x más rápido que datetime.strptime, que
+    interpreta el formato en Python en cada llamada.
+    """
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(value)
+
+def _row_decoder(model: Callable[..., Any], converters: Dict[int, Callable[[Any], Any]]) -> Callable[[tuple], Any]:
+    """Función fila -> `model` que aplica `converters` (posición -> conversión).
+
+    Se construye una vez por repositorio, no en cada fila.
+    """
+    if not converters:
+        return lambda row: model(*row)
+    items = tuple(converters.items())
+
+    def decode(row: tuple) -> Any:
+        values = list(row)
+        for i, convert in items:
+            values[i] = convert(values[i])
+        return model(*values)
+    return decode
+
+def _columns_decoder(model: type, converters: Dict[int, Callable[[Any], Any]] = None) -> Callable[[List[tuple]], Columns]:
+    """Función filas -> Columns con los campos de la dataclass `model`.
+
+    Transpone las filas del cursor sin crear un objeto por fila; las conversiones
+    (mismas posiciones que en _row_decoder) se aplican columna a columna.
+    """
+    names = [f.name for f in fields(model)]
+    converters = converters or {}
+
+    def decode(rows: List[tuple]) -> Columns:
+        values = list(zip(*rows)) if rows else [() for _ in names]
+        for i, convert in converters.items():
+            values[i] = tuple(map(convert, values[i]))
+        return Columns(list(names), values)
+    return decode
+
+def _row_tuple(model: type) -> type:
+    """namedtuple con los campos de la dataclass `model`: proyección ligera para listados
+    grandes (mismos valores y nombres, sin un __dict__ por fila)."""
+    return namedtuple(f"{model.__name__}Row", [f.name for f in fields(model)])
+
+# --- Paginación por cursor (keyset) ---
+def keyset_page(db: DatabaseManager, table: str, columns: str, row_factory: Callable[[tuple], Any],
+                orderable: Dict[str, str], filterable: Dict[str, str], default_order: str,
+                limit: int, after_key: Optional[Tuple[Any, ...]], order_by: Optional[str],
+                filters: Optional[Dict[str, Any]], id_col: str = "id",
+                columns_factory: Optional[Callable[[List[tuple]], Columns]] = None,
+                nullable: Sequence[str] = ()) -> Page:
+    """Devuelve una página ordenada por (columna, id) sin usar OFFSET.
+
+    `columns` debe empezar por `id_col` (que puede ir cualificado, p.ej. "a.id", si
+    `table` es un JOIN). `order_by` es un nombre de `orderable`, con prefijo "-" para
+    orden descendente. `after_key` es el `next_key` de la página anterior. Solo se
+    aceptan columnas de las listas blancas (van interpoladas en el SQL) y todas deben
+    estar indexadas. Con `columns_factory` la página trae Columns en vez de modelos.
+
+    `nullable` son los nombres de `orderable` cuya columna admite NULL. SQLite ordena los
+    NULL antes que cualquier valor (al principio en ASC, al final en DESC) y ninguno
+    cumple `(col, id) > (?, ?)`, así que tras el cursor se recorren por separado el tramo
+    de los NULL y el de los valores, cada uno un rango del índice, hasta llenar la página.
+    En las demás columnas un cursor con NULL no puede salir de una página y se rechaza.
+    """
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"El tamaño de página debe estar entre 1 y {MAX_PAGE_SIZE}.")
+
+    order_by = order_by or default_order
+    descending = order_by.startswith("-")
+    order_name = order_by.lstrip("-")
+    if order_name not in orderable:
+        raise ValueError(f"No se puede ordenar {table} por '{order_name}'.")
+    order_col = orderable[order_name]
+    by_id = order_col == id_col
+
+    where, params = [], []
+    for name, value in (filters or {}).items():
+        if name not in filterable:
+            raise ValueError(f"No se puede filtrar {table} por '{name}'.")
+        where.append(f"{filterable[name]} = ?")
+        params.append(value)
+
+    direction, op = ("DESC", "<") if descending else ("ASC", ">")
+    # Tramos a recorrer en orden: (condiciones, parámetros) que se añaden a los filtros
+    segments: List[Tuple[List[str], List[Any]]] = [([], [])]
+    if after_key is not None:
+        if by_id:
+            segments = [([f"{id_col} {op} ?"], [after_key[-1]])]
+        elif after_key[0] is None and order_name not in nullable:
+            raise ValueError(f"Cursor inválido: '{order_name}' no admite NULL.")
+        elif after_key[0] is None:
+            segments = [([f"{order_col} IS NULL", f"{id_col} {op} ?"], [after_key[-1]])]
+            if not descending:
+                segments.append(([f"{order_col} IS NOT NULL"], []))
+        else:
+            segments = [([f"({order_col}, {id_col}) {op} (?, ?)"], list(after_key))]
+            if descending and order_name in nullable:
+                segments.append(([f"{order_col} IS NULL"], []))
+
+    order_clause = f"{id_col} {direction}" if by_id else f"{order_col} {direction}, {id_col} {direction}"
+    rows: List[tuple] = []
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        for segment_where, segment_params in segments:
+            sql = f"SELECT {columns} FROM {table}"
+            if where or segment_where:
+                sql += " WHERE " + " AND ".join(where + segment_where)
+            sql += f" ORDER BY {order_clause} LIMIT ?"
+            # Una fila extra para saber si hay más
+            cursor.execute(sql, params + segment_params + [limit + 1 - len(rows)])
+            rows += cursor.fetchall()
+            if len(rows) > limit:
+                break
+
+    next_key = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        # La clave son (columna de orden, id) de la última fila, en crudo tal como está en SQLite
+        select_cols = [c.strip() for c in columns.split(",")]
+        last = rows[-1]
+        next_key = (last[0],) if by_id else (last[select_cols.index(order_col)], last[0])
+    if columns_factory is not None:
+        return Page(columns_factory(rows), next_key)
+    return Page([row_factory(row) for row in rows], next_key)
+
+# --- Búsqueda de texto (buscador global y selectores) ---
+def fts_query(text: str) -> Optional[str]:
+    """Convierte lo que escribe el usuario en una consulta FTS5 segura.
+
+    Cada palabra se entrecomilla (los operadores de FTS5 se tratan como texto) y se busca
+    por prefijo, así que "ana gar" encuentra "Ana García". None si no hay palabras.
+    """
+    words = re.findall(r"\w+", text or "")
+    return " ".join(f'"{word}"*' for word in words) or None
+
+def _escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _name_lookup(db: DatabaseManager, table: str, columns: str, row_factory: Callable[[tuple], Any],
+                 text: str, limit: int) -> List[Any]:
+    """Hasta `limit` filas de `table` cuyo nombre coincide con lo tecleado.
+
+    Primero las que empiezan por `text` (LIKE sobre el índice `name COLLATE NOCASE`, en
+    orden alfabético); si faltan, las que tienen alguna palabra del nombre que empieza
+    así ("gar" -> "Ana García"), vía el índice FTS5 de la tabla. `columns` empieza por id.
+    """
+    if not 1 <= limit <= MAX_LOOKUP_SIZE:
+        raise ValueError(f"El número de opciones debe estar entre 1 y {MAX_LOOKUP_SIZE}.")
+    text = (text or "").strip()
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {columns} FROM {table} WHERE name LIKE ? ESCAPE '\\' "
+                       f"ORDER BY name COLLATE NOCASE LIMIT ?", (_escape_like(text) + "%", limit))
+        rows = cursor.fetchall()
+        match = fts_query(text)
+        if match and len(rows) < limit:
+            qualified = ", ".join(f"t.{c.strip()}" for c in columns.split(","))
+            cursor.execute(f"SELECT {qualified} FROM {table}_fts JOIN {table} t ON t.id = {table}_fts.rowid "
+                           f"WHERE {table}_fts MATCH ? ORDER BY rank LIMIT ?",
+                           (f"name : ({match})", limit + len(rows)))
+            seen = {row[0] for row in rows}
+            rows += [row for row in cursor.fetchall() if row[0] not in seen][:limit - len(rows)]
+    return [row_factory(row) for row in rows]
+
+# --- Inserciones masivas ---
+def _insert_many(db: DatabaseManager, sql: str, rows: Sequence[tuple]) -> List[int]:
+    """Inserta `rows` con un solo executemany y devuelve los ids asignados, en orden.
+
+    Todo ocurre en una transacción de escritura, así que ninguna otra conexión puede
+    insertar entre medias; con AUTOINCREMENT y sin ids explícitos, SQLite asigna ids
+    consecutivos y el primero se deduce de last_insert_rowid(). (cursor.lastrowid no
+    es fiable tras executemany en todas las versiones de Python.)
+    """
+    if not rows:
+        return []
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(sql, rows)
+        last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+    first_id = last_id - len(rows) + 1
+    return list(range(first_id, last_id + 1))
+
+def _assign_ids(items: List[Any], ids: List[int]) -> List[Any]:
+    for item, new_id in zip(items, ids):
+        item.id = new_id
+    return items
 
 # --- Client Repository ---
 class ClientRepository(IRepository):
@@ -12,36 +213,74 @@ class ClientRepository(IRepository):
         self.db = db
 
     def create(self, client: Client) -> Client:
-        with self.db.get_connection() as conn:
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("INSERT INTO clients (name, email, phone) VALUES (?, ?, ?)", 
                            (client.name, client.email, client.phone))
             client.id = cursor.lastrowid
             return client
 
+    def create_many(self, clients: Iterable[Client]) -> List[Client]:
+        clients = list(clients)
+        ids = _insert_many(self.db, "INSERT INTO clients (name, email, phone) VALUES (?, ?, ?)",
+                           [(c.name, c.email, c.phone) for c in clients])
+        return _assign_ids(clients, ids)
+
     def get_all(self) -> List[Client]:
-        with self.db.get_connection() as conn:
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT id, name, email, phone FROM clients")
             rows = cursor.fetchall()
             return [Client(*row) for row in rows]
 
+    def has_any(self) -> bool:
+        """True si hay al menos un cliente (sin leer la tabla entera)."""
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1 FROM clients LIMIT 1")
+            return cursor.fetchone() is not None
+
+    def lookup(self, text: str, limit: int = 20) -> List[Client]:
+        """Clientes para un selector: los que empiezan por `text` y luego los que lo contienen como palabra."""
+        return _name_lookup(self.db, "clients", "id, name, email, phone", lambda row: Client(*row), text, limit)
+
+    def get_names(self, ids: Iterable[int]) -> Dict[int, str]:
+        """Nombre de cada id (solo los que existen), en una consulta por la clave primaria."""
+        ids = list({int(i) for i in ids})
+        if not ids:
+            return {}
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT id, name FROM clients WHERE id IN ({', '.join('?' * len(ids))})", ids)
+            return dict(cursor.fetchall())
+
+    _columns_from_rows = staticmethod(_columns_decoder(Client))
+
+    def list_page(self, limit: int = 50, after_key: Optional[Tuple[Any, ...]] = None,
+                  order_by: Optional[str] = None, filters: Optional[Dict[str, Any]] = None,
+                  columnar: bool = False) -> Page:
+        return keyset_page(self.db, "clients", "id, name, email, phone", lambda row: Client(*row),
+                           orderable={"id": "id", "name": "name"}, filterable={},
+                           default_order="id", limit=limit, after_key=after_key,
+                           order_by=order_by, filters=filters,
+                           columns_factory=self._columns_from_rows if columnar else None)
+
     def update(self, item: Any) -> bool: 
         client = item 
-        with self.db.get_connection() as conn:
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("UPDATE clients SET name=?, email=?, phone=? WHERE id=?", 
                            (client.name, client.email, client.phone, client.id))
             return cursor.rowcount > 0
 
     def delete(self, item_id: int) -> bool:
-        with self.db.get_connection() as conn:
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM clients WHERE id=?", (item_id,))
             return cursor.rowcount > 0
             
     def get_by_id(self, item_id: int) -> Any: 
-        with self.db.get_connection() as conn:
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT id, name, email, phone FROM clients WHERE id=?", (item_id,))
             row = cursor.fetchone()
@@ -54,41 +293,70 @@ class PetRepository(IRepository):
         self.db = db
     
     def create(self, pet: Pet) -> Pet:
-        with self.db.get_connection() as conn:
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("INSERT INTO pets (name, species, breed, age, client_id) VALUES (?,?,?,?,?)",
                            (pet.name, pet.species, pet.breed, pet.age, pet.client_id))
             pet.id = cursor.lastrowid
             return pet
 
+    def create_many(self, pets: Iterable[Pet]) -> List[Pet]:
+        pets = list(pets)
+        ids = _insert_many(self.db, "INSERT INTO pets (name, species, breed, age, client_id) VALUES (?,?,?,?,?)",
+                           [(p.name, p.species, p.breed, p.age, p.client_id) for p in pets])
+        return _assign_ids(pets, ids)
+
     def get_all(self) -> List[Pet]:
-        with self.db.get_connection() as conn:
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT id, name, species, breed, age, client_id FROM pets")
             return [Pet(*row) for row in cursor.fetchall()]
+
+    def has_any(self) -> bool:
+        """True si hay al menos una mascota (sin leer la tabla entera)."""
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1 FROM pets LIMIT 1")
+            return cursor.fetchone() is not None
+
+    def lookup(self, text: str, limit: int = 20) -> List[Pet]:
+        """Mascotas para un selector: las que empiezan por `text` y luego las que lo contienen como palabra."""
+        return _name_lookup(self.db, "pets", "id, name, species, breed, age, client_id", lambda row: Pet(*row),
+                            text, limit)
+
+    _columns_from_rows = staticmethod(_columns_decoder(Pet))
+
+    def list_page(self, limit: int = 50, after_key: Optional[Tuple[Any, ...]] = None,
+                  order_by: Optional[str] = None, filters: Optional[Dict[str, Any]] = None,
+                  columnar: bool = False) -> Page:
+        return keyset_page(self.db, "pets", "id, name, species, breed, age, client_id", lambda row: Pet(*row),
+                           orderable={"id": "id", "name": "name"}, filterable={"client_id": "client_id"},
+                           default_order="id", limit=limit, after_key=after_key,
+                           order_by=order_by, filters=filters,
+                           columns_factory=self._columns_from_rows if columnar else None)
             
     def get_by_client(self, client_id: int) -> List[Pet]:
-         with self.db.get_connection() as conn:
+         with self.db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT id, name, species, breed, age, client_id FROM pets WHERE client_id=?", (client_id,))
             return [Pet(*row) for row in cursor.fetchall()]
 
     def update(self, item: Any) -> bool: 
         pet = item
-        with self.db.get_connection() as conn:
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("UPDATE pets SET name=?, species=?, breed=?, age=?, client_id=? WHERE id=?", 
                            (pet.name, pet.species, pet.breed, pet.age, pet.client_id, pet.id))
             return cursor.rowcount > 0 
 
     def delete(self, item_id: int) -> bool: 
-        with self.db.get_connection() as conn:
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM pets WHERE id=?", (item_id,))
             return cursor.rowcount > 0
             
     def get_by_id(self, item_id: int) -> Any: 
-        with self.db.get_connection() as conn:
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT id, name, species, breed, age, client_id FROM pets WHERE id=?", (item_id,))
             row = cursor.fetchone()
@@ -101,35 +369,91 @@ class AppointmentRepository(IRepository):
         self.db = db
 
     def create(self, appt: Appointment) -> Appointment:
-        with self.db.get_connection() as conn:
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("INSERT INTO appointments (pet_id, date, reason, status) VALUES (?,?,?,?)",
                            (appt.pet_id, appt.date, appt.reason, appt.status))
             appt.id = cursor.lastrowid
             return appt
+
+    def create_many(self, appts: Iterable[Appointment]) -> List[Appointment]:
+        appts = list(appts)
+        ids = _insert_many(self.db, "INSERT INTO appointments (pet_id, date, reason, status) VALUES (?,?,?,?)",
+                           [(a.pet_id, a.date, a.reason, a.status) for a in appts])
+        return _assign_ids(appts, ids)
             
     def get_all(self) -> List[Appointment]:
-        with self.db.get_connection() as conn:
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT id, pet_id, date, reason, status FROM appointments")
             return [Appointment(*row) for row in cursor.fetchall()]
 
+    _columns_from_rows = staticmethod(_columns_decoder(Appointment))
+
+    def list_page(self, limit: int = 50, after_key: Optional[Tuple[Any, ...]] = None,
+                  order_by: Optional[str] = None, filters: Optional[Dict[str, Any]] = None,
+                  columnar: bool = False) -> Page:
+        return keyset_page(self.db, "appointments", "id, pet_id, date, reason, status", lambda row: Appointment(*row),
+                           orderable={"id": "id", "date": "date"},
+                           filterable={"pet_id": "pet_id", "status": "status"},
+                           default_order="-date", limit=limit, after_key=after_key,
+                           order_by=order_by, filters=filters, nullable=("date",),
+                           columns_factory=self._columns_from_rows if columnar else None)
+
+    # Citas con el nombre/especie de la mascota y el nombre del dueño ya resueltos en SQL.
+    # LEFT JOIN: una cita cuya mascota ya no existe sigue apareciendo (con nombres a None).
+    _DETAIL_COLUMNS = "a.id, a.pet_id, a.date, a.reason, a.status, p.name, p.species, c.name"
+    _DETAIL_FROM = """appointments a
+                LEFT JOIN pets p ON p.id = a.pet_id
+                LEFT JOIN clients c ON c.id = p.client_id"""
+    # La fecha llega como 'YYYY-MM-DD': se convierte a date, como en Invoice y Review
+    _detail_from_row = staticmethod(_row_decoder(AppointmentDetail, {2: _to_date}))
+    _detail_columns_from_rows = staticmethod(_columns_decoder(AppointmentDetail, {2: _to_date}))
+
+    def get_all_with_details(self) -> List[AppointmentDetail]:
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT {self._DETAIL_COLUMNS} FROM {self._DETAIL_FROM} ORDER BY a.date")
+            return list(map(self._detail_from_row, cursor.fetchall()))
+
+    def get_in_range(self, start: date, end: date, status: Optional[str] = None) -> List[AppointmentDetail]:
+        """Citas con fecha en [start, end), con nombres resueltos. Usa el índice de appointments.date."""
+        query = f"SELECT {self._DETAIL_COLUMNS} FROM {self._DETAIL_FROM} WHERE a.date >= ? AND a.date < ?"
+        params = [str(start), str(end)]
+        if status is not None:
+            query += " AND a.status = ?"
+            params.append(status)
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query + " ORDER BY a.date, a.id", params)
+            return list(map(self._detail_from_row, cursor.fetchall()))
+
+    def list_details_page(self, limit: int = 50, after_key: Optional[Tuple[Any, ...]] = None,
+                          order_by: Optional[str] = None, filters: Optional[Dict[str, Any]] = None,
+                          columnar: bool = False) -> Page:
+        return keyset_page(self.db, self._DETAIL_FROM, self._DETAIL_COLUMNS, self._detail_from_row,
+                           orderable={"id": "a.id", "date": "a.date"},
+                           filterable={"pet_id": "a.pet_id", "status": "a.status"},
+                           default_order="-date", limit=limit, after_key=after_key,
+                           order_by=order_by, filters=filters, nullable=("date",), id_col="a.id",
+                           columns_factory=self._detail_columns_from_rows if columnar else None)
+
     def update(self, item: Any) -> bool: 
         appt = item
-        with self.db.get_connection() as conn:
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("UPDATE appointments SET pet_id=?, date=?, reason=?, status=? WHERE id=?",
                            (appt.pet_id, appt.date, appt.reason, appt.status, appt.id))
             return cursor.rowcount > 0
 
     def delete(self, item_id: int) -> bool: 
-        with self.db.get_connection() as conn:
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM appointments WHERE id=?", (item_id,))
             return cursor.rowcount > 0
             
     def get_by_id(self, item_id: int) -> Any: 
-        with self.db.get_connection() as conn:
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT id, pet_id, date, reason, status FROM appointments WHERE id=?", (item_id,))
             row = cursor.fetchone()
@@ -142,28 +466,59 @@ class MedicalRecordRepository(IRepository):
         self.db = db
 
     def create(self, record: MedicalRecord) -> MedicalRecord:
-        with self.db.get_connection() as conn:
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("INSERT INTO medical_records (appointment_id, diagnosis, treatment, notes) VALUES (?, ?, ?, ?)", 
                            (record.appointment_id, record.diagnosis, record.treatment, record.notes))
             record.id = cursor.lastrowid
             return record
 
+    def create_many(self, records: Iterable[MedicalRecord]) -> List[MedicalRecord]:
+        records = list(records)
+        ids = _insert_many(self.db, "INSERT INTO medical_records (appointment_id, diagnosis, treatment, notes) VALUES (?, ?, ?, ?)",
+                           [(r.appointment_id, r.diagnosis, r.treatment, r.notes) for r in records])
+        return _assign_ids(records, ids)
+
     def get_medical_history_by_pet(self, pet_id: int) -> List[tuple]:
-        """Obtiene todos los registros médicos y datos de la cita para una mascota."""
-        with self.db.get_connection() as conn:
+        """Obtiene todos los registros médicos y datos de la cita para una mascota.
+
+        Lee el historial materializado (migración 8, mantenido por triggers): un recorrido
+        de rango sobre la clave (pet_id, date, record_id), ya en orden y sin JOIN.
+        """
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             query = """
-                SELECT 
-                    mr.id, a.date, a.reason, mr.diagnosis, mr.treatment, mr.notes
-                FROM medical_records mr
-                JOIN appointments a ON mr.appointment_id = a.id
-                WHERE a.pet_id = ?
-                ORDER BY a.date DESC
+                SELECT record_id, date, reason, diagnosis, treatment, notes
+                FROM pet_medical_history
+                WHERE pet_id = ?
+                ORDER BY date DESC, record_id DESC
             """
             cursor.execute(query, (pet_id,))
             return cursor.fetchall() 
+
+    def get_summaries(self, pet_ids: Iterable[int]) -> Dict[int, PetMedicalSummary]:
+        """Resumen (visitas, última visita y diagnóstico) de las mascotas con historial."""
+        pet_ids = list({int(i) for i in pet_ids})
+        if not pet_ids:
+            return {}
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT pet_id, visit_count, last_visit, last_diagnosis FROM pet_medical_summary "
+                           f"WHERE pet_id IN ({', '.join('?' * len(pet_ids))})", pet_ids)
+            return {row[0]: PetMedicalSummary(*row) for row in cursor.fetchall()}
             
+    _columns_from_rows = staticmethod(_columns_decoder(MedicalRecord))
+
+    def list_page(self, limit: int = 50, after_key: Optional[Tuple[Any, ...]] = None,
+                  order_by: Optional[str] = None, filters: Optional[Dict[str, Any]] = None,
+                  columnar: bool = False) -> Page:
+        return keyset_page(self.db, "medical_records", "id, appointment_id, diagnosis, treatment, notes",
+                           lambda row: MedicalRecord(*row),
+                           orderable={"id": "id"}, filterable={"appointment_id": "appointment_id"},
+                           default_order="id", limit=limit, after_key=after_key,
+                           order_by=order_by, filters=filters,
+                           columns_factory=self._columns_from_rows if columnar else None)
+
     def get_all(self) -> List[Any]: return [] 
     def update(self, item: Any) -> bool: return False
     def delete(self, item_id: int) -> bool: return False
@@ -178,28 +533,70 @@ class BillingRepository(IRepository):
     def create(self, invoice: Invoice) -> Invoice:
         date_to_store = str(invoice.date) 
         
-        with self.db.get_connection() as conn:
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("INSERT INTO invoices (client_id, date, total_amount, status) VALUES (?, ?, ?, ?)", 
                            (invoice.client_id, date_to_store, invoice.total_amount, invoice.status))
             invoice.id = cursor.lastrowid
             return invoice
 
+    def create_many(self, invoices: Iterable[Invoice]) -> List[Invoice]:
+        invoices = list(invoices)
+        ids = _insert_many(self.db, "INSERT INTO invoices (client_id, date, total_amount, status) VALUES (?, ?, ?, ?)",
+                           [(i.client_id, str(i.date), i.total_amount, i.status) for i in invoices])
+        return _assign_ids(invoices, ids)
+
     def get_all(self) -> List[Invoice]:
-        with self.db.get_connection() as conn:
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT id, client_id, date, total_amount, status FROM invoices ORDER BY date DESC")
-            
-            invoices = []
-            for row in cursor.fetchall():
-                # Conversión de fecha de string a objeto date
-                date_obj = datetime.strptime(row[2], '%Y-%m-%d').date()
-                invoices.append(Invoice(row[0], row[1], date_obj, row[3], row[4]))
-            return invoices
+            return list(map(self._from_row, cursor.fetchall()))
+
+    def get_all_rows(self) -> List[Tuple]:
+        """Como get_all(), pero en namedtuples InvoiceRow (solo lectura, sin __dict__ por fila: menos memoria)."""
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, client_id, date, total_amount, status FROM invoices ORDER BY date DESC")
+            return list(map(self._tuple_from_row, cursor.fetchall()))
+
+    # Conversión de fecha de string a objeto date
+    _from_row = staticmethod(_row_decoder(Invoice, {2: _to_date}))
+    _tuple_from_row = staticmethod(_row_decoder(_row_tuple(Invoice), {2: _to_date}))
+    _columns_from_rows = staticmethod(_columns_decoder(Invoice, {2: _to_date}))
+
+    def list_page(self, limit: int = 50, after_key: Optional[Tuple[Any, ...]] = None,
+                  order_by: Optional[str] = None, filters: Optional[Dict[str, Any]] = None,
+                  columnar: bool = False) -> Page:
+        return keyset_page(self.db, "invoices", "id, client_id, date, total_amount, status", self._from_row,
+                           orderable={"id": "id", "date": "date"},
+                           filterable={"client_id": "client_id", "status": "status"},
+                           default_order="-date", limit=limit, after_key=after_key,
+                           order_by=order_by, filters=filters,
+                           columns_factory=self._columns_from_rows if columnar else None)
+
+    def update(self, item: Any) -> bool:
+        invoice = item
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE invoices SET client_id=?, date=?, total_amount=?, status=? WHERE id=?",
+                           (invoice.client_id, str(invoice.date), invoice.total_amount, invoice.status, invoice.id))
+            return cursor.rowcount > 0
+
+    def set_status(self, invoice_id: int, status: str) -> bool:
+        """Cambia solo el estado (p.ej. al cobrarla). Los agregados los ajusta el trigger."""
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE invoices SET status=? WHERE id=?", (status, invoice_id))
+            return cursor.rowcount > 0
 
-    def update(self, item: Any) -> bool: return False
     def delete(self, item_id: int) -> bool: return False
-    def get_by_id(self, item_id: int) -> Any: return None # <--- Implementado
+
+    def get_by_id(self, item_id: int) -> Any:
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, client_id, date, total_amount, status FROM invoices WHERE id=?", (item_id,))
+            row = cursor.fetchone()
+            return self._from_row(row) if row else None
 
 # --- Review Repository (NUEVO) ---
 class ReviewRepository(IRepository):
@@ -208,28 +605,125 @@ class ReviewRepository(IRepository):
 
     def create(self, review: Review) -> Review:
         date_to_store = str(review.date)
-        with self.db.get_connection() as conn:
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("INSERT INTO reviews (client_id, rating, comment, review_date) VALUES (?, ?, ?, ?)", 
                            (review.client_id, review.rating, review.comment, date_to_store))
             review.id = cursor.lastrowid
             return review
 
+    def create_many(self, reviews: Iterable[Review]) -> List[Review]:
+        reviews = list(reviews)
+        ids = _insert_many(self.db, "INSERT INTO reviews (client_id, rating, comment, review_date) VALUES (?, ?, ?, ?)",
+                           [(r.client_id, r.rating, r.comment, str(r.date)) for r in reviews])
+        return _assign_ids(reviews, ids)
+
     def get_all(self) -> List[Review]:
-        with self.db.get_connection() as conn:
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT id, client_id, rating, comment, review_date FROM reviews ORDER BY review_date DESC")
-            reviews = []
-            for row in cursor.fetchall():
-                # review_date está en el índice 4
-                date_obj = datetime.strptime(row[4], '%Y-%m-%d').date()
-                reviews.append(Review(row[0], row[1], row[2], row[3], date_obj))
-            return reviews
+            return list(map(self._from_row, cursor.fetchall()))
+
+    def get_all_rows(self) -> List[Tuple]:
+        """Como get_all(), pero en namedtuples ReviewRow (solo lectura, sin __dict__ por fila: menos memoria)."""
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, client_id, rating, comment, review_date FROM reviews ORDER BY review_date DESC")
+            return list(map(self._tuple_from_row, cursor.fetchall()))
+
+    # review_date está en el índice 4
+    _from_row = staticmethod(_row_decoder(Review, {4: _to_date}))
+    _tuple_from_row = staticmethod(_row_decoder(_row_tuple(Review), {4: _to_date}))
+    _columns_from_rows = staticmethod(_columns_decoder(Review, {4: _to_date}))
+
+    def list_page(self, limit: int = 50, after_key: Optional[Tuple[Any, ...]] = None,
+                  order_by: Optional[str] = None, filters: Optional[Dict[str, Any]] = None,
+                  columnar: bool = False) -> Page:
+        return keyset_page(self.db, "reviews", "id, client_id, rating, comment, review_date", self._from_row,
+                           orderable={"id": "id", "date": "review_date"},
+                           filterable={"client_id": "client_id", "rating": "rating"},
+                           default_order="-date", limit=limit, after_key=after_key,
+                           order_by=order_by, filters=filters,
+                           columns_factory=self._columns_from_rows if columnar else None)
             
     def update(self, item: Any) -> bool: return False
     def delete(self, item_id: int) -> bool: return False
     def get_by_id(self, item_id: int) -> Any: return None
 
+# --- Stats Repository (agregados de solo lectura) ---
+class StatsRepository:
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+
+    def dashboard_stats(self, month_start: date, month_end: date) -> DashboardStats:
+        """Todos los contadores del inicio en una sola consulta (un único viaje a la BD)."""
+        query = """
+            SELECT
+                (SELECT COUNT(*) FROM clients),
+                (SELECT COUNT(*) FROM pets),
+                (SELECT COUNT(*) FROM appointments),
+                (SELECT json_group_object(status, n) FROM
+                    (SELECT COALESCE(status, '') AS status, COUNT(*) AS n FROM appointments GROUP BY status)),
+                (SELECT json_group_object(species, n) FROM
+                    (SELECT species, COUNT(*) AS n FROM pets GROUP BY species)),
+                (SELECT COALESCE(SUM(total_cents), 0) / 100.0 FROM revenue_by_period
+                    WHERE grain = 'day' AND period >= ? AND period < ?)
+        """
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, (str(month_start), str(month_end)))
+            row = cursor.fetchone()
+        return DashboardStats(row[0], row[1], row[2], json.loads(row[3]), json.loads(row[4]), float(row[5]))
+
+    def data_versions(self) -> Dict[str, int]:
+        """Versión de datos de cada tabla (la suben los triggers de la migración 10, también
+        con las escrituras de otros procesos). La usa la caché de lecturas."""
+        with self.db.connection() as conn:
+            return dict(conn.execute("SELECT table_name, version FROM data_versions").fetchall())
+
+class SearchRepository:
+    """Búsqueda de texto completo sobre los índices FTS5 (ver migración 6)."""
+
+    # Una consulta por tipo de entidad. FTS5 resuelve el MATCH y el ORDER BY rank con su
+    # índice; el JOIN solo toca las filas devueltas.
+    QUERIES = {
+        "client": """
+            SELECT c.id, c.name, c.email || ' · ' || c.phone,
+                   snippet(clients_fts, -1, '[', ']', '…', 8), bm25(clients_fts)
+            FROM clients_fts JOIN clients c ON c.id = clients_fts.rowid
+            WHERE clients_fts MATCH ? ORDER BY rank LIMIT ?
+        """,
+        "pet": """
+            SELECT p.id, p.name, p.species || ' · ' || p.breed || ' · ' || COALESCE(c.name, ''),
+                   snippet(pets_fts, -1, '[', ']', '…', 8), bm25(pets_fts)
+            FROM pets_fts JOIN pets p ON p.id = pets_fts.rowid
+            LEFT JOIN clients c ON c.id = p.client_id
+            WHERE pets_fts MATCH ? ORDER BY rank LIMIT ?
+        """,
+        "medical_record": """
+            SELECT m.id, m.diagnosis, COALESCE(p.name, '') || ' · ' || COALESCE(a.date, ''),
+                   snippet(medical_records_fts, -1, '[', ']', '…', 8), bm25(medical_records_fts)
+            FROM medical_records_fts JOIN medical_records m ON m.id = medical_records_fts.rowid
+            LEFT JOIN appointments a ON a.id = m.appointment_id
+            LEFT JOIN pets p ON p.id = a.pet_id
+            WHERE medical_records_fts MATCH ? ORDER BY rank LIMIT ?
+        """,
+    }
+
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+
+    def search(self, match: str, limit: int = 20, kinds: Optional[Iterable[str]] = None) -> List[SearchResult]:
+        """Los `limit` resultados más relevantes de cada tipo, mezclados por puntuación."""
+        results = []
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            for kind in (kinds or self.QUERIES):
+                cursor.execute(self.QUERIES[kind], (match, limit))
+                results.extend(SearchResult(kind, *row) for row in cursor.fetchall())
+        results.sort(key=lambda r: r.score)
+        return results[:limit]
+
     #Login
 
 class UserRepository(IRepository):
@@ -237,22 +731,101 @@ class UserRepository(IRepository):
         self.db = db
 
     def create(self, user: User) -> User:
-        with self.db.get_connection() as conn:
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)", 
                            (user.username, user.password_hash, user.role))
             user.id = cursor.lastrowid
             return user
 
+    def create_many(self, users: Iterable[User]) -> List[User]:
+        users = list(users)
+        ids = _insert_many(self.db, "INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
+                           [(u.username, u.password_hash, u.role) for u in users])
+        return _assign_ids(users, ids)
+
     def get_by_username(self, username: str) -> Optional[User]:
-        with self.db.get_connection() as conn:
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT id, username, password_hash, role FROM users WHERE username = ?", (username,))
             row = cursor.fetchone()
             return User(*row) if row else None
 
+    def update(self, item: Any) -> bool:
+        user = item
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE users SET username=?, password_hash=?, role=? WHERE id=?",
+                           (user.username, user.password_hash, user.role, user.id))
+            return cursor.rowcount > 0
+
     # Métodos de la interfaz (pueden dejarse básicos o implementar si se requiere gestión de usuarios)
     def get_all(self) -> List[Any]: return []
-    def update(self, item: Any) -> bool: return False
     def delete(self, item_id: int) -> bool: return False
-    def get_by_id(self, item_id: int) -> Any: return None
\ No newline at end of file
+    def get_by_id(self, item_id: int) -> Any: return None
+
+    _columns_from_rows = staticmethod(_columns_decoder(User))
+
+    def list_page(self, limit: int = 50, after_key: Optional[Tuple[Any, ...]] = None,
+                  order_by: Optional[str] = None, filters: Optional[Dict[str, Any]] = None,
+                  columnar: bool = False) -> Page:
+        return keyset_page(self.db, "users", "id, username, password_hash, role", lambda row: User(*row),
+                           orderable={"id": "id", "username": "username"}, filterable={},
+                           default_order="id", limit=limit, after_key=after_key,
+                           order_by=order_by, filters=filters,
+                           columns_factory=self._columns_from_rows if columnar else None)
+
+class SessionRepository:
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+
+    def create(self, session: Session) -> Session:
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("INSERT INTO sessions (token_id, user_id, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                           (session.token_id, session.user_id, session.created_at, session.expires_at))
+        return session
+
+    def get_with_user(self, token_id: str) -> Optional[Tuple[Session, User]]:
+        """La sesión y su usuario en una sola consulta (None si no existe)."""
+        query = """
+            SELECT s.token_id, s.user_id, s.created_at, s.expires_at, u.id, u.username, u.password_hash, u.role
+            FROM sessions s JOIN users u ON u.id = s.user_id
+            WHERE s.token_id = ?
+        """
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, (token_id,))
+            row = cursor.fetchone()
+        return (Session(*row[:4]), User(*row[4:])) if row else None
+
+    def touch(self, token_id: str, expires_at: float) -> bool:
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE sessions SET expires_at=? WHERE token_id=?",
+                           (expires_at, token_id))
+            return cursor.rowcount > 0
+
+    def delete(self, token_id: str) -> bool:
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM sessions WHERE token_id=?", (token_id,))
+            return cursor.rowcount > 0
+
+    def delete_by_user(self, user_id: int) -> int:
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM sessions WHERE user_id=?", (user_id,))
+            return cursor.rowcount
+
+    def delete_all(self) -> int:
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM sessions")
+            return cursor.rowcount
+
+    def delete_expired(self, now: float) -> int:
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+            return cursor.rowcount
@@ -1,34 +1,127 @@
 # src/seeder.py
+"""Carga de datos iniciales y generador de clínicas sintéticas para pruebas de carga.
+
+Uso del generador:
+    python -m src.seeder bench.db --rows 1000000            # ~1M filas entre las 7 tablas
+    python -m src.seeder bench.db --clients 5000 --seed 7   # tamaño fijado por clientes
+"""
+import argparse
+import math
+import sys
+from dataclasses import dataclass, field
 from datetime import date, timedelta
 import random
+from typing import Callable, Dict, List, Optional
 from src.repositories import (
     ClientRepository, PetRepository, AppointmentRepository, 
-    MedicalRecordRepository, BillingRepository, ReviewRepository
+    MedicalRecordRepository, BillingRepository, ReviewRepository, UserRepository
 )
-from src.models import Client, Pet, Appointment, MedicalRecord, Invoice, Review
+from src.models import Client, Pet, Appointment, MedicalRecord, Invoice, Review, User
+from src.database import DatabaseManager, UnitOfWork, PRAGMA_PROFILES
 from src.utils import logger
 
+# --- Datos de referencia del generador sintético ---
+_FIRST_NAMES = ["Ana", "Carlos", "Elena", "Luis", "Marta", "Pedro", "Sofia", "Jorge", "Lucia", "Pablo",
+                "Carmen", "Javier", "Laura", "Diego", "Paula", "Miguel", "Irene", "Raul", "Sara", "Andres"]
+_LAST_NAMES = ["Garcia", "Ruiz", "Martin", "Torres", "Diaz", "Perez", "Lopez", "Sanchez", "Romero", "Navarro",
+               "Gomez", "Moreno", "Alonso", "Castro", "Ortega", "Molina", "Delgado", "Vidal", "Ramos", "Gil"]
+_PET_NAMES = ["Luna", "Max", "Mishi", "Coco", "Rocky", "Simba", "Nala", "Thor", "Lola", "Zeus",
+              "Kira", "Toby", "Bruno", "Lia", "Chispa", "Canela", "Oreo", "Pipo", "Duna", "Milo"]
+# Especie -> (peso, razas)
+_SPECIES = {
+    "Perro": (50, ["Mestizo", "Labrador", "Golden Retriever", "Pastor Alemán", "Bulldog", "Husky", "Chihuahua"]),
+    "Gato": (35, ["Común Europeo", "Persa", "Siames", "Maine Coon", "Bengalí"]),
+    "Roedor": (7, ["Hamster", "Cobaya", "Conejo"]),
+    "Ave": (5, ["Loro", "Periquito", "Canario"]),
+    "Reptil": (3, ["Tortuga", "Gecko", "Iguana"]),
+}
+# Motivo -> (peso, diagnóstico, tratamiento)
+_REASONS = {
+    "Vacunación": (30, "Sano, vacuna administrada", "Ninguno"),
+    "Revisión General": (25, "Sin hallazgos relevantes", "Control en 12 meses"),
+    "Desparasitación": (15, "Parásitos intestinales", "Antiparasitario oral"),
+    "Corte de uñas": (8, "Uñas largas", "Corte"),
+    "Consulta por vómitos": (10, "Gastroenteritis leve", "Dieta blanda y protector gástrico"),
+    "Dermatitis": (7, "Dermatitis alérgica", "Antihistamínico y champú"),
+    "Cirugía menor": (5, "Quiste cutáneo", "Extirpación y antibiótico"),
+}
+# Hash bcrypt fijo (coste 4) de la contraseña "synthetic", compartido por los usuarios
+# generados: hashear uno por uno dominaría el tiempo y haría la salida no reproducible
+_SYNTHETIC_PASSWORD_HASH = "$2b$04$TETfSkAlxc1Qa0dGGC3caeUWd7Xo4yay/lDyxccB0BG2s.swLDuae"
+_REVIEW_COMMENTS = {1: "Muy mala experiencia", 2: "Tiempos de espera largos", 3: "Correcto",
+                    4: "Muy amables", 5: "Excelente servicio"}
+
+
+@dataclass
+class SyntheticProfile:
+    """Distribuciones del generador. Los valores por defecto imitan una clínica real:
+    la mayoría de clientes tienen una mascota, unas pocas mascotas acumulan muchas
+    citas y casi todo el historial pasado está completado y facturado."""
+    # Peso de tener 1, 2, 3... mascotas
+    pets_per_client_weights: List[int] = field(default_factory=lambda: [55, 25, 12, 5, 3])
+    # Media de citas por mascota (distribución exponencial: cola larga)
+    appointments_per_pet_mean: float = 6.0
+    max_appointments_per_pet: int = 200
+    history_days: int = 3 * 365
+    future_days: int = 60
+    # Reparto de estados de las citas pasadas; las futuras son Pendiente salvo cancelaciones
+    past_status_weights: Dict[str, int] = field(default_factory=lambda: {
+        "Completada": 85, "Cancelada": 10, "Pendiente": 5})
+    future_cancel_rate: float = 0.05
+    # Probabilidades sobre las citas completadas
+    record_rate: float = 0.9
+    invoice_rate: float = 0.8
+    invoice_amount_median: float = 55.0
+    review_rate: float = 0.3
+    review_rating_weights: List[int] = field(default_factory=lambda: [3, 5, 12, 30, 50])
+    clients_per_user: int = 500
+
+    def pets_per_client(self) -> float:
+        """Mascotas esperadas por cliente."""
+        weights = self.pets_per_client_weights
+        return sum((i + 1) * w for i, w in enumerate(weights)) / sum(weights)
+
+    def rows_per_client(self) -> float:
+        """Filas esperadas (todas las tablas) por cada cliente generado."""
+        pets = self.pets_per_client()
+        past_share = self.history_days / (self.history_days + self.future_days)
+        completed = past_share * self.past_status_weights["Completada"] / sum(self.past_status_weights.values())
+        per_appt = 1 + completed * (self.record_rate + self.invoice_rate)
+        # Media de int(X) con X exponencial de media m: 1 / (e^(1/m) - 1)
+        visits = 1 / math.expm1(1 / self.appointments_per_pet_mean)
+        return 1 + pets * (1 + visits * per_appt) + self.review_rate + 1 / self.clients_per_user
+
+
 class DataSeeder:
     """Clase encargada exclusivamente de poblar la base de datos con datos iniciales."""
     
     def __init__(self, client_repo: ClientRepository, pet_repo: PetRepository, 
                  appt_repo: AppointmentRepository, mr_repo: MedicalRecordRepository, 
-                 bill_repo: BillingRepository, review_repo: ReviewRepository):
+                 bill_repo: BillingRepository, review_repo: ReviewRepository,
+                 user_repo: Optional[UserRepository] = None):
         self.client_repo = client_repo
         self.pet_repo = pet_repo
         self.appt_repo = appt_repo
         self.mr_repo = mr_repo
         self.bill_repo = bill_repo
         self.review_repo = review_repo
+        self.user_repo = user_repo
 
     def seed(self):
         """Ejecuta la carga de datos solo si no hay clientes registrados."""
-        if self.client_repo.get_all():
+        if self.client_repo.has_any():
             logger.info("La base de datos ya contiene datos. Se omite el seeding.")
             return
 
         logger.info("Iniciando carga de datos masiva...")
 
+        # Una sola transacción para todo el seeding (un commit en vez de uno por fila)
+        with UnitOfWork(self.client_repo.db):
+            self._seed_all()
+
+        logger.info("Carga de datos masiva completada exitosamente.")
+
+    def _seed_all(self):
         # --- 1. Clientes ---
         clients_data = [
             ("Ana García", "ana.garcia@email.com", "600123456"),
@@ -41,10 +134,7 @@ class DataSeeder:
             ("Jorge B.", "jorge.b@email.com", "633221144"),
         ]
         
-        clients = []
-        for name, email, phone in clients_data:
-            c = self.client_repo.create(Client(None, name, email, phone))
-            clients.append(c)
+        clients = self.client_repo.create_many(Client(None, name, email, phone) for name, email, phone in clients_data)
 
         # --- 2. Mascotas ---
         pets_data = [
@@ -60,10 +150,8 @@ class DataSeeder:
             ("Zeus", "Perro", "Doberman", 6, clients[7]),
         ]
 
-        pets = []
-        for name, species, breed, age, owner in pets_data:
-            p = self.pet_repo.create(Pet(None, name, species, breed, age, owner.id))
-            pets.append(p)
+        pets = self.pet_repo.create_many(Pet(None, name, species, breed, age, owner.id)
+                                         for name, species, breed, age, owner in pets_data)
 
         # --- 3. Citas (Pasadas y Futuras) ---
         today = date.today()
@@ -77,15 +165,17 @@ class DataSeeder:
             appt_date = today + timedelta(days=days_offset)
             reason = random.choice(reasons)
             status = "Completada" if days_offset < 0 else "Pendiente"
-            
-            appt = self.appt_repo.create(Appointment(None, pet.id, appt_date, reason, status))
-            appointments.append(appt)
+            appointments.append(Appointment(None, pet.id, appt_date, reason, status))
+        appointments = self.appt_repo.create_many(appointments)
 
+        pet_owner = {p.id: p.client_id for p in pets}
+        records, invoices = [], []
+        for appt in appointments:
             # --- 4. Historial Médico (Solo para citas pasadas/completadas) ---
-            if status == "Completada":
-                self.mr_repo.create(MedicalRecord(
+            if appt.status == "Completada":
+                records.append(MedicalRecord(
                     None, appt.id, 
-                    f"Diagnóstico preliminar de {reason}", 
+                    f"Diagnóstico preliminar de {appt.reason}", 
                     "Reposo y medicación estándar", 
                     "El paciente se portó bien."
                 ))
@@ -93,13 +183,172 @@ class DataSeeder:
                 # --- 5. Facturas (Solo para citas completadas) ---
                 if random.choice([True, False]): # A veces se factura
                     amount = random.randint(30, 150)
-                    self.bill_repo.create(Invoice(None, pet.client_id, appt_date, float(amount), "Pagada"))
+                    invoices.append(Invoice(None, pet_owner[appt.pet_id], appt.date, float(amount), "Pagada"))
+        self.mr_repo.create_many(records)
+        self.bill_repo.create_many(invoices)
 
         # --- 6. Reseñas ---
         review_comments = ["Excelente servicio", "Muy amables", "Tiempos de espera largos", "Mi perro salió feliz", "Volveré seguro"]
-        for client in clients[:5]: # Solo los primeros 5 dejan review
-            self.review_repo.create(Review(
-                None, client.id, random.randint(3, 5), random.choice(review_comments), today
-            ))
+        self.review_repo.create_many(Review(
+            None, client.id, random.randint(3, 5), random.choice(review_comments), today
+        ) for client in clients[:5]) # Solo los primeros 5 dejan review
+
+    # --- Generador sintético (pruebas de carga) ---
+    def generate(self, clients: int, seed: int = 42, batch_rows: int = 20_000,
+                 profile: Optional[SyntheticProfile] = None, today: Optional[date] = None,
+                 progress: Optional[Callable[[Dict[str, int]], None]] = None) -> Dict[str, int]:
+        """Genera una clínica sintética de `clients` clientes con sus mascotas, citas,
+        historiales, facturas, reseñas y usuarios. Devuelve las filas creadas por tabla.
+
+        Con la misma `seed` (y la misma fecha `today`, por defecto hoy) produce exactamente
+        los mismos datos, sea cual sea `batch_rows`: cada cliente tiene su propio generador
+        aleatorio. Los clientes se generan por lotes de unas `batch_rows` filas; cada lote se
+        inserta con create_many() en una transacción y se descarta, así que la memoria no
+        crece con el tamaño total.
+        """
+        if self.client_repo.has_any():
+            raise ValueError("El generador necesita una base de datos vacía.")
+        profile = profile or SyntheticProfile()
+        counts = {table: 0 for table in
+                  ("clients", "pets", "appointments", "medical_records", "invoices", "reviews", "users")}
+        clients_per_batch = max(1, int(batch_rows / profile.rows_per_client()))
+        today = today or date.today()
+
+        done = 0
+        while done < clients:
+            n = min(clients_per_batch, clients - done)
+            with UnitOfWork(self.client_repo.db):
+                self._generate_batch(seed, profile, today, done, n, counts)
+            done += n
+            if progress:
+                progress(dict(counts))
+
+        if self.user_repo is not None:
+            users = max(1, math.ceil(clients / profile.clients_per_user))
+            self.user_repo.create_many(User(None, f"vet_{i:06d}", _SYNTHETIC_PASSWORD_HASH, "vet")
+                                       for i in range(users))
+            counts["users"] = users
+
+        logger.info(f"Clínica sintética generada (seed={seed}): "
+                    + ", ".join(f"{table}={n}" for table, n in counts.items()))
+        return counts
+
+    def _generate_batch(self, seed: int, profile: SyntheticProfile, today: date,
+                        offset: int, n: int, counts: Dict[str, int]):
+        species_names = list(_SPECIES)
+        species_weights = [_SPECIES[s][0] for s in species_names]
+        reason_names = list(_REASONS)
+        reason_weights = [_REASONS[r][0] for r in reason_names]
+        statuses = list(profile.past_status_weights)
+        status_weights = list(profile.past_status_weights.values())
+        pet_counts = list(range(1, len(profile.pets_per_client_weights) + 1))
+        first_day = today.toordinal() - profile.history_days
+        span = profile.history_days + profile.future_days
+
+        # Un generador por cliente: los datos de cada cliente no dependen de cómo se agrupen en lotes
+        rngs = [random.Random(f"{seed}:{i}") for i in range(offset, offset + n)]
+        clients = []
+        for i, rng in zip(range(offset, offset + n), rngs):
+            first, last = rng.choice(_FIRST_NAMES), rng.choice(_LAST_NAMES)
+            clients.append(Client(None, f"{first} {last}", f"{first.lower()}.{last.lower()}{i}@email.com",
+                                  f"6{rng.randrange(10 ** 8):08d}"))
+        clients = self.client_repo.create_many(clients)
+
+        pets, pet_rngs = [], []
+        for client, rng in zip(clients, rngs):
+            for _ in range(rng.choices(pet_counts, profile.pets_per_client_weights)[0]):
+                species = rng.choices(species_names, species_weights)[0]
+                pets.append(Pet(None, rng.choice(_PET_NAMES), species, rng.choice(_SPECIES[species][1]),
+                                min(20, int(rng.expovariate(1 / 5))), client.id))
+                pet_rngs.append(rng)
+        pets = self.pet_repo.create_many(pets)
+
+        appointments, appt_rngs = [], []
+        for pet, rng in zip(pets, pet_rngs):
+            visits = min(profile.max_appointments_per_pet, int(rng.expovariate(1 / profile.appointments_per_pet_mean)))
+            for _ in range(visits):
+                appt_date = date.fromordinal(first_day + rng.randrange(span))
+                if appt_date.weekday() == 6:  # los domingos la clínica cierra
+                    appt_date -= timedelta(days=1)
+                if appt_date < today:
+                    status = rng.choices(statuses, status_weights)[0]
+                else:
+                    status = "Cancelada" if rng.random() < profile.future_cancel_rate else "Pendiente"
+                appointments.append(Appointment(None, pet.id, appt_date,
+                                                rng.choices(reason_names, reason_weights)[0], status))
+                appt_rngs.append(rng)
+        appointments = self.appt_repo.create_many(appointments)
+
+        owner = {pet.id: pet.client_id for pet in pets}
+        records, invoices = [], []
+        for appt, rng in zip(appointments, appt_rngs):
+            if appt.status != "Completada":
+                continue
+            if rng.random() < profile.record_rate:
+                _, diagnosis, treatment = _REASONS[appt.reason]
+                records.append(MedicalRecord(None, appt.id, diagnosis, treatment, None))
+            if rng.random() < profile.invoice_rate:
+                amount = round(rng.lognormvariate(math.log(profile.invoice_amount_median), 0.5), 2)
+                # Las facturas recientes aún pueden estar pendientes de cobro
+                paid = (today - appt.date).days > 30 or rng.random() < 0.6
+                invoices.append(Invoice(None, owner[appt.pet_id], appt.date, amount,
+                                        "Pagada" if paid else "Pendiente"))
+        self.mr_repo.create_many(records)
+        self.bill_repo.create_many(invoices)
+
+        reviews = []
+        for client, rng in zip(clients, rngs):
+            if rng.random() < profile.review_rate:
+                rating = rng.choices(range(1, 6), profile.review_rating_weights)[0]
+                reviews.append(Review(None, client.id, rating, _REVIEW_COMMENTS[rating],
+                                      date.fromordinal(first_day + rng.randrange(profile.history_days))))
+        self.review_repo.create_many(reviews)
+
+        for table, rows in (("clients", clients), ("pets", pets), ("appointments", appointments),
+                            ("medical_records", records), ("invoices", invoices), ("reviews", reviews)):
+            counts[table] += len(rows)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("db", help="Ruta de la base de datos a generar (debe estar vacía)")
+    size = parser.add_mutually_exclusive_group()
+    size.add_argument("--rows", type=int, default=100_000, help="Filas aproximadas en total (1k a 10M)")
+    size.add_argument("--clients", type=int, help="Número exacto de clientes (ignora --rows)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--today", type=date.fromisoformat, default=None,
+                        help="Fecha de referencia AAAA-MM-DD (por defecto hoy); fijarla hace la salida idéntica entre días")
+    parser.add_argument("--batch-rows", type=int, default=20_000, help="Filas por transacción")
+    parser.add_argument("--profile", choices=list(PRAGMA_PROFILES), default="fast-bulk-load")
+    args = parser.parse_args(argv)
+
+    profile = SyntheticProfile()
+    clients = args.clients or max(1, round(args.rows / profile.rows_per_client()))
+
+    db = DatabaseManager(args.db, profile=args.profile)
+    db.initialize_db()
+    seeder = DataSeeder(ClientRepository(db), PetRepository(db), AppointmentRepository(db),
+                        MedicalRecordRepository(db), BillingRepository(db), ReviewRepository(db),
+                        UserRepository(db))
+
+    def report(counts: Dict[str, int]):
+        print(f"\r{counts['clients']}/{clients} clientes, {sum(counts.values())} filas", end="", flush=True)
+
+    try:
+        counts = seeder.generate(clients, seed=args.seed, batch_rows=args.batch_rows,
+                                 profile=profile, today=args.today, progress=report)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        db.close()
+
+    print()
+    for table, n in counts.items():
+        print(f"{table:16} {n:>12,}")
+    print(f"{'total':16} {sum(counts.values()):>12,}")
+    return 0
+
 
-        logger.info("Carga de datos masiva completada exitosamente.")
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main())
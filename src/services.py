@@ -1,19 +1,144 @@
-from typing import List, Optional
+import base64
+import dataclasses
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from src.interfaces import Page
+from src.cache import EntityCache
+from src.database import UnitOfWork
 from src.repositories import ClientRepository, PetRepository, AppointmentRepository, MedicalRecordRepository, BillingRepository, ReviewRepository
-from src.models import Client, Pet, Appointment, MedicalRecord, Invoice, Review
+from src.repositories import StatsRepository, SearchRepository, fts_query
+from src.reports import ReportRepository
+from src.billing_analytics import BillingAnalyticsRepository, GRAINS, DEFAULT_PERIODS, MAX_PERIODS, INVOICE_STATUSES
+from src.billing_analytics import period_keys, periods_back
+from src.models import Client, Pet, Appointment, MedicalRecord, Invoice, Review, AppointmentDetail, DashboardStats
+from src.models import SearchResult, PetMedicalSummary, PetTimeline, RevenuePeriod, ClientRevenue
 from src.utils import logger, Validators
 import bcrypt
-from src.repositories import UserRepository
-from src.models import User
+from src.repositories import UserRepository, SessionRepository
+from src.rate_limit import SlidingWindowLimiter, LimiterStats
+from src.models import User, Session
+
+# Colores del calendario según el estado de la cita (rojo para cualquier otro estado)
+STATUS_COLORS = {"Completada": "#28a745", "Pendiente": "#ffc107"}
+DEFAULT_STATUS_COLOR = "#dc3545"
+# Días que se cargan antes y después del mes visible (la vista mensual muestra
+# hasta dos semanas de los meses contiguos)
+CALENDAR_PREFETCH_DAYS = 14
+# Segundos que se reutilizan las cifras del panel de inicio antes de volver a consultarlas
+DASHBOARD_TTL_SECONDS = 5.0
 
 class ClinicService:
-    def __init__(self, client_repo: ClientRepository, pet_repo: PetRepository, appt_repo: AppointmentRepository, mr_repo: MedicalRecordRepository, bill_repo: BillingRepository, review_repo: ReviewRepository):
+    def __init__(self, client_repo: ClientRepository, pet_repo: PetRepository, appt_repo: AppointmentRepository, mr_repo: MedicalRecordRepository, bill_repo: BillingRepository, review_repo: ReviewRepository,
+                 stats_repo: Optional[StatsRepository] = None, cache: Optional[EntityCache] = None,
+                 search_repo: Optional[SearchRepository] = None, report_repo: Optional[ReportRepository] = None,
+                 analytics_repo: Optional[BillingAnalyticsRepository] = None):
         self.client_repo = client_repo
         self.pet_repo = pet_repo
         self.appt_repo = appt_repo
         self.mr_repo = mr_repo
         self.bill_repo = bill_repo
         self.review_repo = review_repo
+        self.stats_repo = stats_repo
+        self.search_repo = search_repo or SearchRepository(client_repo.db)
+        self.report_repo = report_repo or ReportRepository(client_repo.db)
+        self.analytics_repo = analytics_repo or BillingAnalyticsRepository(bill_repo.db)
+        # Caché de lecturas (opcional). Las escrituras de este servicio la invalidan.
+        self.cache = cache
+
+        self._dashboard_lock = threading.Lock()
+        self._dashboard_cache: Optional[Tuple[float, DashboardStats]] = None
+
+    # --- Caché de lecturas ---
+    def _cached(self, key, deps, loader):
+        """Lectura a través de la caché. `deps`: tablas (consultas) o (tabla, id) (entidades)."""
+        if self.cache is None:
+            return loader()
+        return self.cache.get_or_load(key, deps, loader)
+
+    def _invalidate(self, *deps):
+        if self.cache is not None:
+            self.cache.invalidate(*deps)
+
+    def _cached_page(self, name: str, deps, load, limit, after_key, order_by, filters) -> Page:
+        """Página de un listado a través de la caché, con clave por todos sus argumentos."""
+        key = ("page", name, limit, after_key, order_by, tuple(sorted((filters or {}).items())))
+        return self._cached(key, deps, lambda: load(limit, after_key, order_by, filters))
+
+    # Lo que dependen de cada lectura las que cruzan tablas (el historial materializado
+    # y su resumen se derivan de citas y registros médicos)
+    _HISTORY_DEPS = ("appointments", "medical_records")
+    _PETS_TABLE_DEPS = ("pets", "clients", "appointments", "medical_records")
+    _SEARCH_DEPS = ("clients", "pets", "appointments", "medical_records")
+
+    # --- Dashboard ---
+    def dashboard_stats(self, max_age: float = DASHBOARD_TTL_SECONDS) -> DashboardStats:
+        """Contadores del inicio con COUNT(*)/GROUP BY en una sola consulta.
+
+        El resultado se reutiliza durante `max_age` segundos (0 = consultar siempre).
+        """
+        if self.stats_repo is None:
+            raise RuntimeError("ClinicService no tiene StatsRepository configurado.")
+        now = time.monotonic()
+        with self._dashboard_lock:
+            if max_age > 0 and self._dashboard_cache and now - self._dashboard_cache[0] < max_age:
+                return self._dashboard_cache[1]
+
+        today = date.today()
+        month_start = today.replace(day=1)
+        month_end = (month_start + timedelta(days=32)).replace(day=1)
+        stats = self.stats_repo.dashboard_stats(month_start, month_end)
+
+        with self._dashboard_lock:
+            self._dashboard_cache = (now, stats)
+        return stats
+
+    # --- Búsqueda ---
+    def search(self, query: str, limit: int = 20) -> List[SearchResult]:
+        """Busca en clientes (nombre, email, teléfono), mascotas (nombre, raza) e historial
+        (diagnóstico, tratamiento, notas). Resultados ordenados por relevancia (bm25)."""
+        if limit <= 0:
+            raise ValueError("El límite de resultados debe ser positivo.")
+        match = fts_query(query)
+        if match is None:
+            return []
+        return self._cached(("search", match, limit), self._SEARCH_DEPS,
+                            lambda: self.search_repo.search(match, limit))
+
+    # --- Tablas de la interfaz ---
+    # Páginas con Page.items como DataFrame listo para mostrar: una consulta por página,
+    # con los nombres de dueño/mascota resueltos en SQL. Mismos argumentos que list_page.
+    # Van por la caché: los reruns de Streamlit sin escrituras no tocan la BD.
+    def clients_table(self, limit: int = 50, after_key: Optional[Tuple[Any, ...]] = None,
+                      order_by: Optional[str] = None, filters: Optional[Dict[str, Any]] = None) -> Page:
+        return self._cached_page("clients_table", ["clients"], self.report_repo.clients_page,
+                                 limit, after_key, order_by, filters)
+
+    def pets_table(self, limit: int = 50, after_key: Optional[Tuple[Any, ...]] = None,
+                   order_by: Optional[str] = None, filters: Optional[Dict[str, Any]] = None) -> Page:
+        return self._cached_page("pets_table", self._PETS_TABLE_DEPS, self.report_repo.pets_page,
+                                 limit, after_key, order_by, filters)
+
+    def appointments_table(self, limit: int = 50, after_key: Optional[Tuple[Any, ...]] = None,
+                           order_by: Optional[str] = None, filters: Optional[Dict[str, Any]] = None) -> Page:
+        return self._cached_page("appointments_table", ["appointments", "pets"], self.report_repo.appointments_page,
+                                 limit, after_key, order_by, filters)
+
+    def invoices_table(self, limit: int = 50, after_key: Optional[Tuple[Any, ...]] = None,
+                       order_by: Optional[str] = None, filters: Optional[Dict[str, Any]] = None) -> Page:
+        return self._cached_page("invoices_table", ["invoices", "clients"], self.report_repo.invoices_page,
+                                 limit, after_key, order_by, filters)
+
+    def reviews_table(self, limit: int = 50, after_key: Optional[Tuple[Any, ...]] = None,
+                      order_by: Optional[str] = None, filters: Optional[Dict[str, Any]] = None) -> Page:
+        return self._cached_page("reviews_table", ["reviews", "clients"], self.report_repo.reviews_page,
+                                 limit, after_key, order_by, filters)
 
     # --- Client Logic ---
     def add_client(self, name: str, email: str, phone: str) -> Client:
@@ -28,6 +153,7 @@ class ClinicService:
         client = Client(id=None, name=name, email=email, phone=phone)
         try:
             new_client = self.client_repo.create(client)
+            self._invalidate("clients")
             logger.info(f"Cliente creado: {new_client.id}")
             return new_client
         except Exception as e:
@@ -35,7 +161,30 @@ class ClinicService:
             raise
 
     def list_clients(self) -> List[Client]:
-        return self.client_repo.get_all()
+        return self._cached(("clients", "all"), ["clients"], self.client_repo.get_all)
+
+    def get_client_by_id(self, client_id: int) -> Optional[Client]:
+        return self._cached(("client", client_id), [("clients", client_id)],
+                            lambda: self.client_repo.get_by_id(client_id))
+
+    def has_clients(self) -> bool:
+        return self._cached(("clients", "any"), ["clients"], self.client_repo.has_any)
+
+    def lookup_clients(self, text: str, limit: int = 20) -> List[Client]:
+        """Opciones de un selector de clientes para lo tecleado (nunca más de `limit`)."""
+        return self._cached(("clients", "lookup", text, limit), ["clients"],
+                            lambda: self.client_repo.lookup(text, limit))
+
+    def client_names(self, client_ids) -> Dict[int, str]:
+        """Nombre de cada cliente de `client_ids` (para las filas visibles de una tabla)."""
+        client_ids = tuple(int(client_id) for client_id in client_ids)
+        return self._cached(("clients", "names", client_ids), ["clients"],
+                            lambda: self.client_repo.get_names(client_ids))
+
+    def list_clients_page(self, limit: int = 50, after_key: Optional[Tuple[Any, ...]] = None,
+                          order_by: Optional[str] = None, filters: Optional[Dict[str, Any]] = None,
+                          columnar: bool = False) -> Page:
+        return self.client_repo.list_page(limit, after_key, order_by, filters, columnar=columnar)
         
     def update_client(self, client: Client) -> bool:
         if not Validators.is_not_empty(client.name):
@@ -46,13 +195,17 @@ class ClinicService:
             raise ValueError("Teléfono inválido.")
             
         try:
-            return self.client_repo.update(client)
+            updated = self.client_repo.update(client)
         except Exception as e:
             logger.error(f"Error actualizando cliente: {e}")
             raise
+        # Las citas con detalle llevan el nombre del dueño
+        self._invalidate("clients", ("clients", client.id))
+        return updated
         
     def delete_client(self, client_id: int):
         self.client_repo.delete(client_id)
+        self._invalidate("clients", ("clients", client_id))
 
     # --- Pet Logic ---
     def add_pet(self, name: str, species: str, breed: str, age: int, client_id: int) -> Pet:
@@ -64,26 +217,45 @@ class ClinicService:
             raise ValueError("La edad no puede ser negativa.")
             
         pet = Pet(id=None, name=name, species=species, breed=breed, age=age, client_id=client_id)
-        return self.pet_repo.create(pet)
+        new_pet = self.pet_repo.create(pet)
+        self._invalidate("pets")
+        return new_pet
 
     def list_pets(self) -> List[Pet]:
-        return self.pet_repo.get_all()
+        return self._cached(("pets", "all"), ["pets"], self.pet_repo.get_all)
+
+    def has_pets(self) -> bool:
+        return self._cached(("pets", "any"), ["pets"], self.pet_repo.has_any)
+
+    def lookup_pets(self, text: str, limit: int = 20) -> List[Pet]:
+        """Opciones de un selector de mascotas para lo tecleado (nunca más de `limit`)."""
+        return self._cached(("pets", "lookup", text, limit), ["pets"],
+                            lambda: self.pet_repo.lookup(text, limit))
+
+    def list_pets_page(self, limit: int = 50, after_key: Optional[Tuple[Any, ...]] = None,
+                       order_by: Optional[str] = None, filters: Optional[Dict[str, Any]] = None,
+                       columnar: bool = False) -> Page:
+        return self.pet_repo.list_page(limit, after_key, order_by, filters, columnar=columnar)
 
     def list_pets_by_client(self, client_id: int) -> List[Pet]:
-        return self.pet_repo.get_by_client(client_id)
+        return self._cached(("pets", "by_client", client_id), ["pets"],
+                            lambda: self.pet_repo.get_by_client(client_id))
         
     def get_pet_by_id(self, pet_id: int) -> Optional[Pet]:
-        return self.pet_repo.get_by_id(pet_id)
+        return self._cached(("pet", pet_id), [("pets", pet_id)], lambda: self.pet_repo.get_by_id(pet_id))
         
     def update_pet(self, pet: Pet) -> bool:
         if not Validators.is_not_empty(pet.name):
             raise ValueError("El nombre de la mascota es obligatorio.")
         if pet.age < 0:
             raise ValueError("La edad no puede ser negativa.")
-        return self.pet_repo.update(pet)
+        updated = self.pet_repo.update(pet)
+        self._invalidate("pets", ("pets", pet.id))
+        return updated
         
     def delete_pet(self, pet_id: int):
         self.pet_repo.delete(pet_id)
+        self._invalidate("pets", ("pets", pet_id))
         
     # --- Appointment Logic ---
     def book_appointment(self, pet_id: int, date_val, reason: str):
@@ -93,23 +265,85 @@ class ClinicService:
             raise ValueError("El motivo de la cita es obligatorio.")
 
         appt = Appointment(id=None, pet_id=pet_id, date=date_val, reason=reason)
-        return self.appt_repo.create(appt)
+        new_appt = self.appt_repo.create(appt)
+        self._invalidate("appointments")
+        return new_appt
 
     def update_appointment(self, appt: Appointment):
         if not Validators.is_valid_date(appt.date):
             raise ValueError("La fecha de la cita no es válida.") 
         if not Validators.is_not_empty(appt.reason):
             raise ValueError("El motivo es obligatorio.")
-        return self.appt_repo.update(appt)
+        updated = self.appt_repo.update(appt)
+        self._invalidate("appointments", ("appointments", appt.id))
+        return updated
 
     def get_appointment_by_id(self, appt_id: int) -> Optional[Appointment]:
-        return self.appt_repo.get_by_id(appt_id)
+        return self._cached(("appointment", appt_id), [("appointments", appt_id)],
+                            lambda: self.appt_repo.get_by_id(appt_id))
         
     def list_appointments(self):
-        return self.appt_repo.get_all()
+        return self._cached(("appointments", "all"), ["appointments"], self.appt_repo.get_all)
+
+    def list_appointments_page(self, limit: int = 50, after_key: Optional[Tuple[Any, ...]] = None,
+                               order_by: Optional[str] = None, filters: Optional[Dict[str, Any]] = None,
+                               columnar: bool = False) -> Page:
+        return self.appt_repo.list_page(limit, after_key, order_by, filters, columnar=columnar)
+
+    def list_appointments_with_details(self) -> List[AppointmentDetail]:
+        return self._cached(("appointments", "details"), self._DETAIL_DEPS, self.appt_repo.get_all_with_details)
+
+    def list_appointment_details_page(self, limit: int = 50, after_key: Optional[Tuple[Any, ...]] = None,
+                                      order_by: Optional[str] = None, filters: Optional[Dict[str, Any]] = None,
+                                      columnar: bool = False) -> Page:
+        return self.appt_repo.list_details_page(limit, after_key, order_by, filters, columnar=columnar)
+
+    # Las citas con detalle dependen también de los nombres de mascotas y dueños
+    _DETAIL_DEPS = ("appointments", "pets", "clients")
+
+    def list_appointments_between(self, start, end, status: Optional[str] = None) -> List[AppointmentDetail]:
+        if not (Validators.is_valid_date(start) and Validators.is_valid_date(end)):
+            raise ValueError("Fecha inválida.")
+        if str(end) < str(start):
+            raise ValueError("La fecha final no puede ser anterior a la inicial.")
+        return self._cached(("appointments", "between", str(start), str(end), status), self._DETAIL_DEPS,
+                            lambda: self.appt_repo.get_in_range(start, end, status))
+
+    @staticmethod
+    def calendar_window(month: date, margin_days: int = CALENDAR_PREFETCH_DAYS) -> Tuple[date, date]:
+        """Rango [inicio, fin) a cargar para mostrar `month`, con margen de precarga."""
+        first = month.replace(day=1)
+        next_month = (first + timedelta(days=32)).replace(day=1)
+        return first - timedelta(days=margin_days), next_month + timedelta(days=margin_days)
+
+    def calendar_events(self, start=None, end=None) -> List[dict]:
+        """Eventos listos para el componente de calendario (una sola consulta con JOIN).
+
+        Con `start`/`end` solo se cargan las citas de esa ventana, así que el tamaño
+        del resultado depende de la ventana y no del historial completo.
+        """
+        if start is None and end is None:
+            appts = self.list_appointments_with_details()
+        else:
+            appts = self.list_appointments_between(start, end)
+        return [self._to_calendar_event(a) for a in appts]
+
+    @staticmethod
+    def _to_calendar_event(appt: AppointmentDetail) -> dict:
+        color = STATUS_COLORS.get(appt.status, DEFAULT_STATUS_COLOR)
+        return {
+            "title": f"{appt.pet_name or 'Desconocido'} - {appt.reason}",
+            "start": str(appt.date),
+            "end": str(appt.date),
+            "backgroundColor": color,
+            "borderColor": color,
+            "allDay": True
+        }
         
     def delete_appointment(self, appt_id: int) -> bool:
-        return self.appt_repo.delete(appt_id)
+        deleted = self.appt_repo.delete(appt_id)
+        self._invalidate("appointments", ("appointments", appt_id))
+        return deleted
     
     # --- Medical Record Logic ---
     def add_medical_record(self, appointment_id: int, diagnosis: str, treatment: str, notes: Optional[str] = None) -> MedicalRecord:
@@ -119,10 +353,54 @@ class ClinicService:
             raise ValueError("El tratamiento no puede estar vacío.")
             
         record = MedicalRecord(id=None, appointment_id=appointment_id, diagnosis=diagnosis, treatment=treatment, notes=notes)
-        return self.mr_repo.create(record)
+        record = self.mr_repo.create(record)
+        self._invalidate("medical_records")
+        return record
+
+    def complete_appointment(self, appt_id: int, diagnosis: str, treatment: str, notes: Optional[str] = None,
+                             amount: Optional[float] = None) -> Tuple[MedicalRecord, Optional[Invoice]]:
+        """Cierra una cita: la marca como completada, guarda el registro médico y,
+        si se indica `amount`, factura al dueño. Es todo o nada (una sola transacción)."""
+        if not Validators.is_not_empty(diagnosis):
+            raise ValueError("El diagnóstico no puede estar vacío.")
+        if not Validators.is_not_empty(treatment):
+            raise ValueError("El tratamiento no puede estar vacío.")
+        if amount is not None and not Validators.is_positive_number(amount):
+            raise ValueError("El monto total debe ser mayor a 0.")
+
+        with UnitOfWork(self.appt_repo.db):
+            appt = self.appt_repo.get_by_id(appt_id)
+            if appt is None:
+                raise ValueError("La cita no existe.")
+            appt.status = "Completada"
+            self.appt_repo.update(appt)
+            record = self.mr_repo.create(MedicalRecord(None, appt_id, diagnosis, treatment, notes))
+            invoice = None
+            if amount is not None:
+                pet = self.pet_repo.get_by_id(appt.pet_id)
+                if pet is None:
+                    raise ValueError("La mascota de la cita no existe; no se puede facturar.")
+                invoice = self.bill_repo.create(Invoice(None, pet.client_id, appt.date, float(amount), "Pendiente"))
+        self._invalidate("appointments", ("appointments", appt_id), "medical_records", "invoices")
+        return record, invoice
 
     def get_medical_history_by_pet(self, pet_id: int) -> List[tuple]:
-        return self.mr_repo.get_medical_history_by_pet(pet_id)
+        return self._cached(("history", pet_id), self._HISTORY_DEPS,
+                            lambda: self.mr_repo.get_medical_history_by_pet(pet_id))
+
+    def get_pet_timeline(self, pet_id: int) -> PetTimeline:
+        """Historial y resumen de una mascota con una sola lectura del historial materializado."""
+        entries = self.get_medical_history_by_pet(pet_id)
+        if not entries:
+            return PetTimeline(PetMedicalSummary(pet_id))
+        latest = entries[0]
+        return PetTimeline(PetMedicalSummary(pet_id, len(entries), latest[1], latest[3]), entries)
+
+    def pet_summaries(self, pet_ids) -> Dict[int, PetMedicalSummary]:
+        """Resumen del historial de cada mascota de `pet_ids` (las que no tienen, no aparecen)."""
+        pet_ids = tuple(int(pet_id) for pet_id in pet_ids)
+        return self._cached(("history", "summaries", pet_ids), self._HISTORY_DEPS,
+                            lambda: self.mr_repo.get_summaries(pet_ids))
         
     # --- Billing Logic ---
     def generate_invoice(self, client_id: int, total_amount: float, date_val) -> Invoice:
@@ -132,10 +410,67 @@ class ClinicService:
             raise ValueError("Fecha inválida.")
         
         invoice = Invoice(id=None, client_id=client_id, date=date_val, total_amount=total_amount, status="Pendiente")
-        return self.bill_repo.create(invoice)
+        invoice = self.bill_repo.create(invoice)
+        self._invalidate("invoices")
+        return invoice
+
+    def set_invoice_status(self, invoice_id: int, status: str) -> bool:
+        """Cambia el estado de una factura (p.ej. "Pagada" al cobrarla)."""
+        if status not in INVOICE_STATUSES:
+            raise ValueError(f"Estado de factura inválido. Usa uno de: {', '.join(INVOICE_STATUSES)}.")
+        updated = self.bill_repo.set_status(invoice_id, status)
+        if not updated:
+            raise ValueError("La factura no existe.")
+        self._invalidate("invoices")
+        return updated
 
     def list_invoices(self) -> List[Invoice]:
         return self.bill_repo.get_all()
+
+    def list_invoices_page(self, limit: int = 50, after_key: Optional[Tuple[Any, ...]] = None,
+                           order_by: Optional[str] = None, filters: Optional[Dict[str, Any]] = None,
+                           columnar: bool = False) -> Page:
+        return self.bill_repo.list_page(limit, after_key, order_by, filters, columnar=columnar)
+
+    # --- Analítica de facturación ---
+    # Leen los agregados por periodo y por cliente que mantienen los triggers de invoices
+    # (migración 9): el coste depende de los periodos/clientes, no de las facturas.
+    def revenue_by_period(self, grain: str = "month", start=None, end=None) -> List[RevenuePeriod]:
+        """Facturación por día, semana o mes entre `start` y `end` (incluidos), con los
+        periodos sin facturas a cero. Sin `start`, los últimos DEFAULT_PERIODS[grain]."""
+        if grain not in GRAINS:
+            raise ValueError(f"Granularidad inválida. Usa una de: {', '.join(GRAINS)}.")
+        if not all(Validators.is_valid_date(d) for d in (start, end) if d is not None):
+            raise ValueError("Fecha inválida.")
+        end = date.fromisoformat(str(end)) if end is not None else date.today()
+        start = date.fromisoformat(str(start)) if start is not None else periods_back(grain, end, DEFAULT_PERIODS[grain])
+        if end < start:
+            raise ValueError("La fecha final no puede ser anterior a la inicial.")
+        keys = period_keys(grain, start, end)
+        if len(keys) > MAX_PERIODS:
+            raise ValueError(f"Demasiados periodos ({len(keys)}); el máximo es {MAX_PERIODS}.")
+
+        def load():
+            found = {p.period: p for p in self.analytics_repo.revenue_by_period(grain, keys[0], keys[-1])}
+            return [found.get(key) or RevenuePeriod(key) for key in keys]
+        return self._cached(("revenue", grain, keys[0], keys[-1]), ["invoices"], load)
+
+    def revenue_totals(self) -> RevenuePeriod:
+        """Facturado, cobrado y pendiente de todas las facturas."""
+        return self._cached(("revenue", "totals"), ["invoices"], self.analytics_repo.totals)
+
+    def top_clients(self, limit: int = 10) -> List[ClientRevenue]:
+        if limit <= 0:
+            raise ValueError("El límite de resultados debe ser positivo.")
+        return self._cached(("revenue", "top_clients", limit), ["invoices", "clients"],
+                            lambda: self.analytics_repo.top_clients(limit))
+
+    def client_revenue(self, client_id: int) -> ClientRevenue:
+        """Facturación de un cliente (a cero si no tiene facturas)."""
+        def load():
+            revenue = self.analytics_repo.client_revenue(client_id)
+            return revenue or ClientRevenue(client_id, None)
+        return self._cached(("revenue", "client", client_id), ["invoices", "clients"], load)
         
     # --- Review Logic ---
     def add_review(self, client_id: int, rating: int, comment: Optional[str] = None) -> Review:
@@ -143,38 +478,238 @@ class ClinicService:
             raise ValueError("La calificación debe ser un entero entre 1 y 5.")
         
         review = Review(id=None, client_id=client_id, rating=rating, comment=comment)
-        return self.review_repo.create(review)
+        review = self.review_repo.create(review)
+        self._invalidate("reviews")
+        return review
 
     def list_reviews(self) -> List[Review]:
         return self.review_repo.get_all()
+
+    def list_reviews_page(self, limit: int = 50, after_key: Optional[Tuple[Any, ...]] = None,
+                          order_by: Optional[str] = None, filters: Optional[Dict[str, Any]] = None,
+                          columnar: bool = False) -> Page:
+        return self.review_repo.list_page(limit, after_key, order_by, filters, columnar=columnar)
     
     
 # LOGIN
 
 # --- Añadir nueva clase AuthService ---
 
+# Coste de bcrypt (log2 de las iteraciones) y nº máximo de hashes simultáneos
+DEFAULT_BCRYPT_ROUNDS = 12
+DEFAULT_HASH_WORKERS = 4
+# Vida de una sesión sin actividad (se renueva en cada validación)
+DEFAULT_SESSION_TTL_SECONDS = 8 * 3600
+# La renovación solo se escribe en la BD si avanza al menos esto: validar una sesión
+# en cada rerun no debe convertirse en un UPDATE por rerun
+SESSION_TOUCH_INTERVAL_SECONDS = 300
+# Cada cuánto se comprueba contra la BD una sesión en memoria: una sesión revocada desde
+# otro proceso deja de valer en este como mucho tras este intervalo
+SESSION_REVALIDATE_SECONDS = 30
+# Logins fallidos permitidos por ventana, por usuario y por dirección del cliente
+LOGIN_WINDOW_SECONDS = 300
+MAX_FAILED_LOGINS_PER_USER = 5
+MAX_FAILED_LOGINS_PER_ADDRESS = 20
+
+
+class LoginThrottled(ValueError):
+    """Demasiados intentos fallidos: el login se rechaza sin consultar la BD ni usar bcrypt."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Demasiados intentos fallidos. Inténtalo de nuevo en {int(retry_after) + 1} s.")
+        self.retry_after = retry_after
+
+
+def bcrypt_rounds(password_hash: str) -> int:
+    """Coste con el que se generó un hash bcrypt ("$2b$12$..." -> 12)."""
+    return int(password_hash.split("$")[2])
+
+
 class AuthService:
-    def __init__(self, user_repo: UserRepository):
+    def __init__(self, user_repo: UserRepository, rounds: int = DEFAULT_BCRYPT_ROUNDS,
+                 max_workers: int = DEFAULT_HASH_WORKERS, session_repo: Optional[SessionRepository] = None,
+                 session_ttl: float = DEFAULT_SESSION_TTL_SECONDS, session_secret: Optional[bytes] = None,
+                 user_limiter: Optional[SlidingWindowLimiter] = None,
+                 address_limiter: Optional[SlidingWindowLimiter] = None):
+        if not 4 <= rounds <= 31:
+            raise ValueError(f"Coste de bcrypt fuera de rango (4-31): {rounds}")
         self.user_repo = user_repo
+        self.rounds = rounds
+        self.session_repo = session_repo or SessionRepository(user_repo.db)
+        self.session_ttl = session_ttl
+        # Clave para firmar los tokens. Sin VETMANAGER_SESSION_SECRET se genera una por
+        # proceso: las sesiones no sobreviven a un reinicio del servidor.
+        secret = session_secret or os.environ.get("VETMANAGER_SESSION_SECRET", "").encode()
+        self._session_secret = secret or secrets.token_bytes(32)
+        # token_id -> [usuario sin hash, expira, expiración guardada en BD, última comprobación en BD]
+        self._sessions: Dict[str, list] = {}
+        self._sessions_lock = threading.Lock()
+        self.user_limiter = user_limiter or SlidingWindowLimiter(MAX_FAILED_LOGINS_PER_USER, LOGIN_WINDOW_SECONDS)
+        self.address_limiter = address_limiter or SlidingWindowLimiter(MAX_FAILED_LOGINS_PER_ADDRESS,
+                                                                       LOGIN_WINDOW_SECONDS)
+        # El pool solo limita cuántos hashes se calculan a la vez (una ráfaga de logins no
+        # ocupa todos los núcleos). Quien llama a _hash/_check sigue esperando su hash entero;
+        # bcrypt libera el GIL, así que mientras tanto avanzan los hilos de otras sesiones.
+        self._hash_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+
+    def _hash(self, password: str) -> str:
+        """Hash bcrypt calculado en el pool. Bloquea a quien llama hasta tenerlo: el pool
+        acota cuántos hashes se calculan a la vez, no hace el login asíncrono."""
+        return self._hash_pool.submit(
+            lambda: bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(self.rounds)).decode('utf-8')
+        ).result()
+
+    def _check(self, password: str, password_hash: str) -> bool:
+        """Comprobación bcrypt en el pool; bloquea a quien llama igual que `_hash`."""
+        return self._hash_pool.submit(
+            bcrypt.checkpw, password.encode('utf-8'), password_hash.encode('utf-8')
+        ).result()
 
     def register_user(self, username: str, password: str, role: str = "admin") -> User:
         if self.user_repo.get_by_username(username):
             raise ValueError("El usuario ya existe.")
         
         # Hash password (SOLID: Security logic encapsulated here)
-        hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        hashed = self._hash(password)
         user = User(id=None, username=username, password_hash=hashed, role=role)
         return self.user_repo.create(user)
 
-    def login(self, username: str, password: str) -> Optional[User]:
+    def login(self, username: str, password: str, client_address: Optional[str] = None) -> Optional[User]:
+        """Usuario si las credenciales son correctas, None si no.
+
+        Lanza LoginThrottled si el usuario o la dirección superan los fallos permitidos.
+        """
+        limits = [(self.user_limiter, (username or "").lower())]
+        if client_address:
+            limits.append((self.address_limiter, client_address))
+        # Antes de cualquier consulta o hash: un ataque no debe costar trabajo de BD ni de CPU.
+        # El intento se registra ya al comprobarlo (check_and_hit), así que los logins
+        # concurrentes no pueden pasar todos antes de que cuente ninguno.
+        holds = [(limiter, key, *limiter.check_and_hit(key)) for limiter, key in limits]
+        retry_after = max(wait for _, _, wait, _ in holds)
+        if retry_after > 0:
+            for limiter, key, _, attempt in holds:
+                if attempt is not None:
+                    limiter.release(key, attempt)
+            logger.warning(f"Login de '{username}' desde {client_address or '?'} rechazado por exceso de intentos")
+            raise LoginThrottled(retry_after)
+
         user = self.user_repo.get_by_username(username)
-        if not user:
+        if not user or not self._check(password, user.password_hash):
             return None
-        
-        # Verificar contraseña
-        if bcrypt.checkpw(password.encode('utf-8'), user.password_hash.encode('utf-8')):
-            return user
-        return None
+        # Un login correcto no cuenta como intento fallido
+        self.user_limiter.reset(limits[0][1])
+        if client_address:
+            self.address_limiter.release(client_address, holds[1][3])
+        # Si el hash se generó con otro coste, se regenera con el actual (solo aquí
+        # tenemos la contraseña en claro)
+        if bcrypt_rounds(user.password_hash) != self.rounds:
+            user.password_hash = self._hash(password)
+            self.user_repo.update(user)
+            logger.info(f"Hash de '{user.username}' regenerado con coste {self.rounds}")
+        return user
+
+    def login_throttle_stats(self) -> Dict[str, LimiterStats]:
+        """Métricas de los limitadores de login (intentos rechazados, claves, desalojos)."""
+        return {"user": self.user_limiter.stats(), "address": self.address_limiter.stats()}
+
+    # --- Sesiones ---
+    def _sign(self, token_id: str) -> str:
+        digest = hmac.new(self._session_secret, token_id.encode("utf-8", "replace"), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+    def create_session(self, user: User) -> str:
+        """Abre una sesión para un usuario ya autenticado y devuelve su token firmado."""
+        now = time.time()
+        token_id = secrets.token_urlsafe(24)
+        session = self.session_repo.create(Session(token_id, user.id, now, now + self.session_ttl))
+        with self._sessions_lock:
+            self._sessions[token_id] = [dataclasses.replace(user, password_hash=""),
+                                        session.expires_at, session.expires_at, now]
+        return f"{token_id}.{self._sign(token_id)}"
+
+    def validate_session(self, token: Optional[str]) -> Optional[User]:
+        """Usuario de una sesión válida (sin hash de contraseña) o None. No usa bcrypt.
+
+        Con la sesión en memoria es una búsqueda en un dict; si no (otro proceso, reinicio
+        con la misma clave) o si hace más de SESSION_REVALIDATE_SECONDS que no se comprueba,
+        se consulta la BD, de modo que las revocaciones de otros procesos también cuentan.
+        Cada validación renueva la expiración.
+        """
+        token_id, _, signature = (token or "").partition(".")
+        # En bytes: compare_digest con str lanza TypeError si el token manipulado no es ASCII
+        expected = self._sign(token_id).encode()
+        if not signature or not hmac.compare_digest(signature.encode("utf-8", "replace"), expected):
+            return None
+        now = time.time()
+        entry = self._sessions.get(token_id)
+        if entry is None or now - entry[3] >= SESSION_REVALIDATE_SECONDS:
+            found = self.session_repo.get_with_user(token_id)  # la consulta, fuera del lock
+            with self._sessions_lock:
+                if found is None:
+                    self._sessions.pop(token_id, None)
+                    return None
+                session, user = found
+                user = dataclasses.replace(user, password_hash="")
+                entry = self._sessions.get(token_id)
+                if entry is None:
+                    entry = self._sessions[token_id] = [user, session.expires_at, session.expires_at, now]
+                else:
+                    # Otro proceso puede haber renovado la sesión o cambiado el rol del usuario
+                    entry[0], entry[3] = user, now
+                    entry[1], entry[2] = max(entry[1], session.expires_at), max(entry[2], session.expires_at)
+
+        touch_until = None
+        with self._sessions_lock:
+            expired = entry[1] <= now
+            if not expired:
+                entry[1] = now + self.session_ttl
+                if entry[1] - entry[2] >= SESSION_TOUCH_INTERVAL_SECONDS:
+                    entry[2] = touch_until = entry[1]
+            user = entry[0]
+        if expired:
+            self.revoke_session(token)
+            return None
+        if touch_until is not None:
+            self.session_repo.touch(token_id, touch_until)
+        return user
+
+    def revoke_session(self, token: Optional[str]) -> bool:
+        """Cierra una sesión (logout)."""
+        token_id = (token or "").partition(".")[0]
+        # Primero la BD: una revalidación concurrente ya no puede volver a cargarla en memoria
+        deleted = self.session_repo.delete(token_id)
+        with self._sessions_lock:
+            self._sessions.pop(token_id, None)
+        return deleted
+
+    def revoke_user_sessions(self, user_id: int) -> int:
+        """Cierra todas las sesiones de un usuario. Devuelve cuántas había en la BD.
+
+        Los demás procesos las descartan en su siguiente comprobación contra la BD."""
+        deleted = self.session_repo.delete_by_user(user_id)
+        with self._sessions_lock:
+            for token_id in [t for t, entry in self._sessions.items() if entry[0].id == user_id]:
+                del self._sessions[token_id]
+        return deleted
+
+    def revoke_all_sessions(self) -> int:
+        """Cierra todas las sesiones (p.ej. tras rotar la clave de firma)."""
+        with self._sessions_lock:
+            self._sessions.clear()
+        return self.session_repo.delete_all()
+
+    def purge_expired_sessions(self) -> int:
+        """Borra las sesiones caducadas de memoria y de la BD."""
+        now = time.time()
+        with self._sessions_lock:
+            for token_id in [t for t, entry in self._sessions.items() if entry[1] <= now]:
+                del self._sessions[token_id]
+        return self.session_repo.delete_expired(now)
+
+    def close(self):
+        """Detiene el pool de hashing (espera a los que estén en curso)."""
+        self._hash_pool.shutdown(wait=True)
     
     def create_admin_if_not_exists(self):
         """Helper para crear el usuario inicial"""
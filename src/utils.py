@@ -1,15 +1,127 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
 import re
-from datetime import datetime
-
-# Configuración de Logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    filename='app.log'
-)
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional, Union
+
+# El logger de la app no escribe nada hasta llamar a configure_logging(): importar
+# src.utils ya no abre ficheros ni toca la configuración global de logging.
 logger = logging.getLogger("VeterinariaApp")
 
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro (fácil de filtrar con jq o de ingerir en un agregador)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "module": record.module,
+            "line": record.lineno,
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def parse_module_levels(spec: str) -> Dict[str, str]:
+    """Convierte "VeterinariaApp.slow_queries=WARNING,streamlit=ERROR" en un dict."""
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, sep, level = item.partition("=")
+        if not sep:
+            raise ValueError(f"Nivel de log mal formado: '{item}' (se esperaba logger=NIVEL)")
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+_logging_lock = threading.Lock()
+
+
+def configure_logging(filename: str = "app.log", level: Union[int, str] = logging.INFO,
+                      json_format: bool = True, max_bytes: int = 5 * 1024 * 1024,
+                      backup_count: int = 5, when: Optional[str] = None,
+                      module_levels: Optional[Dict[str, Union[int, str]]] = None) -> logging.handlers.QueueListener:
+    """Activa el logging de la app a través de una cola, sin bloquear al hilo que registra.
+
+    Los registros se encolan con un QueueHandler y un QueueListener en segundo plano los
+    escribe en `filename`, rotando por tamaño (`max_bytes`) o, si se indica `when`
+    ("midnight", "H"...), por tiempo. `module_levels` fija el nivel de loggers concretos.
+    Es idempotente: si ya está activo devuelve el listener existente.
+    """
+    global _listener, _queue_handler
+    with _logging_lock:
+        if _listener is not None:
+            return _listener
+
+        if when:
+            handler = logging.handlers.TimedRotatingFileHandler(
+                filename, when=when, backupCount=backup_count, encoding="utf-8", delay=True)
+        else:
+            handler = logging.handlers.RotatingFileHandler(
+                filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+        handler.setFormatter(JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT))
+
+        log_queue = queue.SimpleQueue()
+        _queue_handler = logging.handlers.QueueHandler(log_queue)
+        _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+
+        root = logging.getLogger()
+        root.addHandler(_queue_handler)
+        root.setLevel(level)
+        for name, module_level in (module_levels or {}).items():
+            logging.getLogger(name).setLevel(module_level)
+
+        _listener.start()
+        return _listener
+
+
+def configure_logging_from_env() -> logging.handlers.QueueListener:
+    """configure_logging() con los ajustes de las variables VETMANAGER_LOG_*.
+
+    VETMANAGER_LOG_FILE, VETMANAGER_LOG_LEVEL, VETMANAGER_LOG_FORMAT (json|text),
+    VETMANAGER_LOG_MAX_BYTES, VETMANAGER_LOG_BACKUPS, VETMANAGER_LOG_WHEN y
+    VETMANAGER_LOG_LEVELS ("logger=NIVEL,..." para niveles por módulo).
+    """
+    env = os.environ
+    return configure_logging(
+        filename=env.get("VETMANAGER_LOG_FILE", "app.log"),
+        level=env.get("VETMANAGER_LOG_LEVEL", "INFO").upper(),
+        json_format=env.get("VETMANAGER_LOG_FORMAT", "json").lower() != "text",
+        max_bytes=int(env.get("VETMANAGER_LOG_MAX_BYTES", 5 * 1024 * 1024)),
+        backup_count=int(env.get("VETMANAGER_LOG_BACKUPS", 5)),
+        when=env.get("VETMANAGER_LOG_WHEN") or None,
+        module_levels=parse_module_levels(env.get("VETMANAGER_LOG_LEVELS", "")),
+    )
+
+
+def shutdown_logging():
+    """Vacía la cola, cierra el fichero y retira el handler de la cola del logger raíz."""
+    global _listener, _queue_handler
+    with _logging_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        logging.getLogger().removeHandler(_queue_handler)
+        _listener = _queue_handler = None
+
+
+atexit.register(shutdown_logging)
+
 class Validators:
     """Clase utilitaria estática para validaciones comunes."""
     
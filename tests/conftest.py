@@ -0,0 +1,9 @@
+import pytest
+from src.database import DatabaseManager
+
+@pytest.fixture
+def db():
+    """Base de datos en memoria con el esquema y todas las migraciones aplicadas."""
+    db = DatabaseManager(":memory:")
+    db.initialize_db()
+    return db
@@ -0,0 +1,36 @@
+import pytest
+import threading
+from unittest.mock import patch
+from src import app_context
+from src.app_context import build_app_context, get_app_context, close_app_contexts
+
+def test_build_app_context_seeds_and_reports_timings(tmp_path):
+    ctx = build_app_context(str(tmp_path / "clinica.db"))
+    assert ctx.client_repo.has_any()
+    assert ctx.auth_service.login("admin", "admin123") is not None
+    assert set(ctx.startup_timings) == {"schema", "wiring", "seed", "admin", "total"}
+    ctx.db.close()
+
+def test_get_app_context_builds_once_per_process(tmp_path):
+    db_name = str(tmp_path / "compartida.db")
+    results = []
+    with patch.object(app_context, "build_app_context", wraps=build_app_context) as build:
+        threads = [threading.Thread(target=lambda: results.append(get_app_context(db_name, seed=False)))
+                   for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # Un rerun posterior recoge la misma instancia
+        results.append(get_app_context(db_name))
+
+    assert build.call_count == 1
+    assert all(ctx is results[0] for ctx in results)
+    app_context._contexts.pop(db_name).db.close()
+
+def test_close_app_contexts_stops_hash_pool_and_connections(tmp_path):
+    ctx = get_app_context(str(tmp_path / "cierre.db"), seed=False)
+    close_app_contexts()
+    assert app_context._contexts == {}
+    with pytest.raises(RuntimeError):
+        ctx.auth_service._hash("clave")  # el pool ya no acepta trabajos
@@ -1,5 +1,9 @@
+import threading
+import time
+import bcrypt
 import pytest
-from src.services import AuthService
+from unittest.mock import patch
+from src.services import AuthService, bcrypt_rounds, SESSION_TOUCH_INTERVAL_SECONDS, SESSION_REVALIDATE_SECONDS
 from src.repositories import UserRepository
 from src.database import DatabaseManager
 
@@ -9,7 +13,7 @@ def auth_service():
     db = DatabaseManager(":memory:")
     db.initialize_db()
     repo = UserRepository(db)
-    return AuthService(repo)
+    return AuthService(repo, rounds=4)
 
 def test_register_and_login_flow(auth_service):
     # 1. Registro
@@ -44,4 +48,159 @@ def test_create_admin_idempotency(auth_service):
     # Segunda vez: no hace nada (no debe fallar)
     auth_service.create_admin_if_not_exists()
     # Verificar que sigue existiendo y funcionando
-    assert auth_service.login("admin", "admin123") is not None
\ No newline at end of file
+    assert auth_service.login("admin", "admin123") is not None
+
+def test_rehash_on_login_when_cost_changes():
+    db = DatabaseManager(":memory:")
+    db.initialize_db()
+    repo = UserRepository(db)
+    AuthService(repo, rounds=4).register_user("vet", "clave")
+    assert bcrypt_rounds(repo.get_by_username("vet").password_hash) == 4
+
+    stronger = AuthService(repo, rounds=5)
+    assert stronger.login("vet", "clave") is not None
+    assert bcrypt_rounds(repo.get_by_username("vet").password_hash) == 5
+    # Un login fallido no toca el hash
+    stored = repo.get_by_username("vet").password_hash
+    assert AuthService(repo, rounds=6).login("vet", "mala") is None
+    assert repo.get_by_username("vet").password_hash == stored
+
+def test_concurrent_logins_share_bounded_pool(tmp_path):
+    db = DatabaseManager(str(tmp_path / "auth.db"), pool_size=4)
+    db.initialize_db()
+    auth = AuthService(UserRepository(db), rounds=4, max_workers=2)
+    for i in range(8):
+        auth.register_user(f"vet{i}", "clave")
+
+    real_checkpw = bcrypt.checkpw
+    running, overlap = [0], [0]
+    lock = threading.Lock()
+
+    def slow_checkpw(password, password_hash):
+        with lock:
+            running[0] += 1
+            overlap[0] = max(overlap[0], running[0])
+        try:
+            time.sleep(0.05)  # que los 8 logins coincidan en el tiempo
+            return real_checkpw(password, password_hash)
+        finally:
+            with lock:
+                running[0] -= 1
+
+    results = []
+    with patch.object(bcrypt, "checkpw", slow_checkpw):
+        threads = [threading.Thread(target=lambda i=i: results.append(auth.login(f"vet{i}", "clave")))
+                   for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    assert len(results) == 8 and all(user is not None for user in results)
+    # Nunca hay más de 2 comprobaciones bcrypt a la vez
+    assert overlap[0] == 2
+    auth.close()
+    db.close()
+
+def test_rejects_out_of_range_cost():
+    with pytest.raises(ValueError, match="Coste de bcrypt"):
+        AuthService(UserRepository(DatabaseManager(":memory:")), rounds=3)
+
+# ----------------------------------------------------------------
+# Sesiones
+# ----------------------------------------------------------------
+def test_session_roundtrip_without_bcrypt(auth_service):
+    user = auth_service.login(auth_service.register_user("vet", "clave").username, "clave")
+    token = auth_service.create_session(user)
+
+    with patch("src.services.bcrypt") as fake_bcrypt, \
+         patch.object(auth_service.session_repo, "get_with_user") as fake_lookup:
+        session_user = auth_service.validate_session(token)
+    fake_bcrypt.checkpw.assert_not_called()
+    fake_lookup.assert_not_called()  # estaba en memoria: ni bcrypt ni consulta
+    assert session_user.username == "vet"
+    assert session_user.password_hash == ""
+
+def test_session_rejects_tampered_tokens(auth_service):
+    token = auth_service.create_session(auth_service.register_user("vet", "clave"))
+    token_id, _, signature = token.partition(".")
+    assert auth_service.validate_session(f"{token_id}.{signature[:-1]}x") is None
+    assert auth_service.validate_session(token_id) is None
+    assert auth_service.validate_session(None) is None
+    # Firmas y ids que no son ASCII se rechazan sin TypeError
+    assert auth_service.validate_session(f"{token_id}.{signature[:-1]}ñ") is None
+    assert auth_service.validate_session("ñ\udc80.firma") is None
+
+def test_session_survives_process_cache_loss(auth_service):
+    token = auth_service.create_session(auth_service.register_user("vet", "clave"))
+    other_process = AuthService(auth_service.user_repo, rounds=4, session_repo=auth_service.session_repo,
+                                session_secret=auth_service._session_secret)
+    assert other_process.validate_session(token).username == "vet"
+    assert AuthService(auth_service.user_repo, rounds=4).validate_session(token) is None  # otra clave
+
+def test_sliding_expiration(auth_service):
+    auth_service.session_ttl = 10
+    start = 1_000_000_000.0
+    with patch("src.services.time.time", return_value=start):
+        token = auth_service.create_session(auth_service.register_user("vet", "clave"))
+    with patch("src.services.time.time", return_value=start + 8):
+        assert auth_service.validate_session(token) is not None  # renueva hasta start+18
+    with patch("src.services.time.time", return_value=start + 16):
+        assert auth_service.validate_session(token) is not None
+    with patch("src.services.time.time", return_value=start + 40):
+        assert auth_service.validate_session(token) is None
+    assert auth_service.session_repo.get_with_user(token.partition(".")[0]) is None
+
+def test_concurrent_validations_touch_the_database_once(auth_service):
+    token = auth_service.create_session(auth_service.register_user("vet", "clave"))
+    start = threading.Barrier(8)
+    results = []
+
+    def validate():
+        start.wait()
+        results.append(auth_service.validate_session(token))
+    with patch.object(auth_service.session_repo, "touch") as touch, \
+         patch("src.services.time.time", return_value=time.time() + SESSION_TOUCH_INTERVAL_SECONDS):
+        threads = [threading.Thread(target=validate) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    assert len(results) == 8 and all(user is not None for user in results)
+    touch.assert_called_once()
+
+def test_sliding_expiration_is_persisted_lazily(auth_service):
+    token = auth_service.create_session(auth_service.register_user("vet", "clave"))
+    with patch.object(auth_service.session_repo, "touch") as touch:
+        auth_service.validate_session(token)
+        touch.assert_not_called()
+        with patch("src.services.time.time", return_value=time.time() + SESSION_TOUCH_INTERVAL_SECONDS):
+            auth_service.validate_session(token)
+        touch.assert_called_once()
+
+def test_revocation_from_another_process_is_seen_after_revalidation(auth_service):
+    vet = auth_service.register_user("vet", "clave")
+    token = auth_service.create_session(vet)
+    other_process = AuthService(auth_service.user_repo, rounds=4, session_repo=auth_service.session_repo,
+                                session_secret=auth_service._session_secret)
+    assert other_process.validate_session(token) is not None
+    assert auth_service.revoke_user_sessions(vet.id) == 1
+    # Hasta la siguiente comprobación el otro proceso confía en su memoria; después, no
+    assert other_process.validate_session(token) is not None
+    with patch("src.services.time.time", return_value=time.time() + SESSION_REVALIDATE_SECONDS):
+        assert other_process.validate_session(token) is None
+    assert token.partition(".")[0] not in other_process._sessions
+
+def test_revocation(auth_service):
+    vet = auth_service.register_user("vet", "clave")
+    other = auth_service.register_user("otro", "clave")
+    tokens = [auth_service.create_session(vet) for _ in range(3)]
+    other_token = auth_service.create_session(other)
+
+    assert auth_service.revoke_session(tokens[0])
+    assert auth_service.validate_session(tokens[0]) is None
+    assert auth_service.revoke_user_sessions(vet.id) == 2
+    assert all(auth_service.validate_session(t) is None for t in tokens)
+    assert auth_service.validate_session(other_token) is not None
+    assert auth_service.revoke_all_sessions() == 1
+    assert auth_service.validate_session(other_token) is None
@@ -0,0 +1,39 @@
+import pytest
+from benchmarks.suite import (
+    CaseResult, SERVICE_CASES, compare, load_results, measure, run_suite, save_results,
+    uncovered_service_methods
+)
+
+def _result(ms):
+    return CaseResult(ms, ms, ms, 5)
+
+def test_every_service_method_has_a_case():
+    assert uncovered_service_methods() == []
+
+def test_compare_flags_only_regressions_above_threshold_and_noise():
+    baseline = {"a": _result(10.0), "b": _result(10.0), "c": _result(0.01), "gone": _result(1.0)}
+    current = {"a": _result(13.0), "b": _result(11.0), "c": _result(0.05), "new": _result(99.0)}
+
+    regressions = compare(current, baseline, threshold=0.2, noise_floor_ms=0.5)
+    assert [r.name for r in regressions] == ["a"]
+    assert regressions[0].ratio == pytest.approx(1.3)
+
+def test_measure_respects_run_limits():
+    calls = []
+    result = measure(lambda n: calls.append(n), min_runs=3, max_runs=7, max_seconds=10)
+    assert result.runs == 7 and calls == list(range(7))
+
+    setups = []
+    measure(lambda arg, n: None, setup=setups.append, min_runs=2, max_runs=2)
+    assert setups == [0, 1]
+
+def test_suite_runs_and_round_trips_json(tmp_path):
+    results = run_suite(["1k"], ["repositories", "services"], data_dir=str(tmp_path),
+                        min_runs=1, max_runs=1)
+    assert "1k/repositories/ClientRepository.get_all" in results
+    assert {f"1k/services/{name}" for name in SERVICE_CASES} <= set(results)
+
+    path = tmp_path / "results.json"
+    save_results(str(path), results, {"sizes": ["1k"]})
+    assert load_results(str(path)) == results
+    assert compare(results, load_results(str(path))) == []
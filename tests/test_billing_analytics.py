@@ -0,0 +1,80 @@
+import pytest
+from datetime import date
+from src.repositories import (ClientRepository, PetRepository, AppointmentRepository, MedicalRecordRepository,
+                              BillingRepository, ReviewRepository)
+from src.billing_analytics import BillingAnalyticsRepository, period_key, period_keys, periods_back
+from src.services import ClinicService
+from src.models import Client, Invoice
+
+@pytest.fixture
+def invoices(db):
+    clients = ClientRepository(db)
+    ana = clients.create(Client(None, "Ana", "a@mail.com", "600123456"))
+    luis = clients.create(Client(None, "Luis", "l@mail.com", "600654321"))
+    bills = BillingRepository(db)
+    created = [bills.create(Invoice(None, ana.id, date(2025, 1, 6), 30.0, "Pagada")),
+               bills.create(Invoice(None, ana.id, date(2025, 1, 12), 20.1, "Pendiente")),
+               bills.create(Invoice(None, luis.id, date(2025, 2, 3), 99.9, "Pendiente"))]
+    return ana, luis, created
+
+def test_period_keys():
+    # Las semanas empiezan en lunes, igual que en los triggers
+    assert period_key("week", date(2025, 1, 12)) == "2025-01-06"
+    assert period_keys("month", date(2024, 11, 30), date(2025, 2, 1)) == ["2024-11", "2024-12", "2025-01", "2025-02"]
+    assert period_keys("week", date(2025, 1, 8), date(2025, 1, 20)) == ["2025-01-06", "2025-01-13", "2025-01-20"]
+    assert periods_back("month", date(2025, 2, 15), 3) == date(2024, 12, 1)
+    with pytest.raises(ValueError):
+        period_key("year", date(2025, 1, 1))
+
+def test_triggers_keep_rollups_in_step(db, invoices):
+    ana, luis, (paid, pending, other) = invoices
+    analytics = BillingAnalyticsRepository(db)
+    january = analytics.revenue_by_period("month", "2025-01", "2025-01")[0]
+    assert (january.invoice_count, january.total, january.paid, january.outstanding) == (2, 50.1, 30.0, 20.1)
+    weeks = analytics.revenue_by_period("week", "2025-01-01", "2025-01-31")
+    assert [(w.period, w.total) for w in weeks] == [("2025-01-06", 50.1)]
+
+    bills = BillingRepository(db)
+    assert bills.set_status(pending.id, "Pagada")
+    assert analytics.revenue_by_period("month", "2025-01", "2025-01")[0].outstanding == 0
+    # Mover una factura de cliente y de mes actualiza los dos agregados
+    other.client_id, other.date = ana.id, date(2025, 1, 31)
+    assert bills.update(other)
+    assert [p.period for p in analytics.revenue_by_period("month", "2025-01", "2025-12")] == ["2025-01"]
+    assert analytics.client_revenue(luis.id) is None
+    with db.connection() as conn:
+        conn.execute("DELETE FROM invoices WHERE id = ?", (paid.id,))
+    assert analytics.client_revenue(ana.id).total == pytest.approx(120.0)
+    assert analytics.totals().invoice_count == 2
+    assert analytics.is_consistent()
+
+def test_rebuild_repairs_drifted_rollups(db, invoices):
+    analytics = BillingAnalyticsRepository(db)
+    with db.connection() as conn:
+        conn.execute("DELETE FROM revenue_by_client")
+    assert not analytics.is_consistent()
+    assert analytics.rebuild() > 0
+    assert analytics.is_consistent()
+    assert [c.client_name for c in analytics.top_clients()] == ["Luis", "Ana"]
+
+def test_service_fills_empty_periods_and_invalidates(db, invoices):
+    ana, luis, (paid, pending, other) = invoices
+    service = ClinicService(ClientRepository(db), PetRepository(db), AppointmentRepository(db),
+                            MedicalRecordRepository(db), BillingRepository(db), ReviewRepository(db))
+    periods = service.revenue_by_period("month", "2024-12-01", "2025-03-31")
+    assert [(p.period, p.total) for p in periods] == [("2024-12", 0), ("2025-01", 50.1), ("2025-02", 99.9), ("2025-03", 0)]
+    assert len(service.revenue_by_period("day", end="2025-01-31")) == 30
+    assert service.revenue_totals().outstanding == pytest.approx(120.0)
+
+    service.set_invoice_status(pending.id, "Pagada")
+    assert service.revenue_totals().outstanding == pytest.approx(99.9)
+    assert service.client_revenue(ana.id).paid == pytest.approx(50.1)
+    assert service.client_revenue(12345).total == 0
+    with pytest.raises(ValueError):
+        service.set_invoice_status(pending.id, "Regalada")
+    with pytest.raises(ValueError):
+        service.set_invoice_status(12345, "Pagada")
+    with pytest.raises(ValueError):
+        service.revenue_by_period("year")
+    with pytest.raises(ValueError):
+        service.revenue_by_period("day", "2025-02-01", "2025-01-01")
@@ -0,0 +1,282 @@
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import patch
+from src.cache import EntityCache
+from src.database import DatabaseManager
+from src.repositories import (
+    ClientRepository, PetRepository, AppointmentRepository,
+    MedicalRecordRepository, BillingRepository, ReviewRepository, StatsRepository
+)
+from src.billing_analytics import BillingAnalyticsRepository
+from src.models import Client, Invoice
+from src.services import ClinicService
+from src.query_stats import QueryStats
+
+# ----------------------------------------------------------------
+# EntityCache
+# ----------------------------------------------------------------
+def test_hit_miss_and_copy_on_read():
+    cache = EntityCache()
+    calls = []
+    loader = lambda: calls.append(1) or [{"a": 1}]
+
+    first = cache.get_or_load("k", ["t"], loader)
+    first[0]["a"] = 99  # modificar lo devuelto no altera la caché
+    second = cache.get_or_load("k", ["t"], loader)
+
+    assert second == [{"a": 1}]
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert (stats.hits, stats.misses) == (1, 1)
+
+def test_lru_eviction_by_entries():
+    cache = EntityCache(max_entries=2)
+    cache.get_or_load("a", [], lambda: 1)
+    cache.get_or_load("b", [], lambda: 2)
+    cache.get_or_load("a", [], lambda: 1)  # "a" pasa a ser el más reciente
+    cache.get_or_load("c", [], lambda: 3)  # desaloja "b"
+
+    assert cache.stats().evictions == 1
+    assert cache.get_or_load("b", [], lambda: "recargado") == "recargado"
+
+def test_memory_cap_evicts_and_skips_oversized():
+    cache = EntityCache(max_bytes=20_000)
+    cache.get_or_load("big", [], lambda: "x" * 50_000)
+    assert cache.stats().entries == 0
+
+    for i in range(10):
+        cache.get_or_load(i, [], lambda: "y" * 5_000)
+    stats = cache.stats()
+    assert stats.approx_bytes <= 20_000
+    assert stats.evictions > 0
+
+def test_ttl_expiration():
+    cache = EntityCache(ttl=10)
+    with patch("src.cache.time.monotonic", return_value=100.0):
+        cache.get_or_load("k", [], lambda: "viejo")
+    with patch("src.cache.time.monotonic", return_value=111.0):
+        assert cache.get_or_load("k", [], lambda: "nuevo") == "nuevo"
+    assert cache.stats().expirations == 1
+
+def test_versions_and_scope_stats():
+    cache = EntityCache()
+    assert cache.versions(["pets", "clients"]) == (0, 0)
+    cache.invalidate("pets")
+    assert cache.versions(["pets", "clients"]) == (1, 0)
+
+    with cache.scope("Mascotas"):
+        cache.get_or_load("k", ["pets"], lambda: 1)
+        cache.get_or_load("k", ["pets"], lambda: 1)
+        cache.get_or_load("k", ["pets"], lambda: 1)
+    cache.get_or_load("k", ["pets"], lambda: 1)  # fuera de un ámbito no se atribuye
+    stats = cache.scope_stats()["Mascotas"]
+    assert (stats.hits, stats.misses) == (2, 1) and stats.hit_ratio == pytest.approx(2 / 3)
+
+def test_dataclass_containers_are_copied_on_read():
+    from src.interfaces import Page
+    cache = EntityCache()
+    page = cache.get_or_load("p", [], lambda: Page([{"a": 1}], (1,)))
+    page.items.append({"a": 2})
+    assert cache.get_or_load("p", [], lambda: None).items == [{"a": 1}]
+
+def test_dataframe_hits_share_data_but_not_writes():
+    cache = EntityCache()
+    cache.get_or_load("k", ["t"], lambda: pd.DataFrame({"a": np.arange(1000)}))
+
+    first = cache.get_or_load("k", ["t"], lambda: None)
+    second = cache.get_or_load("k", ["t"], lambda: None)
+    # Un acierto no vuelve a reservar los datos...
+    assert np.shares_memory(first["a"].to_numpy(), second["a"].to_numpy())
+    # ...y modificar lo devuelto no altera la caché
+    first.loc[0, "a"] = -1
+    assert cache.get_or_load("k", ["t"], lambda: None)["a"].iloc[0] == 0
+
+def test_invalidate_is_precise():
+    cache = EntityCache()
+    cache.get_or_load(("pets", "all"), ["pets"], lambda: ["lista"])
+    cache.get_or_load(("pet", 1), [("pets", 1)], lambda: "pet 1")
+    cache.get_or_load(("pet", 2), [("pets", 2)], lambda: "pet 2")
+
+    cache.invalidate("pets", ("pets", 1))
+
+    assert cache.stats().entries == 1
+    assert cache.get_or_load(("pet", 2), [("pets", 2)], lambda: "recargado") == "pet 2"
+
+def test_load_racing_with_write_is_not_stored():
+    cache = EntityCache()
+
+    def slow_loader():
+        # Una escritura termina mientras la lectura está en curso
+        cache.invalidate("clients")
+        return "dato viejo"
+
+    assert cache.get_or_load("k", ["clients"], slow_loader) == "dato viejo"
+    assert cache.get_or_load("k", ["clients"], lambda: "dato nuevo") == "dato nuevo"
+
+# ----------------------------------------------------------------
+# Integración con ClinicService
+# ----------------------------------------------------------------
+@pytest.fixture
+def service(tmp_path):
+    db = DatabaseManager(str(tmp_path / "cache.db"))
+    db.initialize_db()
+    yield ClinicService(ClientRepository(db), PetRepository(db), AppointmentRepository(db),
+                        MedicalRecordRepository(db), BillingRepository(db), ReviewRepository(db),
+                        cache=EntityCache())
+    db.close()
+
+def test_service_writes_invalidate_reads(service):
+    client = service.add_client("Ana", "ana@mail.com", "600123456")
+    assert [c.name for c in service.list_clients()] == ["Ana"]
+    pet = service.add_pet("Luna", "Perro", "Golden", 3, client.id)
+    service.book_appointment(pet.id, "2025-05-01", "Vacuna")
+    assert service.list_appointments_between("2025-05-01", "2025-06-01")[0].owner_name == "Ana"
+
+    client.name = "Ana María"
+    service.update_client(client)
+    assert [c.name for c in service.list_clients()] == ["Ana María"]
+    assert service.get_client_by_id(client.id).name == "Ana María"
+    # La vista con detalle también refleja el nombre nuevo del dueño
+    assert service.list_appointments_between("2025-05-01", "2025-06-01")[0].owner_name == "Ana María"
+
+    pet.age = 4
+    service.update_pet(pet)
+    assert service.get_pet_by_id(pet.id).age == 4
+
+    service.delete_pet(pet.id)
+    assert service.list_pets() == []
+    assert service.get_pet_by_id(pet.id) is None
+
+def test_repeated_reads_hit_cache(service):
+    service.add_client("Ana", "ana@mail.com", "600123456")
+    with patch.object(service.client_repo, "get_all", wraps=service.client_repo.get_all) as get_all:
+        for _ in range(5):
+            service.list_clients()
+    assert get_all.call_count == 1
+    assert service.cache.stats().hits >= 4
+
+def test_no_stale_reads_under_concurrent_writes(service):
+    client = service.add_client("Cliente 0", "c@mail.com", "600123456")
+    errors = []
+    stop = threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            service.list_clients()
+
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    for t in readers:
+        t.start()
+    try:
+        for i in range(1, 40):
+            client.name = f"Cliente {i}"
+            service.update_client(client)
+            # Tras volver la escritura, ninguna lectura puede devolver el nombre anterior
+            if service.list_clients()[0].name != client.name:
+                errors.append(i)
+    finally:
+        stop.set()
+        for t in readers:
+            t.join()
+    assert errors == []
+
+@pytest.fixture
+def counted_service(tmp_path):
+    """Servicio sobre una BD instrumentada: QueryStats cuenta las sentencias ejecutadas."""
+    stats = QueryStats()
+    db = DatabaseManager(str(tmp_path / "cache.db"), query_stats=stats)
+    db.initialize_db()
+    yield ClinicService(ClientRepository(db), PetRepository(db), AppointmentRepository(db),
+                        MedicalRecordRepository(db), BillingRepository(db), ReviewRepository(db),
+                        cache=EntityCache()), stats
+    db.close()
+
+def _statements(stats):
+    return sum(s.count for s in stats.snapshot())
+
+def _render_pets_page(service, pet_id):
+    """Las lecturas de un rerun de la página de mascotas."""
+    service.has_clients()
+    service.has_pets()
+    service.lookup_pets("lu")
+    service.get_pet_timeline(pet_id)
+    return service.pets_table(25)
+
+def test_rerun_without_writes_costs_no_queries(counted_service):
+    service, stats = counted_service
+    client = service.add_client("Ana", "ana@mail.com", "600123456")
+    pet = service.add_pet("Luna", "Perro", "Golden", 3, client.id)
+    _render_pets_page(service, pet.id)
+
+    before = _statements(stats)
+    for _ in range(3):
+        page = _render_pets_page(service, pet.id)
+    assert _statements(stats) == before
+    assert page.items["visit_count"].tolist() == [0]
+
+    # Un registro médico cambia el resumen de la tabla de mascotas: se vuelve a consultar
+    appt = service.book_appointment(pet.id, "2025-05-01", "Vacuna")
+    service.add_medical_record(appt.id, "Sana", "Ninguno")
+    assert _render_pets_page(service, pet.id).items["visit_count"].tolist() == [1]
+    assert _statements(stats) > before
+
+def test_every_write_bumps_the_tables_it_touches(service):
+    client = service.add_client("Ana", "ana@mail.com", "600123456")
+    pet = service.add_pet("Luna", "Perro", "Golden", 3, client.id)
+    appt = service.book_appointment(pet.id, "2025-05-01", "Vacuna")
+    tables = ["clients", "pets", "appointments", "medical_records", "invoices", "reviews"]
+    before = service.cache.versions(tables)
+
+    service.complete_appointment(appt.id, "Sana", "Ninguno", amount=30.0)
+    service.generate_invoice(client.id, 10.0, "2025-05-02")
+    service.add_review(client.id, 5)
+    after = service.cache.versions(tables)
+    assert [b < a for b, a in zip(before, after)] == [False, False, True, True, True, True]
+    assert service.invoices_table().items["client_name"].tolist() == ["Ana", "Ana"]
+
+# ----------------------------------------------------------------
+# Versiones de datos de la BD (escrituras de otros procesos)
+# ----------------------------------------------------------------
+@pytest.fixture
+def two_processes(tmp_path):
+    """Un servicio con caché versionada por la BD y otra conexión independiente al mismo fichero."""
+    path = str(tmp_path / "shared.db")
+    db = DatabaseManager(path)
+    db.initialize_db()
+    other = DatabaseManager(path)
+    yield ClinicService(ClientRepository(db), PetRepository(db), AppointmentRepository(db),
+                        MedicalRecordRepository(db), BillingRepository(db), ReviewRepository(db),
+                        cache=EntityCache(version_source=StatsRepository(db).data_versions)), other
+    other.close()
+    db.close()
+
+def test_writes_from_another_process_miss_the_cache(two_processes):
+    service, other = two_processes
+    client = service.add_client("Ana", "ana@mail.com", "600123456")
+    assert [c.name for c in service.list_clients()] == ["Ana"]
+    assert service.get_client_by_id(client.id).name == "Ana"
+
+    ClientRepository(other).create(Client(None, "Berta", "berta@mail.com", "600654321"))
+    client.name = "Ana María"
+    ClientRepository(other).update(client)
+
+    assert [c.name for c in service.list_clients()] == ["Ana María", "Berta"]
+    assert service.get_client_by_id(client.id).name == "Ana María"
+    # Sin escrituras nuevas vuelve a acertar
+    hits = service.cache.stats().hits
+    service.list_clients()
+    assert service.cache.stats().hits == hits + 1
+
+def test_rebuild_from_another_process_misses_the_cache(two_processes):
+    service, other = two_processes
+    client = service.add_client("Ana", "ana@mail.com", "600123456")
+    BillingRepository(other).create(Invoice(None, client.id, "2025-05-02", 30.0, "Pendiente"))
+    # Agregados descuadrados a mano (sin pasar por los triggers de versión)
+    with other.connection() as conn:
+        conn.execute("UPDATE revenue_by_period SET total_cents = 0")
+    assert service.revenue_totals().total == 0
+
+    BillingAnalyticsRepository(other).rebuild()
+    assert service.revenue_totals().total == 30.0
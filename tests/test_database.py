@@ -0,0 +1,190 @@
+import sqlite3
+import threading
+import pytest
+from datetime import date
+from src.database import DatabaseManager, ConnectionPool, UnitOfWork
+from src.repositories import ClientRepository, AppointmentRepository, MedicalRecordRepository, BillingRepository
+from src.models import Client, Appointment, MedicalRecord, Invoice
+
+@pytest.fixture
+def file_db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "test.db"), pool_size=2, pool_timeout=0.2)
+    db.initialize_db()
+    yield db
+    db.close()
+
+def test_pool_reuses_connections(file_db):
+    repo = ClientRepository(file_db)
+    for i in range(10):
+        repo.create(Client(None, f"Cliente {i}", "c@mail.com", "600123456"))
+    assert len(repo.get_all()) == 10
+
+    stats = file_db.pool_stats()
+    # 11 préstamos (10 inserts + 1 listado) con una sola conexión física
+    assert stats.created == 1
+    assert stats.checkouts >= 11
+    assert stats.in_use == 0
+    assert stats.idle == 1
+
+def test_pool_is_bounded_and_times_out(file_db):
+    c1 = file_db.pool.acquire()
+    c2 = file_db.pool.acquire()
+    with pytest.raises(TimeoutError):
+        file_db.pool.acquire()
+    assert file_db.pool_stats().timeouts == 1
+
+    file_db.pool.release(c1)
+    c3 = file_db.pool.acquire()
+    assert c3 is c1
+    file_db.pool.release(c2)
+    file_db.pool.release(c3)
+
+def test_waiting_thread_gets_released_connection(file_db):
+    held = [file_db.pool.acquire(), file_db.pool.acquire()]
+    file_db.pool.timeout = 2.0
+    got = []
+
+    t = threading.Thread(target=lambda: got.append(file_db.pool.acquire()))
+    t.start()
+    file_db.pool.release(held[0])
+    t.join(timeout=3)
+
+    assert got == [held[0]]
+    assert file_db.pool_stats().waits == 1
+    file_db.pool.release(held[1])
+    file_db.pool.release(got[0])
+
+def test_connection_context_commits_and_rolls_back(file_db):
+    with file_db.connection() as conn:
+        conn.execute("INSERT INTO clients (name, email, phone) VALUES ('A', 'a@b.com', '600123456')")
+
+    with pytest.raises(RuntimeError):
+        with file_db.connection() as conn:
+            conn.execute("INSERT INTO clients (name, email, phone) VALUES ('B', 'b@b.com', '600123456')")
+            raise RuntimeError("fallo")
+
+    names = [c.name for c in ClientRepository(file_db).get_all()]
+    assert names == ["A"]
+
+def test_nested_blocks_share_connection_and_transaction(file_db):
+    repo = ClientRepository(file_db)
+    with pytest.raises(RuntimeError):
+        with file_db.connection() as outer:
+            repo.create(Client(None, "Interno", "i@b.com", "600123456"))
+            with file_db.connection() as inner:
+                assert inner is outer
+            raise RuntimeError("deshacer todo")
+
+    assert repo.get_all() == []
+    assert file_db.pool_stats().in_use == 0
+
+def test_unit_of_work_spans_repositories(file_db):
+    appt_repo, mr_repo, bill_repo = AppointmentRepository(file_db), MedicalRecordRepository(file_db), BillingRepository(file_db)
+
+    with UnitOfWork(file_db) as uow:
+        assert uow.conn.in_transaction
+        appt = appt_repo.create(Appointment(None, 1, date(2025, 1, 1), "Vacuna", "Completada"))
+        mr_repo.create(MedicalRecord(None, appt.id, "Sano", "Ninguno"))
+        bill_repo.create(Invoice(None, 1, date(2025, 1, 1), 30.0, "Pagada"))
+    assert len(appt_repo.get_all()) == 1 and len(bill_repo.get_all()) == 1
+
+    with pytest.raises(RuntimeError):
+        with UnitOfWork(file_db):
+            appt_repo.create(Appointment(None, 1, date(2025, 1, 2), "Vacuna", "Completada"))
+            bill_repo.create(Invoice(None, 1, date(2025, 1, 2), 30.0, "Pagada"))
+            raise RuntimeError("fallo a mitad")
+    assert len(appt_repo.get_all()) == 1 and len(bill_repo.get_all()) == 1
+    assert file_db.pool_stats().in_use == 0
+
+def test_unit_of_work_joins_open_transaction(file_db):
+    repo = ClientRepository(file_db)
+    with pytest.raises(RuntimeError):
+        with file_db.connection() as conn:
+            repo.create(Client(None, "Fuera", "f@b.com", "600123456"))
+            with UnitOfWork(file_db) as uow:
+                assert uow.conn is conn
+                repo.create(Client(None, "Dentro", "d@b.com", "600123456"))
+            raise RuntimeError("deshacer todo")
+    assert repo.get_all() == []
+
+def test_unit_of_work_undoes_itself_when_outer_block_catches(file_db):
+    repo = ClientRepository(file_db)
+    with file_db.connection():
+        repo.create(Client(None, "Fuera", "f@b.com", "600123456"))
+        try:
+            with UnitOfWork(file_db):
+                repo.create(Client(None, "Dentro", "d@b.com", "600123456"))
+                raise RuntimeError("fallo a mitad")
+        except RuntimeError:
+            pass
+    # También sin transacción abierta al entrar: la unidad empieza la suya y la deshace
+    with file_db.connection():
+        try:
+            with UnitOfWork(file_db):
+                repo.create(Client(None, "Sola", "s@b.com", "600123456"))
+                raise RuntimeError("fallo a mitad")
+        except RuntimeError:
+            pass
+    assert [c.name for c in repo.get_all()] == ["Fuera"]
+
+def test_closed_pool_closes_connections(tmp_path):
+    db = DatabaseManager(str(tmp_path / "closing.db"))
+    db.initialize_db()
+    with db.connection() as conn:
+        pass
+    db.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    with pytest.raises(RuntimeError):
+        db.pool.acquire()
+
+def test_memory_db_reopens_after_pool_discards_its_connection(db):
+    with db.connection() as conn:
+        first = conn
+    db.pool.idle_timeout = 0  # la conexión libre caduca y el pool la cierra al pedir otra
+    with db.connection() as conn:
+        assert conn is not first
+        assert conn.execute("SELECT 1").fetchone() == (1,)
+
+def test_pool_rejects_invalid_size():
+    with pytest.raises(ValueError):
+        ConnectionPool(lambda: sqlite3.connect(":memory:"), max_size=0)
+
+# ----------------------------------------------------------------
+# PERFILES DE RENDIMIENTO (PRAGMAs)
+# ----------------------------------------------------------------
+@pytest.mark.parametrize("profile", ["durable", "balanced", "fast-bulk-load"])
+def test_profiles_are_applied_on_file_db(tmp_path, profile):
+    db = DatabaseManager(str(tmp_path / f"{profile}.db"), profile=profile)
+    db.initialize_db()
+    report = db.pragma_report()
+    assert all(info["ok"] for info in report.values()), report
+    assert db.applied_pragmas["journal_mode"] == "wal"
+    db.close()
+
+def test_memory_db_skips_file_only_pragmas():
+    db = DatabaseManager(":memory:")
+    db.initialize_db()
+    assert "journal_mode" not in db.applied_pragmas
+    assert db.applied_pragmas["synchronous"] == 1  # NORMAL
+
+def test_pragma_overrides_and_unknown_profile(tmp_path):
+    db = DatabaseManager(str(tmp_path / "o.db"), pragma_overrides={"busy_timeout": 1234})
+    db.initialize_db()
+    assert db.applied_pragmas["busy_timeout"] == 1234
+    db.close()
+    with pytest.raises(ValueError, match="Perfil de base de datos desconocido"):
+        DatabaseManager(":memory:", profile="turbo")
+
+def test_wal_readers_not_blocked_by_writer(file_db):
+    repo = ClientRepository(file_db)
+    repo.create(Client(None, "Existente", "e@b.com", "600123456"))
+
+    writer = file_db.pool.acquire()
+    writer.execute("INSERT INTO clients (name, email, phone) VALUES ('Pendiente', 'p@b.com', '600123456')")
+    assert writer.in_transaction
+    # Con WAL el lector ve la última versión confirmada sin esperar al escritor
+    assert [c.name for c in repo.get_all()] == ["Existente"]
+    writer.commit()
+    file_db.pool.release(writer)
+    assert len(repo.get_all()) == 2
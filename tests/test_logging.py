@@ -0,0 +1,56 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+import pytest
+from src.utils import logger, configure_logging, shutdown_logging, parse_module_levels
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def restore_levels():
+    root_level = logging.getLogger().level
+    yield
+    shutdown_logging()
+    logging.getLogger().setLevel(root_level)
+    logging.getLogger("VeterinariaApp.ruidoso").setLevel(logging.NOTSET)
+
+def test_import_does_not_configure_logging(tmp_path):
+    # En un proceso limpio: importar src.utils no añade handlers ni crea app.log
+    code = "import logging, src.utils; print(len(logging.getLogger().handlers))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, capture_output=True, text=True,
+                            env={**os.environ, "PYTHONPATH": ROOT})
+    assert result.stdout.strip() == "0", result.stderr
+    assert not (tmp_path / "app.log").exists()
+
+def test_queued_json_lines_with_module_levels(tmp_path, restore_levels):
+    path = tmp_path / "app.log"
+    configure_logging(str(path), module_levels={"VeterinariaApp.ruidoso": "ERROR"})
+
+    logger.info("Cliente creado")
+    logger.getChild("ruidoso").warning("no debería escribirse")
+    shutdown_logging()  # vacía la cola
+
+    lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [entry["msg"] for entry in lines] == ["Cliente creado"]
+    assert lines[0]["level"] == "INFO"
+    assert lines[0]["logger"] == "VeterinariaApp"
+
+def test_configure_is_idempotent_and_rotates(tmp_path, restore_levels):
+    path = tmp_path / "app.log"
+    listener = configure_logging(str(path), json_format=False, max_bytes=200, backup_count=2)
+    assert configure_logging(str(path)) is listener
+
+    for i in range(20):
+        logger.info(f"mensaje de relleno número {i}")
+    shutdown_logging()
+
+    assert (tmp_path / "app.log.1").exists()
+    assert not (tmp_path / "app.log.3").exists()
+
+def test_parse_module_levels():
+    assert parse_module_levels("a=warning, b.c=ERROR") == {"a": "WARNING", "b.c": "ERROR"}
+    assert parse_module_levels("") == {}
+    with pytest.raises(ValueError):
+        parse_module_levels("sin_nivel")
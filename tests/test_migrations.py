@@ -0,0 +1,59 @@
+import pytest
+from src.migrations import MIGRATIONS, Migration, apply_migrations, current_version
+from src.query_plan import check_query_plans, unprobed_repository_methods
+
+def _index_names(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+
+def test_initialize_db_applies_all_migrations(db):
+    with db.connection() as conn:
+        assert current_version(conn) == MIGRATIONS[-1].version
+        indexes = _index_names(conn)
+    for expected in ["idx_pets_client_id", "idx_appointments_pet_id_date", "idx_appointments_date",
+                     "idx_medical_records_appointment_id", "idx_invoices_client_id",
+                     "idx_invoices_date", "idx_reviews_review_date"]:
+        assert expected in indexes
+
+def test_migrations_are_idempotent(db):
+    db.initialize_db()
+    with db.connection() as conn:
+        assert apply_migrations(conn) == []
+        rows = conn.execute("SELECT COUNT(*) FROM schema_version").fetchone()[0]
+    assert rows == len(MIGRATIONS)
+
+def test_failed_migration_is_rolled_back(db):
+    broken = MIGRATIONS + [Migration(999, "Rota", (
+        "CREATE TABLE temporal (id INTEGER)",
+        "CREATE INDEX idx_inexistente ON tabla_que_no_existe(x)",
+    ))]
+    with db.connection() as conn:
+        with pytest.raises(Exception):
+            apply_migrations(conn, broken)
+        assert current_version(conn) == MIGRATIONS[-1].version
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    assert "temporal" not in tables
+
+def test_migrations_must_be_ordered(db):
+    with db.connection() as conn:
+        with pytest.raises(ValueError):
+            apply_migrations(conn, [MIGRATIONS[1], MIGRATIONS[0]])
+
+def test_repository_queries_use_indexes(db):
+    results = check_query_plans(db)
+    assert results
+    failing = [(r.label, r.plan) for r in results if not r.ok]
+    assert failing == []
+
+def test_every_repository_read_has_a_probe():
+    assert unprobed_repository_methods() == []
+
+def test_query_plan_check_flags_index_walks(db):
+    # Recorrer la tabla entera por un índice (solo para ordenar) también es un recorrido completo
+    results = [r for r in check_query_plans(db) if r.label == "BillingRepository.get_all"]
+    assert results and results[0].full_scans == ["invoices"]
+
+def test_query_plan_check_detects_missing_index(db):
+    with db.connection() as conn:
+        conn.execute("DROP INDEX idx_pets_client_id")
+    failing = [r.label for r in check_query_plans(db) if not r.ok]
+    assert "PetRepository.get_by_client" in failing
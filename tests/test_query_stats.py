@@ -0,0 +1,71 @@
+import json
+import logging
+import pytest
+from src.database import DatabaseManager
+from src.query_stats import QueryStats, normalize_sql, redact_params
+from src.repositories import ClientRepository
+from src.models import Client
+
+@pytest.fixture
+def stats():
+    return QueryStats(slow_ms=0.0)
+
+@pytest.fixture
+def instrumented_db(tmp_path, stats):
+    db = DatabaseManager(str(tmp_path / "stats.db"), pool_size=1, query_stats=stats)
+    db.initialize_db()
+    stats.reset()
+    yield db
+    db.close()
+
+def test_normalize_sql_strips_literals_and_whitespace():
+    sql = "SELECT *\n  FROM clients\n WHERE name = 'O''Hara' AND id > 42"
+    assert normalize_sql(sql) == "SELECT * FROM clients WHERE name = ? AND id > ?"
+
+def test_redact_params_keeps_only_types():
+    assert redact_params(("secreto", 3)) == "(str, int)"
+    assert redact_params({"email": "a@b.com"}) == "{email: str}"
+    assert redact_params(()) == "()"
+
+def test_records_rows_percentiles_and_caller(instrumented_db, stats):
+    repo = ClientRepository(instrumented_db)
+    for i in range(3):
+        repo.create(Client(None, f"Cliente {i}", "c@mail.com", "600123456"))
+    assert len(repo.get_all()) == 3
+
+    by_statement = {s.statement: s for s in stats.snapshot()}
+    insert = next(s for text, s in by_statement.items() if text.startswith("INSERT INTO clients"))
+    select = next(s for text, s in by_statement.items() if text.startswith("SELECT") and "clients" in text)
+
+    assert insert.count == 3
+    assert insert.rows == 3
+    assert "ClientRepository.create" in insert.callers
+    assert select.rows == 3
+    assert "ClientRepository.get_all" in select.callers
+    assert select.p50_ms <= select.p95_ms <= select.p99_ms <= select.max_ms
+
+def test_slow_query_log_redacts_parameters(instrumented_db, stats, caplog):
+    repo = ClientRepository(instrumented_db)
+    with caplog.at_level(logging.WARNING, logger="VeterinariaApp.slow_queries"):
+        repo.create(Client(None, "Nombre Secreto", "secreto@mail.com", "600123456"))
+
+    assert stats.slow_queries >= 1
+    assert "INSERT INTO clients" in caplog.text
+    assert "secreto" not in caplog.text.lower()
+
+def test_json_dump(instrumented_db, stats, tmp_path):
+    ClientRepository(instrumented_db).get_all()
+    path = tmp_path / "stats.json"
+    stats.dump(str(path))
+
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert data["slow_ms"] == 0.0
+    assert data["statements"][0]["count"] >= 1
+
+def test_disabled_uses_plain_connections(tmp_path):
+    db = DatabaseManager(str(tmp_path / "plain.db"))
+    db.initialize_db()
+    with db.connection() as conn:
+        assert type(conn) is __import__("sqlite3").Connection
+    assert db.query_stats is None
+    db.close()
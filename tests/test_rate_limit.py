@@ -0,0 +1,141 @@
+import pytest
+from unittest.mock import patch
+from src.database import DatabaseManager
+import threading
+from src.rate_limit import SlidingWindowLimiter, forwarded_client
+from src.repositories import UserRepository
+from src.services import AuthService, LoginThrottled
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+    def __call__(self):
+        return self.now
+
+# ----------------------------------------------------------------
+# SlidingWindowLimiter
+# ----------------------------------------------------------------
+def test_window_slides():
+    clock = FakeClock()
+    limiter = SlidingWindowLimiter(max_attempts=2, window_seconds=10, clock=clock)
+    limiter.hit("k")
+    clock.now += 5
+    limiter.hit("k")
+    assert limiter.check("k") == pytest.approx(5.0)  # el primer intento caduca en 5 s
+
+    clock.now += 5
+    assert limiter.check("k") == 0.0
+    assert limiter.stats().rejected == 1
+
+def test_keys_are_bounded_by_lru_eviction():
+    limiter = SlidingWindowLimiter(max_attempts=1, window_seconds=60, max_keys=3, clock=FakeClock())
+    for key in "abcd":
+        limiter.hit(key)
+    stats = limiter.stats()
+    assert (stats.keys, stats.evictions) == (3, 1)
+    assert limiter.check("a") == 0.0  # la más antigua se desalojó
+    assert limiter.check("d") > 0
+
+def test_reset_forgets_key():
+    limiter = SlidingWindowLimiter(max_attempts=1, clock=FakeClock())
+    limiter.hit("k")
+    limiter.reset("k")
+    assert limiter.check("k") == 0.0
+
+def test_check_and_hit_is_atomic_under_concurrency():
+    limiter = SlidingWindowLimiter(max_attempts=3, window_seconds=60)
+    start = threading.Barrier(20)
+    allowed = []
+
+    def attempt():
+        start.wait()
+        if limiter.check_and_hit("k")[0] == 0:
+            allowed.append(1)
+    threads = [threading.Thread(target=attempt) for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(allowed) == 3
+    assert limiter.stats().rejected == 17
+
+def test_release_returns_the_reserved_attempt():
+    limiter = SlidingWindowLimiter(max_attempts=1, clock=FakeClock())
+    wait, attempt = limiter.check_and_hit("k")
+    assert wait == 0 and attempt is not None
+    assert limiter.check_and_hit("k") == (pytest.approx(300.0), None)
+    limiter.release("k", attempt)
+    assert limiter.check_and_hit("k")[0] == 0
+
+def test_release_removes_only_its_own_attempt():
+    clock = FakeClock()
+    limiter = SlidingWindowLimiter(max_attempts=2, window_seconds=10, clock=clock)
+    _, mine = limiter.check_and_hit("k")
+    clock.now += 5
+    limiter.check_and_hit("k")  # otra petición concurrente, más reciente
+    limiter.release("k", mine)
+    # Queda el intento más reciente: caduca a los 10 s de él, no del mío
+    clock.now += 6
+    assert limiter.check_and_hit("k")[0] == 0
+    assert limiter.check_and_hit("k") == (pytest.approx(4.0), None)
+
+@pytest.mark.parametrize("header, hops, expected", [
+    ("1.2.3.4", 1, "1.2.3.4"),
+    ("6.6.6.6, 1.2.3.4", 1, "1.2.3.4"),          # la primera entrada la pone el cliente
+    ("6.6.6.6, 1.2.3.4, 10.0.0.2", 2, "1.2.3.4"),
+    ("1.2.3.4", 2, None),
+    (None, 1, None),
+])
+def test_forwarded_client_trusts_only_proxy_hops(header, hops, expected):
+    assert forwarded_client(header, hops) == expected
+
+# ----------------------------------------------------------------
+# AuthService.login
+# ----------------------------------------------------------------
+@pytest.fixture
+def auth_service():
+    db = DatabaseManager(":memory:")
+    db.initialize_db()
+    clock = FakeClock()
+    auth = AuthService(UserRepository(db), rounds=4,
+                       user_limiter=SlidingWindowLimiter(3, 60, clock=clock),
+                       address_limiter=SlidingWindowLimiter(5, 60, clock=clock))
+    auth.register_user("vet", "clave")
+    auth.clock = clock
+    return auth
+
+def test_throttled_login_skips_db_and_bcrypt(auth_service):
+    for _ in range(3):
+        assert auth_service.login("vet", "mala") is None
+
+    with patch.object(auth_service.user_repo, "get_by_username") as lookup, \
+         patch("src.services.bcrypt") as fake_bcrypt:
+        with pytest.raises(LoginThrottled) as exc:
+            auth_service.login("vet", "clave")
+    lookup.assert_not_called()
+    fake_bcrypt.checkpw.assert_not_called()
+    assert exc.value.retry_after == pytest.approx(60.0)
+    assert auth_service.login_throttle_stats()["user"].rejected == 1
+
+    auth_service.clock.now += 61
+    assert auth_service.login("vet", "clave") is not None
+
+def test_address_limit_spans_usernames(auth_service):
+    for i in range(5):
+        assert auth_service.login(f"nadie{i}", "x", client_address="10.0.0.1") is None
+    with pytest.raises(LoginThrottled):
+        auth_service.login("vet", "clave", client_address="10.0.0.1")
+    assert auth_service.login("vet", "clave", client_address="10.0.0.2") is not None
+
+def test_successful_login_does_not_use_up_address_attempts(auth_service):
+    for _ in range(10):
+        assert auth_service.login("vet", "clave", client_address="10.0.0.1") is not None
+    assert auth_service.login_throttle_stats()["address"].keys == 0
+
+def test_successful_login_resets_user_counter(auth_service):
+    auth_service.login("vet", "mala")
+    auth_service.login("vet", "mala")
+    assert auth_service.login("vet", "clave") is not None
+    auth_service.login("vet", "mala")
+    auth_service.login("vet", "mala")
+    assert auth_service.login("vet", "clave") is not None
@@ -0,0 +1,56 @@
+import pytest
+from datetime import date
+from src.repositories import ClientRepository, PetRepository, AppointmentRepository, BillingRepository, ReviewRepository
+from src.repositories import MedicalRecordRepository
+from src.reports import ReportRepository
+from src.models import Client, Pet, Appointment, MedicalRecord, Invoice, Review
+
+@pytest.fixture
+def data(db):
+    ana = ClientRepository(db).create(Client(None, "Ana", "a@mail.com", "600123456"))
+    luna = PetRepository(db).create(Pet(None, "Luna", "Perro", "Mestizo", 3, ana.id))
+    toby = PetRepository(db).create(Pet(None, "Toby", "Gato", "Persa", 1, ana.id))
+    appts = AppointmentRepository(db)
+    first = appts.create(Appointment(None, luna.id, date(2025, 1, 10), "Vacuna", "Completada"))
+    appts.create(Appointment(None, toby.id, date(2025, 2, 1), "Revisión", "Pendiente"))
+    appts.create(Appointment(None, 999, date(2025, 3, 1), "Huérfana", "Pendiente"))
+    MedicalRecordRepository(db).create(MedicalRecord(None, first.id, "Sana", "Ninguno"))
+    BillingRepository(db).create_many([Invoice(None, ana.id, date(2025, 1, 10), 30.0, "Pagada"),
+                                       Invoice(None, 999, date(2025, 1, 11), 12.5, "Pendiente")])
+    ReviewRepository(db).create(Review(None, ana.id, 4, "Bien", date(2025, 1, 12)))
+    return ana, luna, toby
+
+def test_pets_page_resolves_owner_and_summary(db, data):
+    ana, luna, toby = data
+    df = ReportRepository(db).pets_page().items
+    assert list(df.columns) == ["id", "name", "species", "breed", "age", "owner_name", "visit_count", "last_visit"]
+    assert df["owner_name"].tolist() == ["Ana", "Ana"]
+    # Las mascotas sin historial tienen 0 visitas y sin fecha, no NaN
+    assert df["visit_count"].tolist() == [1, 0] and str(df["visit_count"].dtype) == "int64"
+    assert df["last_visit"].iloc[0].date() == date(2025, 1, 10) and df["last_visit"].isna().iloc[1]
+    assert df["species"].dtype == "category"
+
+def test_appointments_invoices_and_reviews_pages(db, data):
+    reports = ReportRepository(db)
+    appts = reports.appointments_page().items
+    assert appts["pet_name"].tolist() == ["Desconocido", "Toby", "Luna"]
+    assert appts["date"].dt.date.tolist() == [date(2025, 3, 1), date(2025, 2, 1), date(2025, 1, 10)]
+    assert appts["status"].dtype == "category"
+
+    invoices = reports.invoices_page(filters={"status": "Pagada"}).items
+    assert invoices[["total_amount", "client_name"]].values.tolist() == [[30.0, "Ana"]]
+    assert str(invoices["date"].dtype).startswith("datetime64")
+
+    reviews = reports.reviews_page().items
+    assert list(reviews.columns) == ["client_name", "rating", "comment", "date"]
+    assert reviews.iloc[0].tolist()[:3] == ["Ana", 4, "Bien"]
+
+def test_pages_follow_the_cursor_and_can_be_empty(db, data):
+    reports = ReportRepository(db)
+    first = reports.appointments_page(limit=2)
+    assert len(first.items) == 2 and first.has_more
+    rest = reports.appointments_page(limit=2, after_key=first.next_key)
+    assert rest.items["reason"].tolist() == ["Vacuna"] and not rest.has_more
+
+    empty = reports.pets_page(filters={"client_id": 999})
+    assert len(empty.items) == 0 and "owner_name" in empty.items.columns
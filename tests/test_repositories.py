@@ -0,0 +1,335 @@
+import sqlite3
+import pytest
+from dataclasses import asdict, replace
+from datetime import date
+from src.repositories import ClientRepository, PetRepository, AppointmentRepository, BillingRepository, ReviewRepository
+from src.repositories import StatsRepository, MedicalRecordRepository, UserRepository
+from src.models import Client, Pet, Appointment, MedicalRecord, Invoice, Review, User
+
+def _walk(repo, **kwargs):
+    """Recorre todas las páginas y devuelve los ids en orden."""
+    ids, after_key, pages = [], None, 0
+    while True:
+        page = repo.list_page(after_key=after_key, **kwargs)
+        ids.extend(item.id for item in page.items)
+        pages += 1
+        if not page.has_more:
+            return ids, pages
+        after_key = page.next_key
+
+# ----------------------------------------------------------------
+# PAGINACIÓN POR CURSOR
+# ----------------------------------------------------------------
+def test_list_page_by_id_visits_every_row_once(db):
+    repo = ClientRepository(db)
+    for i in range(7):
+        repo.create(Client(None, f"Cliente {i}", "c@mail.com", "600123456"))
+
+    ids, pages = _walk(repo, limit=3)
+    assert ids == [1, 2, 3, 4, 5, 6, 7]
+    assert pages == 3
+
+def test_list_page_by_name(db):
+    repo = ClientRepository(db)
+    for name in ["Carla", "Ana", "Bea", "Ana"]:
+        repo.create(Client(None, name, "c@mail.com", "600123456"))
+
+    page = repo.list_page(limit=2, order_by="name")
+    assert [c.name for c in page.items] == ["Ana", "Ana"]
+    assert page.next_key == ("Ana", 4)
+    ids, _ = _walk(repo, limit=2, order_by="name")
+    assert ids == [2, 4, 3, 1]
+
+def test_list_page_desc_date_with_ties_across_pages(db):
+    repo = AppointmentRepository(db)
+    same_day = date(2025, 3, 1)
+    for _ in range(5):
+        repo.create(Appointment(None, 1, same_day, "Vacuna", "Pendiente"))
+    repo.create(Appointment(None, 1, date(2025, 4, 1), "Revisión", "Pendiente"))
+
+    ids, _ = _walk(repo, limit=2)  # orden por defecto: -date
+    assert ids == [6, 5, 4, 3, 2, 1]
+
+def test_list_page_walks_through_null_dates_in_both_directions(db):
+    repo = AppointmentRepository(db)
+    for day in [date(2025, 3, 1), None, date(2025, 4, 1), None, date(2025, 3, 1), None]:
+        repo.create(Appointment(None, 1, day or date(2025, 1, 1), "Vacuna", "Pendiente"))
+    with db.connection() as conn:
+        conn.execute("UPDATE appointments SET date = NULL WHERE id IN (2, 4, 6)")
+
+    # SQLite ordena los NULL primero: al final en orden descendente y al principio en ascendente
+    assert _walk(repo, limit=2)[0] == [3, 5, 1, 6, 4, 2]
+    assert _walk(repo, limit=2, order_by="date")[0] == [2, 4, 6, 1, 5, 3]
+    assert _walk(AppointmentRepository(db), limit=4, filters={"pet_id": 1})[0] == [3, 5, 1, 6, 4, 2]
+
+def test_list_page_rejects_null_cursor_on_not_null_column(db):
+    with pytest.raises(ValueError):
+        BillingRepository(db).list_page(after_key=(None, 3))
+
+def test_medical_record_and_user_pages(db):
+    records = MedicalRecordRepository(db)
+    records.create_many([MedicalRecord(None, 1, f"Diagnóstico {i}", "Reposo") for i in range(5)])
+    ids, pages = _walk(records, limit=2)
+    assert (ids, pages) == ([1, 2, 3, 4, 5], 3)
+    assert [r.id for r in records.list_page(filters={"appointment_id": 2}).items] == []
+
+    users = UserRepository(db)
+    users.create_many([User(None, name, "hash", "admin") for name in ["carla", "ana", "bea"]])
+    assert [u.username for u in users.list_page(limit=2, order_by="username").items] == ["ana", "bea"]
+    assert _walk(users, limit=2, order_by="username")[0] == [2, 3, 1]
+
+def test_list_page_filters(db):
+    client_repo, pet_repo = ClientRepository(db), PetRepository(db)
+    owner = client_repo.create(Client(None, "Ana", "a@mail.com", "600123456"))
+    other = client_repo.create(Client(None, "Luis", "l@mail.com", "600123456"))
+    for i in range(3):
+        pet_repo.create(Pet(None, f"Mascota {i}", "Perro", "Mix", 2, owner.id))
+    pet_repo.create(Pet(None, "Ajena", "Gato", "Persa", 2, other.id))
+
+    page = pet_repo.list_page(limit=10, filters={"client_id": owner.id})
+    assert [p.client_id for p in page.items] == [owner.id] * 3
+    assert not page.has_more
+
+def test_list_page_decodes_dates(db):
+    bill_repo, review_repo = BillingRepository(db), ReviewRepository(db)
+    bill_repo.create(Invoice(None, 1, date(2025, 1, 2), 50.0, "Pagada"))
+    bill_repo.create(Invoice(None, 1, date(2025, 1, 3), 20.0, "Pendiente"))
+    review_repo.create(Review(None, 1, 5, "Bien", date(2025, 1, 4)))
+
+    invoices = bill_repo.list_page(limit=1)
+    assert invoices.items[0].date == date(2025, 1, 3)
+    assert bill_repo.list_page(limit=1, after_key=invoices.next_key).items[0].date == date(2025, 1, 2)
+    assert review_repo.list_page().items[0].date == date(2025, 1, 4)
+
+def test_list_page_columnar_matches_models(db):
+    owner = ClientRepository(db).create(Client(None, "Ana", "a@mail.com", "600123456"))
+    bill_repo = BillingRepository(db)
+    bill_repo.create_many([Invoice(None, owner.id, date(2025, 1, d), 10.0 * d, "Pagada") for d in (1, 2, 3)])
+
+    rows = bill_repo.list_page(limit=2)
+    columns = bill_repo.list_page(limit=2, columnar=True)
+    assert len(columns.items) == 2 and columns.next_key == rows.next_key
+    # Mismos nombres y valores (fechas ya decodificadas) que los modelos, por columnas
+    assert columns.items.as_dict() == {name: tuple(getattr(inv, name) for inv in rows.items)
+                                       for name in columns.items.names}
+    assert list(bill_repo.list_page(limit=2, after_key=columns.next_key, columnar=True).items.as_dict()["date"]) \
+        == [date(2025, 1, 1)]
+
+    empty = PetRepository(db).list_page(columnar=True)
+    assert not empty.items and empty.items.names == ["id", "name", "species", "breed", "age", "client_id"]
+    assert ClientRepository(db).list_page(columnar=True).items.as_dict()["name"] == ("Ana",)
+
+def test_models_have_no_instance_dict():
+    client = Client(1, "Ana", "a@mail.com", "600123456")
+    assert not hasattr(client, "__dict__")
+    assert asdict(client) == {"id": 1, "name": "Ana", "email": "a@mail.com", "phone": "600123456"}
+    # Siguen siendo dataclasses mutables con valores por defecto
+    review = Review(None, 1, 5)
+    review.id = 7
+    assert (review.id, review.comment, review.date) == (7, None, date.today())
+
+@pytest.mark.parametrize("kwargs", [
+    {"limit": 0},
+    {"limit": 10_000},
+    {"order_by": "email"},
+    {"filters": {"name; DROP TABLE clients": 1}},
+])
+def test_list_page_rejects_invalid_arguments(db, kwargs):
+    with pytest.raises(ValueError):
+        ClientRepository(db).list_page(**kwargs)
+
+# ----------------------------------------------------------------
+# INSERCIONES MASIVAS
+# ----------------------------------------------------------------
+def test_create_many_assigns_ids_in_order(db):
+    repo = ClientRepository(db)
+    repo.create(Client(None, "Previo", "p@mail.com", "600123456"))
+    repo.delete(1)  # AUTOINCREMENT no reutiliza el id 1
+
+    clients = repo.create_many(Client(None, f"Cliente {i}", "c@mail.com", "600123456") for i in range(5))
+    assert [c.id for c in clients] == [2, 3, 4, 5, 6]
+    assert [(c.id, c.name) for c in repo.get_all()] == [(c.id, c.name) for c in clients]
+    assert repo.create_many([]) == []
+
+@pytest.mark.parametrize("repo_cls, items, table", [
+    (PetRepository, [Pet(None, "Luna", "Perro", "Golden", 3, 1)] * 3, "pets"),
+    (AppointmentRepository, [Appointment(None, 1, date(2025, 1, 1), "Vacuna", "Pendiente")] * 3, "appointments"),
+    (MedicalRecordRepository, [MedicalRecord(None, 1, "Sano", "Ninguno")] * 3, "medical_records"),
+    (BillingRepository, [Invoice(None, 1, date(2025, 1, 1), 10.0, "Pagada")] * 3, "invoices"),
+    (ReviewRepository, [Review(None, 1, 5, "Bien", date(2025, 1, 1))] * 3, "reviews"),
+])
+def test_create_many_inserts_every_row(db, repo_cls, items, table):
+    items = [replace(item) for item in items]
+    created = repo_cls(db).create_many(items)
+    assert [item.id for item in created] == [1, 2, 3]
+    with db.connection() as conn:
+        assert conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == 3
+
+def test_create_many_is_atomic(db):
+    repo = UserRepository(db)
+    repo.create(User(None, "admin", "hash"))
+    with pytest.raises(sqlite3.IntegrityError):
+        repo.create_many([User(None, "nuevo", "hash"), User(None, "admin", "hash")])
+    assert repo.get_by_username("nuevo") is None
+
+# ----------------------------------------------------------------
+# CITAS CON DETALLE (JOIN)
+# ----------------------------------------------------------------
+def test_appointments_with_details_resolve_names(db):
+    owner = ClientRepository(db).create(Client(None, "Ana", "a@mail.com", "600123456"))
+    pet = PetRepository(db).create(Pet(None, "Luna", "Perro", "Golden", 3, owner.id))
+    appt_repo = AppointmentRepository(db)
+    appt_repo.create(Appointment(None, pet.id, date(2025, 5, 2), "Vacuna", "Pendiente"))
+    appt_repo.create(Appointment(None, 999, date(2025, 5, 1), "Huérfana", "Pendiente"))
+
+    details = appt_repo.get_all_with_details()
+    assert [(d.reason, d.pet_name, d.species, d.owner_name) for d in details] == [
+        ("Huérfana", None, None, None),
+        ("Vacuna", "Luna", "Perro", "Ana"),
+    ]
+    assert details[0].date == date(2025, 5, 1)
+
+    page = appt_repo.list_details_page(limit=1)
+    assert page.items[0].pet_name == "Luna"
+    assert appt_repo.list_details_page(limit=1, after_key=page.next_key).items[0].reason == "Huérfana"
+
+def test_get_in_range_is_half_open_and_filters_status(db):
+    appt_repo = AppointmentRepository(db)
+    for day, status in [(1, "Pendiente"), (10, "Completada"), (10, "Pendiente"), (31, "Pendiente")]:
+        appt_repo.create(Appointment(None, 1, date(2025, 1, day), "Revisión", status))
+    appt_repo.create(Appointment(None, 1, date(2025, 2, 1), "Fuera", "Pendiente"))
+
+    january = appt_repo.get_in_range(date(2025, 1, 1), date(2025, 2, 1))
+    assert all(isinstance(a.date, date) for a in january)
+    assert [str(a.date) for a in january] == ["2025-01-01", "2025-01-10", "2025-01-10", "2025-01-31"]
+
+    pending = appt_repo.get_in_range(date(2025, 1, 5), date(2025, 2, 1), status="Pendiente")
+    assert [str(a.date) for a in pending] == ["2025-01-10", "2025-01-31"]
+
+# ----------------------------------------------------------------
+# AGREGADOS DEL PANEL
+# ----------------------------------------------------------------
+def test_dashboard_stats_aggregates_in_sql(db):
+    owner = ClientRepository(db).create(Client(None, "Ana", "a@mail.com", "600123456"))
+    pet_repo = PetRepository(db)
+    for species in ["Perro", "Perro", "Gato"]:
+        pet_repo.create(Pet(None, "M", species, "Mix", 1, owner.id))
+    appt_repo = AppointmentRepository(db)
+    for status in ["Pendiente", "Completada", "Completada"]:
+        appt_repo.create(Appointment(None, 1, date(2025, 1, 5), "Revisión", status))
+    bill_repo = BillingRepository(db)
+    bill_repo.create(Invoice(None, owner.id, date(2025, 1, 10), 40.0, "Pagada"))
+    bill_repo.create(Invoice(None, owner.id, date(2025, 1, 31), 10.5, "Pendiente"))
+    bill_repo.create(Invoice(None, owner.id, date(2025, 2, 1), 99.0, "Pagada"))
+
+    stats = StatsRepository(db).dashboard_stats(date(2025, 1, 1), date(2025, 2, 1))
+    assert (stats.clients, stats.pets, stats.appointments) == (1, 3, 3)
+    assert stats.appointments_by_status == {"Pendiente": 1, "Completada": 2}
+    assert stats.pets_by_species == {"Perro": 2, "Gato": 1}
+    assert stats.revenue_this_month == 50.5
+
+# ----------------------------------------------------------------
+# Búsqueda para selectores
+# ----------------------------------------------------------------
+def test_lookup_prefix_first_then_word_matches(db):
+    repo = ClientRepository(db)
+    for name in ["Garcés Luis", "ana García", "Gabriel Ruiz", "Pedro Gil", "María Garrido"]:
+        repo.create(Client(None, name, "c@mail.com", "600123456"))
+
+    # Primero las que empiezan por "gar" (sin distinguir mayúsculas), luego las que lo contienen como palabra
+    assert [c.name for c in repo.lookup("GAR")] == ["Garcés Luis", "ana García", "María Garrido"]
+    assert [c.name for c in repo.lookup("gar", limit=1)] == ["Garcés Luis"]
+    assert [c.name for c in repo.lookup("", limit=2)] == ["ana García", "Gabriel Ruiz"]
+    assert repo.lookup("%") == []  # los comodines de LIKE se escapan
+    with pytest.raises(ValueError):
+        repo.lookup("a", limit=0)
+
+def test_pet_lookup_and_client_names(db):
+    clients = ClientRepository(db)
+    ana = clients.create(Client(None, "Ana", "a@mail.com", "600123456"))
+    luis = clients.create(Client(None, "Luis", "l@mail.com", "600123456"))
+    pets = PetRepository(db)
+    assert not pets.has_any()
+    pets.create(Pet(None, "Luna", "Perro", "Mestizo", 2, ana.id))
+    pets.create(Pet(None, "Lucas", "Gato", "Persa", 4, luis.id))
+
+    assert pets.has_any()
+    assert [p.name for p in pets.lookup("lu")] == ["Lucas", "Luna"]
+    assert clients.get_names([ana.id, luis.id, ana.id, 999]) == {ana.id: "Ana", luis.id: "Luis"}
+    assert clients.get_names([]) == {}
+
+# ----------------------------------------------------------------
+# Historial médico materializado
+# ----------------------------------------------------------------
+def test_materialized_history_follows_records_and_appointments(db):
+    clients, pets = ClientRepository(db), PetRepository(db)
+    appts, records = AppointmentRepository(db), MedicalRecordRepository(db)
+    owner = clients.create(Client(None, "Ana", "a@mail.com", "600123456"))
+    luna = pets.create(Pet(None, "Luna", "Perro", "Mestizo", 2, owner.id))
+    toby = pets.create(Pet(None, "Toby", "Gato", "Persa", 4, owner.id))
+    first = appts.create(Appointment(None, luna.id, date(2025, 1, 10), "Vacuna", "Completada"))
+    second = appts.create(Appointment(None, luna.id, date(2025, 3, 5), "Cojera", "Completada"))
+    records.create(MedicalRecord(None, first.id, "Sana", "Ninguno"))
+    records.create(MedicalRecord(None, second.id, "Esguince", "Reposo", "Revisar en 2 semanas"))
+
+    history = records.get_medical_history_by_pet(luna.id)
+    assert [(h[1], h[3]) for h in history] == [("2025-03-05", "Esguince"), ("2025-01-10", "Sana")]
+    summary = records.get_summaries([luna.id, toby.id])
+    assert list(summary) == [luna.id]
+    assert (summary[luna.id].visit_count, summary[luna.id].last_visit, summary[luna.id].last_diagnosis) == \
+        (2, "2025-03-05", "Esguince")
+
+    # Mover la cita más reciente a otra mascota actualiza ambos historiales y resúmenes
+    second.pet_id = toby.id
+    appts.update(second)
+    assert [h[3] for h in records.get_medical_history_by_pet(luna.id)] == ["Sana"]
+    summary = records.get_summaries([luna.id, toby.id])
+    assert (summary[luna.id].visit_count, summary[luna.id].last_diagnosis) == (1, "Sana")
+    assert summary[toby.id].last_diagnosis == "Esguince"
+
+    # Borrar la cita borra su registro del historial y el resumen que queda vacío
+    appts.delete(first.id)
+    assert records.get_medical_history_by_pet(luna.id) == []
+    assert luna.id not in records.get_summaries([luna.id])
+
+def test_migration_backfills_existing_records(db):
+    from src.migrations import MIGRATIONS, apply_migrations
+    owner = ClientRepository(db).create(Client(None, "Ana", "a@mail.com", "600123456"))
+    pet = PetRepository(db).create(Pet(None, "Luna", "Perro", "Mestizo", 2, owner.id))
+    appt = AppointmentRepository(db).create(Appointment(None, pet.id, date(2025, 1, 10), "Vacuna", "Pendiente"))
+    MedicalRecordRepository(db).create(MedicalRecord(None, appt.id, "Sana", "Ninguno"))
+
+    with db.connection() as conn:
+        # Simula una BD anterior a la migración 8 y la vuelve a migrar
+        for trigger in ["pet_medical_history_ai", "pet_medical_history_ad", "medical_records_history_ai",
+                        "medical_records_history_ad", "medical_records_history_au",
+                        "appointments_history_au", "appointments_history_ad"]:
+            conn.execute(f"DROP TRIGGER {trigger}")
+        conn.execute("DROP TABLE pet_medical_history")
+        conn.execute("DROP TABLE pet_medical_summary")
+        conn.execute("DELETE FROM schema_version WHERE version >= 8")
+        conn.commit()
+        apply_migrations(conn, MIGRATIONS)
+
+    records = MedicalRecordRepository(db)
+    assert [h[3] for h in records.get_medical_history_by_pet(pet.id)] == ["Sana"]
+    assert records.get_summaries([pet.id])[pet.id].visit_count == 1
+
+def test_row_decoding_matches_strptime(db):
+    from datetime import datetime
+    owner = ClientRepository(db).create(Client(None, "Ana", "a@mail.com", "600123456"))
+    bills, reviews = BillingRepository(db), ReviewRepository(db)
+    bills.create_many([Invoice(None, owner.id, date(2025, m, 28), 10.0 * m, "Pagada") for m in (1, 2, 12)])
+    reviews.create(Review(None, owner.id, 5, None, date(2024, 2, 29)))
+
+    with db.connection() as conn:
+        raw = conn.execute("SELECT id, client_id, date, total_amount, status FROM invoices ORDER BY date DESC").fetchall()
+    # Misma salida que la conversión anterior con strptime
+    expected = [Invoice(r[0], r[1], datetime.strptime(r[2], '%Y-%m-%d').date(), r[3], r[4]) for r in raw]
+    assert bills.get_all() == expected
+
+    # La proyección en tuplas tiene los mismos campos y valores
+    rows = bills.get_all_rows()
+    assert [row._asdict() for row in rows] == [asdict(inv) for inv in expected]
+    assert rows[0].date == date(2025, 12, 28)
+    assert reviews.get_all_rows()[0].date == reviews.get_all()[0].date == date(2024, 2, 29)
@@ -0,0 +1,80 @@
+import pytest
+from datetime import date
+from src.database import DatabaseManager
+from src.repositories import (
+    ClientRepository, PetRepository, AppointmentRepository,
+    MedicalRecordRepository, BillingRepository, ReviewRepository, UserRepository
+)
+from src.seeder import DataSeeder, SyntheticProfile, main
+
+TABLES = ["clients", "pets", "appointments", "medical_records", "invoices", "reviews", "users"]
+
+def _seeder(db):
+    return DataSeeder(ClientRepository(db), PetRepository(db), AppointmentRepository(db),
+                      MedicalRecordRepository(db), BillingRepository(db), ReviewRepository(db),
+                      UserRepository(db))
+
+def _dump(db):
+    with db.connection() as conn:
+        return {table: conn.execute(f"SELECT * FROM {table} ORDER BY id").fetchall() for table in TABLES}
+
+def test_seed_fixed_dataset_once(db):
+    seeder = _seeder(db)
+    seeder.seed()
+    seeder.seed()  # la segunda vez no hace nada
+    assert len(ClientRepository(db).get_all()) == 8
+    assert len(PetRepository(db).get_all()) == 10
+    assert len(AppointmentRepository(db).get_all()) == 15
+
+def test_generate_counts_match_database(db):
+    counts = _seeder(db).generate(200, seed=1)
+    rows = _dump(db)
+    assert counts == {table: len(rows[table]) for table in TABLES}
+    assert counts["clients"] == 200
+    assert all(counts[table] > 0 for table in TABLES)
+
+def test_generate_is_reproducible_and_batched():
+    dumps = []
+    for batch_rows in (500, 50_000):
+        db = DatabaseManager(":memory:")
+        db.initialize_db()
+        batches = []
+        _seeder(db).generate(150, seed=7, batch_rows=batch_rows, progress=batches.append)
+        dumps.append(_dump(db))
+        assert batches[-1]["clients"] == 150
+        if batch_rows == 500:
+            assert len(batches) > 5  # varias transacciones pequeñas
+    assert dumps[0] == dumps[1]
+
+def test_generated_data_is_consistent(db):
+    _seeder(db).generate(300, seed=3)
+    today = str(date.today())
+    with db.connection() as conn:
+        # Ninguna cita futura está completada y solo las completadas tienen historial
+        assert conn.execute("SELECT COUNT(*) FROM appointments WHERE date >= ? AND status = 'Completada'",
+                            (today,)).fetchone()[0] == 0
+        assert conn.execute("""SELECT COUNT(*) FROM medical_records mr
+                               JOIN appointments a ON a.id = mr.appointment_id
+                               WHERE a.status != 'Completada'""").fetchone()[0] == 0
+        # Todas las claves ajenas apuntan a filas existentes
+        assert conn.execute("SELECT COUNT(*) FROM pets WHERE client_id NOT IN (SELECT id FROM clients)").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM appointments WHERE pet_id NOT IN (SELECT id FROM pets)").fetchone()[0] == 0
+        statuses = dict(conn.execute("SELECT status, COUNT(*) FROM appointments GROUP BY status").fetchall())
+    assert statuses["Completada"] > statuses["Cancelada"] > 0
+
+def test_rows_per_client_estimate_is_close(db):
+    counts = _seeder(db).generate(2000, seed=5)
+    expected = 2000 * SyntheticProfile().rows_per_client()
+    assert abs(sum(counts.values()) - expected) / expected < 0.1
+
+def test_generate_refuses_non_empty_database(db):
+    seeder = _seeder(db)
+    seeder.seed()
+    with pytest.raises(ValueError):
+        seeder.generate(10)
+
+def test_cli_generates_requested_size(tmp_path, capsys):
+    assert main([str(tmp_path / "cli.db"), "--rows", "1000", "--seed", "1"]) == 0
+    out = capsys.readouterr().out
+    assert "total" in out
+    assert main([str(tmp_path / "cli.db"), "--clients", "5"]) == 1  # ya no está vacía
@@ -1,7 +1,7 @@
 import pytest
 from unittest.mock import Mock, call
 from src.services import ClinicService
-from src.models import Client, Pet, Appointment, MedicalRecord, Invoice, Review
+from src.models import Client, Pet, Appointment, MedicalRecord, Invoice, Review, AppointmentDetail, DashboardStats
 from datetime import date
 
 class TestClinicService:
@@ -14,16 +14,33 @@ class TestClinicService:
         self.mock_mr_repo = Mock()
         self.mock_bill_repo = Mock()
         self.mock_review_repo = Mock()
+        self.mock_stats_repo = Mock()
 
         # Inyección de dependencias
         self.service = ClinicService(
             self.mock_client_repo, self.mock_pet_repo, self.mock_appt_repo,
-            self.mock_mr_repo, self.mock_bill_repo, self.mock_review_repo
+            self.mock_mr_repo, self.mock_bill_repo, self.mock_review_repo,
+            self.mock_stats_repo
         )
         
         # Datos base válidos para reutilizar
         self.valid_client = Client(1, "Juan", "juan@mail.com", "600123456")
 
+    # ----------------------------------------------------------------
+    # PANEL DE INICIO
+    # ----------------------------------------------------------------
+    def test_dashboard_stats_cached_for_ttl(self):
+        self.mock_stats_repo.dashboard_stats.return_value = DashboardStats(1, 2, 3)
+        first = self.service.dashboard_stats()
+        second = self.service.dashboard_stats()
+
+        assert first is second
+        self.mock_stats_repo.dashboard_stats.assert_called_once()
+        self.mock_client_repo.get_all.assert_not_called()
+
+        self.service.dashboard_stats(max_age=0)
+        assert self.mock_stats_repo.dashboard_stats.call_count == 2
+
     # ----------------------------------------------------------------
     # CLIENTES
     # ----------------------------------------------------------------
@@ -45,6 +62,10 @@ class TestClinicService:
             self.service.add_client(name, email, phone)
         self.mock_client_repo.create.assert_not_called()
 
+    def test_list_clients_page_delegates_to_repository(self):
+        self.service.list_clients_page(limit=10, after_key=(5,), order_by="name")
+        self.mock_client_repo.list_page.assert_called_once_with(10, (5,), "name", None, columnar=False)
+
     def test_update_client_success(self):
         self.mock_client_repo.update.return_value = True
         self.service.update_client(self.valid_client)
@@ -80,6 +101,31 @@ class TestClinicService:
         result = self.service.book_appointment(10, appt_date, "Vacuna")
         assert result.id == 100
 
+    def test_calendar_events_use_joined_details(self):
+        self.mock_appt_repo.get_all_with_details.return_value = [
+            AppointmentDetail(1, 10, "2025-12-25", "Vacuna", "Completada", "Luna", "Perro", "Ana"),
+            AppointmentDetail(2, 99, "2025-12-26", "Revisión", "Pendiente", None, None, None),
+        ]
+        events = self.service.calendar_events()
+
+        assert [e["title"] for e in events] == ["Luna - Vacuna", "Desconocido - Revisión"]
+        assert events[0]["backgroundColor"] == "#28a745"
+        assert events[1]["backgroundColor"] == "#ffc107"
+        self.mock_pet_repo.get_all.assert_not_called()
+
+    def test_calendar_events_for_window_use_range_query(self):
+        self.mock_appt_repo.get_in_range.return_value = []
+        start, end = self.service.calendar_window(date(2025, 3, 17))
+        assert (start, end) == (date(2025, 2, 15), date(2025, 4, 15))
+
+        self.service.calendar_events(start, end)
+        self.mock_appt_repo.get_in_range.assert_called_once_with(start, end, None)
+        self.mock_appt_repo.get_all_with_details.assert_not_called()
+
+    def test_list_appointments_between_rejects_inverted_range(self):
+        with pytest.raises(ValueError, match="anterior a la inicial"):
+            self.service.list_appointments_between(date(2025, 3, 2), date(2025, 3, 1))
+
     def test_book_appointment_invalid_data(self):
         with pytest.raises(ValueError, match="El motivo de la cita es obligatorio"):
             self.service.book_appointment(10, date.today(), "")
@@ -109,4 +155,88 @@ class TestClinicService:
         self.mock_review_repo.create.return_value = Mock()
         self.service.add_review(1, 1, "Malo")
         self.service.add_review(1, 5, "Bueno")
-        assert self.mock_review_repo.create.call_count == 2
\ No newline at end of file
+        assert self.mock_review_repo.create.call_count == 2
+# ----------------------------------------------------------------
+# CIERRE DE CITA (transacción sobre varios repositorios, BD real)
+# ----------------------------------------------------------------
+@pytest.fixture
+def real_service():
+    from src.database import DatabaseManager
+    from src.repositories import (ClientRepository, PetRepository, AppointmentRepository,
+                                  MedicalRecordRepository, BillingRepository, ReviewRepository)
+    db = DatabaseManager(":memory:")
+    db.initialize_db()
+    return ClinicService(ClientRepository(db), PetRepository(db), AppointmentRepository(db),
+                         MedicalRecordRepository(db), BillingRepository(db), ReviewRepository(db))
+
+def test_complete_appointment_writes_all_or_nothing(real_service):
+    client = real_service.add_client("Ana", "ana@mail.com", "600123456")
+    pet = real_service.add_pet("Luna", "Perro", "Golden", 3, client.id)
+    appt = real_service.book_appointment(pet.id, date(2025, 5, 1), "Vacuna")
+
+    record, invoice = real_service.complete_appointment(appt.id, "Sana", "Ninguno", amount=45.0)
+    assert real_service.get_appointment_by_id(appt.id).status == "Completada"
+    assert record.id is not None and invoice.client_id == client.id
+    assert len(real_service.get_medical_history_by_pet(pet.id)) == 1
+
+    # La mascota ya no existe: la factura falla y no queda nada a medias
+    other = real_service.book_appointment(pet.id, date(2025, 5, 2), "Revisión")
+    real_service.delete_pet(pet.id)
+    with pytest.raises(ValueError, match="no se puede facturar"):
+        real_service.complete_appointment(other.id, "Sana", "Ninguno", amount=45.0)
+    assert real_service.get_appointment_by_id(other.id).status == "Pendiente"
+    assert len(real_service.list_invoices()) == 1
+    assert len(real_service.get_medical_history_by_pet(pet.id)) == 1
+
+def test_pet_timeline_summary_from_single_history_read(real_service):
+    client = real_service.add_client("Ana", "ana@mail.com", "600123456")
+    pet = real_service.add_pet("Luna", "Perro", "Golden", 3, client.id)
+    assert real_service.get_pet_timeline(pet.id).summary.visit_count == 0
+
+    for day, diagnosis in [(date(2025, 1, 10), "Sana"), (date(2025, 4, 2), "Otitis")]:
+        appt = real_service.book_appointment(pet.id, day, "Revisión")
+        real_service.complete_appointment(appt.id, diagnosis, "Gotas")
+
+    timeline = real_service.get_pet_timeline(pet.id)
+    assert (timeline.summary.visit_count, timeline.summary.last_visit, timeline.summary.last_diagnosis) == \
+        (2, "2025-04-02", "Otitis")
+    assert [e[3] for e in timeline.entries] == ["Otitis", "Sana"]
+    assert real_service.pet_summaries([pet.id])[pet.id] == timeline.summary
+
+# ----------------------------------------------------------------
+# Búsqueda de texto completo
+# ----------------------------------------------------------------
+def test_search_ranks_typed_results_across_entities(real_service):
+    owner = real_service.add_client("Lucía Fernández", "lucia@mail.com", "600111222")
+    real_service.add_client("Pedro Luna", "pedro@mail.com", "600333444")
+    pet = real_service.add_pet("Luna", "Perro", "Labrador", 3, owner.id)
+    appt = real_service.book_appointment(pet.id, date(2025, 1, 10), "Revisión")
+    real_service.add_medical_record(appt.id, "Otitis", "Gotas", "Luna muy nerviosa")
+
+    results = real_service.search("luna")
+    assert {r.kind for r in results} == {"client", "pet", "medical_record"}
+    assert results == sorted(results, key=lambda r: r.score)
+    pet_hit = next(r for r in results if r.kind == "pet")
+    assert (pet_hit.id, pet_hit.title) == (pet.id, "Luna")
+    assert "Lucía Fernández" in pet_hit.detail
+    assert "[Luna]" in pet_hit.snippet
+
+def test_search_prefix_accents_and_limit(real_service):
+    real_service.add_client("Lucía Fernández", "lucia@mail.com", "600111222")
+    real_service.add_client("Luciano Pérez", "luciano@mail.com", "600999888")
+
+    assert [r.title for r in real_service.search("fernandez")] == ["Lucía Fernández"]  # sin tilde
+    assert len(real_service.search("luc")) == 2  # prefijo
+    assert len(real_service.search("luc", limit=1)) == 1
+    assert [r.title for r in real_service.search("600999")] == ["Luciano Pérez"]
+    assert real_service.search('" OR *') == []  # los operadores no rompen la consulta
+
+def test_search_index_follows_updates_and_deletes(real_service):
+    client = real_service.add_client("Marta Gil", "marta@mail.com", "600111222")
+    client.name = "Marta Ruiz"
+    real_service.update_client(client)
+    assert real_service.search("gil") == []
+    assert [r.id for r in real_service.search("ruiz")] == [client.id]
+
+    real_service.delete_client(client.id)
+    assert real_service.search("ruiz") == []